@@ -1,95 +1,106 @@
 import os
-import asyncio
-import requests
-import hashlib
-import hmac
-import base64
-import time
-from datetime import datetime
-import urllib.parse
-from typing import List, Dict, Any
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional
 from .region_mapper import region_mapper, CloudProvider
-
-# 加载环境变量
-load_dotenv()
+from .signing import AliyunSigner
+from .telemetry import decode_json
+from .transport import http_transport
 
 
 class AliyunAPI:
     """阿里云API客户端"""
     
-    def __init__(self):
+    def __init__(self, transport=None, http_cache=None):
         """初始化阿里云API客户端"""
         self.access_key_id = os.getenv('ALIYUN_ACCESS_KEY_ID')
         self.access_key_secret = os.getenv('ALIYUN_ACCESS_KEY_SECRET')
         self.endpoint = 'https://ecs.cn-hangzhou.aliyuncs.com/'
+        self._signer = None
+        self.transport = transport or http_transport
+        self.http_cache = http_cache
+        self.cache_key = 'aliyun:regions'
+        self.cache_keys = [self.cache_key]
     
-    async def fetch_regions(self) -> List[Dict[str, Any]]:
-        """获取阿里云可用区域列表"""
-        try:
-            # 构建API请求
-            params = {
-                'AccessKeyId': self.access_key_id,
-                'Action': 'DescribeRegions',
-                'Format': 'JSON',
-                'SignatureMethod': 'HMAC-SHA1',
-                'SignatureNonce': str(int(time.time() * 1000000)),
-                'SignatureVersion': '1.0',
-                'Timestamp': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'Version': '2014-05-26'
-            }
-            
-            # 生成签名
-            signature = self._generate_signature(params)
-            params['Signature'] = signature
-            
-            # 构建完整URL
-            query_string = '&'.join([f'{k}={urllib.parse.quote(str(v), safe="")}' for k, v in params.items()])
-            url = f'{self.endpoint}?{query_string}'
-            
-            # 使用asyncio在线程池中运行同步请求
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.get(url, timeout=30)
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            regions = []
-            if 'Regions' in data and 'Region' in data['Regions']:
-                for region in data['Regions']['Region']:
-                    regions.append({
-                        'region_id': region['RegionId'],
-                        'region_name': region['LocalName'],
-                        'country_code': region_mapper.get_country_code(CloudProvider.ALIYUN, region['RegionId']),
-                        'raw_data': region
-                    })
-            
-            return regions
-            
-        except Exception as e:
-            print(f"Error fetching Aliyun regions: {e}")
-            return []
+    @property
+    def signer(self) -> AliyunSigner:
+        """签名器（预先编码公共参数），凭据变化时重新创建"""
+        signer = self._signer
+        if signer is None or (signer.access_key_id, signer.access_key_secret) != (
+                self.access_key_id, self.access_key_secret):
+            signer = AliyunSigner(self.access_key_id, self.access_key_secret, self.endpoint)
+            self._signer = signer
+        return signer
     
-    def _generate_signature(self, params: Dict[str, Any]) -> str:
-        """生成阿里云API签名"""
-        # 参数排序
-        sorted_params = sorted(params.items())
-        query_string = '&'.join([f'{k}={urllib.parse.quote(str(v), safe="")}' for k, v in sorted_params])
+    async def fetch_regions(self, only_changed: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """获取阿里云可用区域列表
+
+        only_changed 为True且响应内容与上次写入数据库的一致时返回None。
+        请求失败时抛出异常，由收集器的容错策略处理。
+        """
+        if self.http_cache is None:
+            # 通过共享的长连接传输发送请求
+            response = await self.transport.get('aliyun', self._build_signed_url())
+            response.raise_for_status()
+            data = decode_json(response)
+        else:
+            # 签名API不支持条件请求，在TTL内直接使用缓存的响应
+            cached = await self.http_cache.fetch(
+                self.cache_key,
+                lambda extra: self.transport.get('aliyun', self._build_signed_url()),
+                conditional=False,
+                ignore_keys=('RequestId',)
+            )
+            if only_changed and not cached.changed:
+                return None
+            data = decode_json(cached)
         
-        # 构建待签名字符串
-        string_to_sign = f'GET&{urllib.parse.quote("/", safe="")}&{urllib.parse.quote(query_string, safe="")}'
+        regions = []
+        if 'Regions' in data and 'Region' in data['Regions']:
+            for region in data['Regions']['Region']:
+                regions.append({
+                    'region_id': region['RegionId'],
+                    'region_name': region['LocalName'],
+                    'country_code': region_mapper.get_country_code(CloudProvider.ALIYUN, region['RegionId'], region['LocalName']),
+                    'raw_data': region
+                })
+        
+        # 本次获取涉及的缓存键，可用区请求会追加各自的键
+        self.cache_keys = [self.cache_key]
+        return regions
+    
+    async def fetch_zones(self, region_id: str, only_changed: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """获取指定区域的可用区列表（DescribeZones）
+
+        only_changed 为True且响应内容与上次写入数据库的一致时返回None。
+        请求失败时抛出异常。
+        """
+        params = {'RegionId': region_id}
+        if self.http_cache is None:
+            response = await self.transport.get('aliyun', self._build_signed_url('DescribeZones', params))
+            response.raise_for_status()
+            data = decode_json(response)
+        else:
+            key = f'aliyun:zones:{region_id}'
+            cached = await self.http_cache.fetch(
+                key,
+                lambda extra: self.transport.get('aliyun', self._build_signed_url('DescribeZones', params)),
+                conditional=False,
+                ignore_keys=('RequestId',)
+            )
+            self.cache_keys.append(key)
+            if only_changed and not cached.changed:
+                return None
+            data = decode_json(cached)
         
-        # 计算签名
-        signature = base64.b64encode(
-            hmac.new(
-                (self.access_key_secret + '&').encode(),
-                string_to_sign.encode(),
-                hashlib.sha1
-            ).digest()
-        ).decode()
+        zones = []
+        for zone in data.get('Zones', {}).get('Zone', []):
+            zones.append({
+                'zone_id': zone['ZoneId'],
+                'zone_name': zone.get('LocalName') or zone['ZoneId']
+            })
         
-        return signature
+        return zones
     
+    def _build_signed_url(self, action: str = 'DescribeRegions',
+                          extra_params: Optional[Dict[str, Any]] = None) -> str:
+        """构建带签名的请求URL"""
+        return self.signer.sign_url(action, extra_params)
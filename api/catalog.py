@@ -0,0 +1,317 @@
+"""
+区域目录 - 从带版本号的目录文件编译区域、国家和大区映射
+
+目录文件（默认 api/region_catalog.json，可用环境变量 REGION_CATALOG 指定）
+是区域映射的唯一来源：服务端的国家代码映射、国家到大区的分类（写入数据库
+的 continent 列）和前端的中文翻译都由同一份编译结果生成。目录中没有收录的
+区域由 region_resolver 按 id_patterns、city_codes 和 gazetteer 回退解析。
+区域和国家的 coords 为 [纬度, 经度]，用于最近区域查询（services/spatial_index.py）。
+
+加载时把目录编译为不可变的查找表（MappingProxyType + 冻结数据类），区域
+以 (provider, region_id) 为键，所有字符串经过 sys.intern。文件的修改时间
+变化后下一次读取时重新编译并整体替换（最多每 CHECK_INTERVAL 秒检查一次），
+不需要重启worker；新目录编译失败时继续使用上一份。
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Pattern, Tuple
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'region_catalog.json')
+
+# 检查目录文件修改时间的最小间隔（秒）
+CHECK_INTERVAL = 1.0
+
+# 支持的目录格式版本
+SUPPORTED_VERSIONS = (1,)
+
+
+class CatalogError(ValueError):
+    """目录文件格式错误"""
+
+
+@dataclass(frozen=True)
+class CatalogCountry:
+    """目录中的国家"""
+    country_code: str
+    name: str
+    macro_region: str
+    coords: Optional[Tuple[float, float]] = None
+
+
+@dataclass(frozen=True)
+class CatalogRegion:
+    """目录中的区域"""
+    provider: str
+    region_id: str
+    country_code: str
+    display_name: str
+    name_zh: Optional[str] = None
+    coords: Optional[Tuple[float, float]] = None
+
+
+def _text(value: Any, where: str) -> str:
+    if not isinstance(value, str) or not value:
+        raise CatalogError(f"{where}: expected a non-empty string")
+    return sys.intern(value)
+
+
+def _coords(value: Any, where: str) -> Optional[Tuple[float, float]]:
+    """[纬度, 经度]（十进制度），未提供时为None"""
+    if value is None:
+        return None
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+        raise CatalogError(f"{where}: expected [latitude, longitude]")
+    lat, lon = float(value[0]), float(value[1])
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise CatalogError(f"{where}: coordinates out of range")
+    return (lat, lon)
+
+
+def normalize_place(name: str) -> str:
+    """地名规范化：去掉重音符号、转小写、合并空白（São Paulo -> sao paulo）"""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.lower().split())
+
+
+class CompiledCatalog:
+    """编译后的目录（只读）"""
+
+    def __init__(self, raw: Dict[str, Any], digest: str = ''):
+        version = raw.get('version')
+        if version not in SUPPORTED_VERSIONS:
+            raise CatalogError(f"Unsupported catalog version: {version!r}")
+        self.version: int = version
+        self.digest = digest
+
+        defaults = raw.get('defaults', {})
+        self.default_macro_region = _text(defaults.get('macro_region', 'others'), 'defaults.macro_region')
+
+        self.macro_regions: Tuple[Tuple[str, str], ...] = tuple(
+            (_text(item.get('id'), 'macro_regions.id'), _text(item.get('name'), 'macro_regions.name'))
+            for item in raw.get('macro_regions', [])
+        )
+        self.macro_region_names: Mapping[str, str] = MappingProxyType(dict(self.macro_regions))
+        self._macro_orders: Mapping[str, int] = MappingProxyType(
+            {macro_id: order for order, (macro_id, _) in enumerate(self.macro_regions)}
+        )
+        if self.default_macro_region not in self._macro_orders:
+            raise CatalogError(f"Unknown default macro region: {self.default_macro_region}")
+
+        countries = {}
+        for code, item in raw.get('countries', {}).items():
+            code = _text(code, 'countries').upper()
+            macro_region = _text(item.get('macro_region', self.default_macro_region), f'countries.{code}')
+            if macro_region not in self._macro_orders:
+                raise CatalogError(f"countries.{code}: unknown macro region {macro_region}")
+            countries[sys.intern(code)] = CatalogCountry(
+                country_code=sys.intern(code),
+                name=_text(item.get('name'), f'countries.{code}.name'),
+                macro_region=macro_region,
+                coords=_coords(item.get('coords'), f'countries.{code}.coords')
+            )
+        self.countries: Mapping[str, CatalogCountry] = MappingProxyType(countries)
+
+        # 区域ID中的城市/机场代码和标签中的城市名称（未收录区域的回退解析）
+        self.city_codes: Mapping[str, str] = MappingProxyType(
+            self._place_table(raw.get('city_codes', {}), 'city_codes', countries)
+        )
+        self.gazetteer: Mapping[str, str] = MappingProxyType(
+            self._place_table(raw.get('gazetteer', {}), 'gazetteer', countries)
+        )
+
+        regions: Dict[Tuple[str, str], CatalogRegion] = {}
+        by_provider: Dict[str, Mapping[str, CatalogRegion]] = {}
+        default_countries: Dict[str, str] = {}
+        id_patterns: Dict[str, Tuple[Tuple[Pattern, Optional[str]], ...]] = {}
+        for provider, section in raw.get('providers', {}).items():
+            provider = _text(provider, 'providers')
+            default_countries[provider] = _text(
+                section.get('default_country', 'US'), f'providers.{provider}.default_country'
+            )
+            id_patterns[provider] = self._compile_patterns(
+                section.get('id_patterns', []), f'providers.{provider}.id_patterns', countries
+            )
+            provider_regions = {}
+            for region_id, item in section.get('regions', {}).items():
+                where = f'providers.{provider}.regions.{region_id}'
+                country_code = _text(item.get('country'), f'{where}.country').upper()
+                if country_code not in countries:
+                    raise CatalogError(f"{where}: unknown country {country_code}")
+                name_zh = item.get('name_zh')
+                region = CatalogRegion(
+                    provider=provider,
+                    region_id=_text(region_id, where),
+                    country_code=sys.intern(country_code),
+                    display_name=_text(item.get('name', region_id), f'{where}.name'),
+                    name_zh=_text(name_zh, f'{where}.name_zh') if name_zh is not None else None,
+                    coords=_coords(item.get('coords'), f'{where}.coords')
+                )
+                provider_regions[region.region_id] = region
+                regions[(provider, region.region_id)] = region
+            by_provider[provider] = MappingProxyType(provider_regions)
+
+        self.regions: Mapping[Tuple[str, str], CatalogRegion] = MappingProxyType(regions)
+        self.provider_regions: Mapping[str, Mapping[str, CatalogRegion]] = MappingProxyType(by_provider)
+        self.default_countries: Mapping[str, str] = MappingProxyType(default_countries)
+        self.id_patterns: Mapping[str, Tuple[Tuple[Pattern, Optional[str]], ...]] = MappingProxyType(id_patterns)
+        self.client_json = self._build_client_json()
+
+    @staticmethod
+    def _place_table(items: Dict[str, Any], where: str, countries: Dict[str, CatalogCountry]) -> Dict[str, str]:
+        table = {}
+        for name, country_code in items.items():
+            country_code = _text(country_code, f'{where}.{name}').upper()
+            if country_code not in countries:
+                raise CatalogError(f"{where}.{name}: unknown country {country_code}")
+            table[sys.intern(normalize_place(_text(name, where)))] = countries[country_code].country_code
+        return table
+
+    @staticmethod
+    def _compile_patterns(items: Any, where: str,
+                          countries: Dict[str, CatalogCountry]) -> Tuple[Tuple[Pattern, Optional[str]], ...]:
+        """编译区域ID模式：命名组 city / code / country 依次查地名表、代码表、国家表，
+        都没有结果时使用模式的固定国家（country 字段，可省略）"""
+        compiled = []
+        for index, item in enumerate(items):
+            try:
+                pattern = re.compile(_text(item.get('pattern'), f'{where}[{index}].pattern'))
+            except re.error as e:
+                raise CatalogError(f"{where}[{index}]: invalid pattern: {e}") from e
+            fixed = item.get('country')
+            if fixed is not None:
+                fixed = _text(fixed, f'{where}[{index}].country').upper()
+                if fixed not in countries:
+                    raise CatalogError(f"{where}[{index}]: unknown country {fixed}")
+                fixed = countries[fixed].country_code
+            compiled.append((pattern, fixed))
+        return tuple(compiled)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompiledCatalog':
+        try:
+            raw = json.loads(data)
+        except ValueError as e:
+            raise CatalogError(f"Invalid catalog JSON: {e}") from e
+        if not isinstance(raw, dict):
+            raise CatalogError("Catalog must be a JSON object")
+        return cls(raw, hashlib.sha1(data).hexdigest()[:16])
+
+    def region(self, provider: str, region_id: str) -> Optional[CatalogRegion]:
+        return self.regions.get((provider, region_id))
+
+    def country_code(self, provider: str, region_id: str) -> str:
+        """区域的国家代码，目录中没有的区域使用云服务商的默认国家"""
+        region = self.regions.get((provider, region_id))
+        if region is not None:
+            return region.country_code
+        return self.default_countries.get(provider, 'US')
+
+    def coordinates(self, provider: str, region_id: str,
+                    country_code: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        """区域的坐标 (纬度, 经度)：目录中的区域坐标，没有时使用国家的代表位置"""
+        region = self.regions.get((provider, region_id))
+        if region is not None:
+            if region.coords is not None:
+                return region.coords
+            country_code = region.country_code
+        country = self.countries.get(country_code.upper()) if country_code else None
+        return country.coords if country else None
+
+    def macro_region(self, country_code: str) -> str:
+        """国家所属的大区，目录中没有的国家归入默认大区"""
+        country = self.countries.get(country_code.upper()) if country_code else None
+        return country.macro_region if country else self.default_macro_region
+
+    def macro_order(self, macro_region: str) -> int:
+        """大区的显示顺序（未知大区排在最后）"""
+        return self._macro_orders.get(macro_region, len(self._macro_orders))
+
+    def classify(self, country_code: str) -> Tuple[str, int]:
+        """国家所属的大区及其显示顺序"""
+        macro_region = self.macro_region(country_code)
+        return macro_region, self.macro_order(macro_region)
+
+    def _build_client_json(self) -> bytes:
+        """前端使用的目录（中文名称和大区名称），编译时序列化一次"""
+        payload = {
+            'success': True,
+            'version': self.version,
+            'digest': self.digest,
+            'macro_regions': [{'id': macro_id, 'name': name} for macro_id, name in self.macro_regions],
+            'countries': {code: country.name for code, country in self.countries.items()},
+            'regions': {
+                provider: {
+                    region_id: region.name_zh
+                    for region_id, region in provider_regions.items() if region.name_zh
+                }
+                for provider, provider_regions in self.provider_regions.items()
+            }
+        }
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class RegionCatalog:
+    """按修改时间热加载的目录文件"""
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = CHECK_INTERVAL):
+        self.path = path or os.getenv('REGION_CATALOG') or DEFAULT_CATALOG_PATH
+        self.check_interval = check_interval
+        self._compiled: Optional[CompiledCatalog] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> CompiledCatalog:
+        """当前的编译结果（文件变化时先重新编译）"""
+        compiled = self._compiled
+        if compiled is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return compiled
+        return self._refresh()
+
+    def reload(self) -> CompiledCatalog:
+        """忽略检查间隔，立即检查文件是否变化"""
+        self._checked_at = 0.0
+        return self._refresh()
+
+    def _refresh(self) -> CompiledCatalog:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                if self._compiled is None:
+                    raise
+                return self._compiled
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature and self._compiled is not None:
+                return self._compiled
+
+            # 同一份文件只尝试编译一次，编译失败时不会每次检查都重试
+            self._signature = signature
+            try:
+                with open(self.path, 'rb') as f:
+                    compiled = CompiledCatalog.from_bytes(f.read())
+            except (OSError, CatalogError) as e:
+                if self._compiled is None:
+                    raise
+                print(f"Failed to reload region catalog {self.path}, keeping version "
+                      f"{self._compiled.digest}: {e}")
+                return self._compiled
+
+            self._compiled = compiled
+            return compiled
+
+
+# 全局目录实例
+region_catalog = RegionCatalog()
@@ -1,125 +1,386 @@
 import asyncio
-from typing import Dict, List, Any
-from .linode_api import LinodeAPI
-from .digitalocean_api import DigitalOceanAPI
-from .aliyun_api import AliyunAPI
-from .tencent_api import TencentAPI
+import functools
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Any, Optional
+from .catalog import region_catalog
+from .region_resolver import region_resolver
+from .registry import ProviderClients, provider_registry
+from .resilience import CircuitOpenError, provider_resilience
+from .telemetry import ProviderMetrics, bind_metrics, unbind_metrics
+
+# 一次刷新的默认总时限（秒），超时未完成的云服务商本次跳过
+DEFAULT_DEADLINE = float(os.getenv('REFRESH_DEADLINE', '120'))
+# 是否把区域展开为可用区（每个区域一次签名请求），默认关闭
+COLLECT_ZONES = os.getenv('COLLECT_ZONES', 'off').lower() in ('1', 'true', 'yes', 'on')
+# 每个云服务商同时进行的可用区请求数上限，以及单次请求的超时（秒）
+ZONE_CONCURRENCY = int(os.getenv('ZONE_CONCURRENCY', '4'))
+ZONE_TIMEOUT = float(os.getenv('ZONE_TIMEOUT', '10'))
 
 
 class CloudAPICollector:
     """云服务API数据收集器"""
     
-    def __init__(self):
-        """初始化收集器，创建各个云服务API实例"""
-        self.providers = {
-            'linode': LinodeAPI(),
-            'digitalocean': DigitalOceanAPI(),
-            'aliyun': AliyunAPI(),
-            'tencent': TencentAPI()
-        }
+    def __init__(self, http_cache=None, resilience=None, deadline: Optional[float] = None,
+                 collect_zones: Optional[bool] = None, zone_concurrency: Optional[int] = None,
+                 zone_timeout: Optional[float] = None, registry=None):
+        """初始化收集器（各云服务商客户端在首次使用时才导入和创建）
+
+        http_cache: 可选的 HttpResponseCache。启用后内容未变化的云服务商
+        在收集结果中为None，不会解析也不会写入数据库。
+        resilience: 重试和熔断策略，默认使用进程内共享的策略（熔断状态跨刷新保留）
+        deadline: 一次收集的总时限（秒），超时的云服务商本次跳过
+        collect_zones: 是否为支持的云服务商（提供 fetch_zones）收集可用区
+        zone_concurrency / zone_timeout: 可用区请求的并发上限和单次超时
+        registry: 云服务商注册表，默认使用内置云服务商和入口点
+        """
+        self.http_cache = http_cache
+        self.resilience = resilience or provider_resilience
+        self.deadline = DEFAULT_DEADLINE if deadline is None else deadline
+        self.collect_zones = COLLECT_ZONES if collect_zones is None else collect_zones
+        self.zone_concurrency = max(1, zone_concurrency or ZONE_CONCURRENCY)
+        self.zone_timeout = ZONE_TIMEOUT if zone_timeout is None else zone_timeout
+        # 最近一次收集中未成功的云服务商及原因，由 update_database 写入更新日志
+        self.errors: Dict[str, str] = {}
+        # 最近一次收集中各云服务商的指标，由 update_database 写入 collection_metrics
+        self.metrics: Dict[str, ProviderMetrics] = {}
+        self.registry = registry or provider_registry
+        self.providers = ProviderClients(self.registry, http_cache=http_cache)
     
-    async def collect_all_regions(self) -> Dict[str, List[Dict[str, Any]]]:
-        """异步收集所有云服务商的区域数据"""
+    async def collect_all_regions(self, progress: Optional[Callable[[str, str, int], None]] = None,
+                                  providers: Optional[Iterable[str]] = None
+                                  ) -> Dict[str, Optional[List[Dict[str, Any]]]]:
+        """异步收集所有云服务商的区域数据
+
+        progress: 可选的进度回调，参数为 (云服务商, 状态, 区域数)，状态为
+        running / succeeded / unchanged / failed / circuit_open / timeout。
+        providers: 只收集指定的云服务商（未注册的名称忽略），None表示全部。
+        结果为None的云服务商不写入数据库：响应内容未变化、请求失败、已熔断，
+        或者在总时限内没有完成。
+        """
         results = {}
+        self.errors = {}
+        self.metrics = {}
+        wanted = set(providers) if providers is not None else None
+        selected = [name for name in self.registry.names() if wanted is None or name in wanted]
         
-        # 创建异步任务
-        tasks = []
-        for provider_name, api_client in self.providers.items():
-            task = asyncio.create_task(
-                self._collect_provider_regions(provider_name, api_client)
+        # 创建异步任务（只导入和创建本次需要的客户端）
+        tasks = {}
+        for provider_name in selected:
+            tasks[provider_name] = asyncio.create_task(
+                self._collect_provider(provider_name, progress)
             )
-            tasks.append(task)
         
-        # 等待所有任务完成
-        completed_results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 等待所有任务完成，超过总时限的任务取消，已完成的结果照常提交
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=self.deadline if self.deadline > 0 else None)
         
         # 处理结果
-        for i, (provider_name, _) in enumerate(self.providers.items()):
-            result = completed_results[i]
-            if isinstance(result, Exception):
-                print(f"Error collecting {provider_name} regions: {result}")
-                results[provider_name] = []
+        for provider_name, task in tasks.items():
+            if not task.done():
+                task.cancel()
+                print(f"Collecting {provider_name} regions exceeded the {self.deadline:g}s deadline")
+                self.errors[provider_name] = f'Refresh deadline of {self.deadline:g}s exceeded'
+                self._report(progress, provider_name, 'timeout', 0)
+                if provider_name in self.metrics:
+                    self.metrics[provider_name].finish_fetch('timeout')
+                results[provider_name] = None
+            elif task.exception() is not None:
+                print(f"Error collecting {provider_name} regions: {task.exception()}")
+                self.errors[provider_name] = str(task.exception())
+                results[provider_name] = None
             else:
-                results[provider_name] = result
+                results[provider_name] = task.result()
         
         return results
     
-    async def _collect_provider_regions(self, provider_name: str, api_client) -> List[Dict[str, Any]]:
-        """收集单个云服务商的区域数据"""
+    async def _collect_provider(self, provider_name: str,
+                                progress: Optional[Callable[[str, str, int], None]] = None
+                                ) -> Optional[List[Dict[str, Any]]]:
+        """创建客户端并收集数据，客户端加载失败时与请求失败同样处理"""
+        metrics = ProviderMetrics(provider_name)
+        self.metrics[provider_name] = metrics
+        # 本任务内的请求和重试记录到该云服务商的指标中
+        token = bind_metrics(metrics)
+        try:
+            try:
+                api_client = self.providers[provider_name]
+            except Exception as e:
+                print(f"Failed to load provider {provider_name}: {e}")
+                self.errors[provider_name] = f'Failed to load provider: {e}'
+                self._report(progress, provider_name, 'failed', 0)
+                return None
+            return await self._collect_provider_regions(provider_name, api_client, progress)
+        finally:
+            metrics.finish_fetch()
+            unbind_metrics(token)
+    
+    async def _collect_provider_regions(self, provider_name: str, api_client,
+                                        progress: Optional[Callable[[str, str, int], None]] = None
+                                        ) -> Optional[List[Dict[str, Any]]]:
+        """收集单个云服务商的区域数据，内容未变化或失败时返回None"""
+        self._report(progress, provider_name, 'running', 0)
+        if self.http_cache is not None:
+            fetch = functools.partial(api_client.fetch_regions, only_changed=True)
+        else:
+            fetch = api_client.fetch_regions
+        
         try:
-            regions = await api_client.fetch_regions()
-            print(f"Successfully collected {len(regions)} regions from {provider_name}")
-            return regions
+            regions = await self.resilience.call(provider_name, fetch)
+            if self.collect_zones and hasattr(api_client, 'fetch_zones'):
+                regions = await self._collect_zones(provider_name, api_client, regions)
+        except CircuitOpenError as e:
+            print(f"Skipping {provider_name}: {e}")
+            self.errors[provider_name] = str(e)
+            self._report(progress, provider_name, 'circuit_open', 0)
+            return None
         except Exception as e:
             print(f"Failed to collect regions from {provider_name}: {e}")
-            return []
+            self.errors[provider_name] = str(e) or type(e).__name__
+            self._report(progress, provider_name, 'failed', 0)
+            return None
+        
+        if regions is None:
+            print(f"Regions from {provider_name} unchanged since last sync")
+            self._report(progress, provider_name, 'unchanged', 0)
+            return None
+        print(f"Successfully collected {len(regions)} regions from {provider_name}")
+        self._report(progress, provider_name, 'succeeded', len(regions))
+        return regions
     
-    def update_database(self, db_manager, regions_data: Dict[str, List[Dict[str, Any]]]):
-        """将收集的数据更新到数据库"""
-        for provider_name, regions in regions_data.items():
-            try:
-                # 获取或创建provider
-                provider = db_manager.get_provider_by_name(provider_name)
-                if not provider:
-                    print(f"Provider {provider_name} not found in database")
+    async def _collect_zones(self, provider_name: str, api_client,
+                             regions: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+        """为每个区域获取可用区，结果放在区域数据的 zones 字段中
+
+        请求在 zone_concurrency 的并发上限内进行，每次请求有独立的超时。
+        单个区域失败、超时或内容未变化时不设置 zones，该区域的现有可用区保持不变。
+        区域列表和所有可用区都未变化时返回None。
+        """
+        listing = regions
+        if listing is None:
+            # 区域列表未变化，仍需要区域ID来展开可用区（TTL内直接读取缓存的响应）
+            listing = await self.resilience.call(provider_name, api_client.fetch_regions)
+        
+        semaphore = asyncio.Semaphore(self.zone_concurrency)
+        only_changed = self.http_cache is not None
+        
+        async def fetch(region_id: str) -> Optional[List[Dict[str, Any]]]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        api_client.fetch_zones(region_id, only_changed=only_changed),
+                        self.zone_timeout if self.zone_timeout > 0 else None
+                    )
+                except asyncio.TimeoutError:
+                    print(f"Fetching zones of {provider_name}/{region_id} timed out")
+                except Exception as e:
+                    print(f"Failed to fetch zones of {provider_name}/{region_id}: {e}")
+                return None
+        
+        results = await asyncio.gather(*(fetch(region['region_id']) for region in listing))
+        expanded = 0
+        for region, zones in zip(listing, results):
+            if zones is not None:
+                region['zones'] = zones
+                expanded += 1
+        print(f"Fetched zones for {expanded}/{len(listing)} regions from {provider_name}")
+        
+        if regions is None and not expanded:
+            return None
+        return listing
+    
+    def _report(self, progress, provider_name: str, status: str, count: int):
+        """调用进度回调，回调本身的异常不影响数据收集"""
+        metrics = self.metrics.get(provider_name)
+        if metrics is not None:
+            metrics.status = status
+        if progress is None:
+            return
+        try:
+            progress(provider_name, status, count)
+        except Exception as e:
+            print(f"Progress callback failed for {provider_name}: {e}")
+    
+    def update_database(self, db_manager, regions_data: Dict[str, Optional[List[Dict[str, Any]]]],
+                        run_id: Optional[str] = None):
+        """将收集的数据增量同步到数据库
+
+        所有云服务商的写入和统计快照的重新计算在同一个事务中提交，
+        单个云服务商写入失败时只回滚该云服务商的部分。只写入有变化的
+        记录，没有任何变化时不推进代际号，各worker的缓存继续有效。
+        结果为None（响应内容未变化或收集失败）的云服务商直接跳过。
+        本次收集的指标在数据提交后以 run_id 记录到 collection_metrics。
+        """
+        changed_rows = 0
+        synced = []
+        with db_manager.transaction():
+            # 收集失败和熔断器状态变化写入更新日志
+            self._log_collection_errors(db_manager)
+            
+            for provider_name, regions in regions_data.items():
+                if regions is None:
                     continue
-                
-                # 更新区域数据（带去重）
-                updated_count = 0
+                started = time.perf_counter()
+                written = self._update_provider(db_manager, provider_name, regions)
+                metrics = self.metrics.get(provider_name)
+                if metrics is not None:
+                    metrics.db_write_ms = (time.perf_counter() - started) * 1000
+                if written is not None:
+                    changed_rows += written
+                    synced.append(provider_name)
+            
+            # 区域目录重新加载后，已有国家和区域的大区分类随之更新
+            changed_rows += db_manager.reclassify_continents(region_catalog.get().classify)
+            
+            # 与数据写入在同一事务中重新计算统计快照
+            if changed_rows:
+                db_manager.refresh_stats_snapshot()
+        
+        # 事务已提交，记录这些响应已写入数据库，下次内容不变时跳过
+        if self.http_cache is not None:
+            for provider_name in synced:
+                api_client = self.providers.peek(provider_name)
+                if api_client is None or not hasattr(api_client, 'cache_key'):
+                    continue
+                # 分页接口每页一个缓存键
+                for key in getattr(api_client, 'cache_keys', None) or [api_client.cache_key]:
+                    self.http_cache.mark_synced(key)
+        
+        # 指标单独提交，记录失败不影响已写入的数据
+        if self.metrics:
+            try:
+                db_manager.record_collection_metrics(
+                    run_id, [metrics.to_dict() for metrics in self.metrics.values()]
+                )
+            except Exception as e:
+                print(f"Recording collection metrics failed: {e}")
+        
+        # 代际号已在数据事务提交后推进（见 DatabaseManager._data_changed）
+        if changed_rows:
+            # 大批量写入后立即做一次被动检查点，避免WAL持续增长
+            try:
+                db_manager.checkpoint('PASSIVE')
+            except Exception as e:
+                print(f"WAL checkpoint failed: {e}")
+    
+    def _log_collection_errors(self, db_manager):
+        """记录收集失败的原因和熔断器状态变化"""
+        from database.models import UpdateLog
+        entries = [(name, 'error', message) for name, message in self.errors.items()]
+        entries += [
+            (name, f'circuit_{state}', f'Circuit breaker {previous} -> {state}')
+            for name, previous, state in self.resilience.drain_events()
+        ]
+        
+        for provider_name, status, message in entries:
+            provider = db_manager.get_provider_by_name(provider_name)
+            if provider:
+                db_manager.create_update_log(UpdateLog(
+                    provider_id=provider.id, status=status, message=message
+                ))
+    
+    def _update_provider(self, db_manager, provider_name: str,
+                         regions: List[Dict[str, Any]]) -> Optional[int]:
+        """同步单个云服务商的区域数据
+
+        返回写入（新增、更新、下线）的记录数，未同步（跳过或失败）时返回None
+        """
+        from database.models import UpdateLog, Zone
+        provider = None
+        try:
+            provider = db_manager.get_provider_by_name(provider_name)
+            if not provider:
+                print(f"Provider {provider_name} not found in database")
+                return None
+            
+            # 没有返回任何区域通常是API调用失败，保留现有数据而不是全部下线
+            if not regions:
+                print(f"No regions returned for {provider_name}, keeping existing data")
+                db_manager.create_update_log(UpdateLog(
+                    provider_id=provider.id,
+                    status='skipped',
+                    message='No regions returned, existing data kept'
+                ))
+                return None
+            
+            # 嵌套事务（SAVEPOINT）：该云服务商写入失败时只回滚这一部分
+            with db_manager.transaction():
+                zones = []
                 for region_data in regions:
-                    az = self._create_availability_zone(provider.id, region_data)
+                    az = self._create_availability_zone(provider.id, region_data, provider_name)
                     if az:
-                        az_id = db_manager.create_availability_zone(az)
-                        if az_id:
-                            updated_count += 1
+                        zones.append(az)
+                # 统计快照由外层事务统一重新计算
+                diff = db_manager.sync_availability_zones(provider.id, zones, refresh_stats=False)
+                
+                written = diff['added'] + diff['changed'] + diff['removed']
+                diffed = sum(diff.values())
+                
+                summary = (f"{diff['added']} added, {diff['changed']} changed, "
+                           f"{diff['unchanged']} unchanged, {diff['removed']} removed")
+                print(f"Synced {len(zones)} regions for {provider_name}: {summary}")
+                message = f"Synced {len(zones)} regions ({summary})"
                 
-                print(f"Updated {updated_count} regions for {provider_name}")
+                # 可用区作为区域的子级在同一事务中同步
+                zones_by_region = {
+                    region_data['region_id']: [
+                        Zone(zone_id=zone['zone_id'], zone_name=zone['zone_name'])
+                        for zone in region_data['zones']
+                    ]
+                    for region_data in regions
+                    if region_data.get('zones') is not None
+                }
+                if zones_by_region:
+                    zone_diff = db_manager.sync_zones(provider.id, zones_by_region)
+                    written += zone_diff['added'] + zone_diff['changed'] + zone_diff['removed']
+                    diffed += sum(zone_diff.values())
+                    message += (f"; zones of {len(zones_by_region)} regions: "
+                                f"{zone_diff['added']} added, {zone_diff['changed']} changed, "
+                                f"{zone_diff['removed']} removed")
+                
+                # 区域目录和回退规则都无法确定国家的区域记录到 unmapped_regions
+                unmapped = region_resolver.unmapped(provider_name, regions)
+                db_manager.sync_unmapped_regions(provider_name, unmapped)
+                if unmapped:
+                    message += f"; {len(unmapped)} regions unmapped"
                 
                 # 记录更新日志
-                from database.models import UpdateLog
-                log = UpdateLog(
+                db_manager.create_update_log(UpdateLog(
                     provider_id=provider.id,
                     status='success',
-                    message=f'Updated {len(regions)} regions'
-                )
-                db_manager.create_update_log(log)
-                
-            except Exception as e:
-                print(f"Error updating database for {provider_name}: {e}")
-                # 记录错误日志
-                if provider:
-                    from database.models import UpdateLog
-                    log = UpdateLog(
-                        provider_id=provider.id,
-                        status='error',
-                        message=str(e)
-                    )
-                    db_manager.create_update_log(log)
-    
-    def _clean_old_regions(self, db_manager, provider_id: int):
-        """清理指定提供商的旧区域数据"""
-        import sqlite3
-        conn = sqlite3.connect(db_manager.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-            DELETE FROM availability_zones WHERE provider_id = ?
-            ''', (provider_id,))
-            conn.commit()
-            print(f"Cleaned old regions for provider {provider_id}")
-        except sqlite3.Error as e:
-            print(f"Error cleaning old regions: {e}")
-        finally:
-            conn.close()
+                    message=message
+                ))
+            
+            metrics = self.metrics.get(provider_name)
+            if metrics is not None:
+                metrics.rows_diffed = diffed
+                metrics.rows_written = written
+            return written
+            
+        except Exception as e:
+            print(f"Error updating database for {provider_name}: {e}")
+            # 记录错误日志
+            if provider:
+                db_manager.create_update_log(UpdateLog(
+                    provider_id=provider.id,
+                    status='error',
+                    message=str(e)
+                ))
+            return None
     
-    def _create_availability_zone(self, provider_id: int, region_data: Dict[str, Any]):
+    def _create_availability_zone(self, provider_id: int, region_data: Dict[str, Any],
+                                  provider_name: str = ''):
         """根据区域数据创建AvailabilityZone对象"""
         try:
             from database.models import AvailabilityZone
             
-            # 确定大洲
-            continent = self._map_country_to_continent(region_data['country_code'])
+            # 大洲取区域目录中的大区，写入时一并保存排序
+            catalog = region_catalog.get()
+            continent = catalog.macro_region(region_data['country_code'])
+            # 坐标取目录中的区域坐标，目录中没有的区域使用所在国家的代表位置
+            latitude, longitude = catalog.coordinates(
+                provider_name, region_data['region_id'], region_data['country_code']
+            ) or (None, None)
             
             return AvailabilityZone(
                 provider_id=provider_id,
@@ -127,26 +388,11 @@ class CloudAPICollector:
                 region_name=region_data['region_name'],
                 country_code=region_data['country_code'],
                 continent=continent,
+                macro_order=catalog.macro_order(continent),
+                latitude=latitude,
+                longitude=longitude,
                 status='available'
             )
         except KeyError as e:
             print(f"Missing required field in region data: {e}")
             return None
-    
-    def _map_country_to_continent(self, country_code: str) -> str:
-        """将国家代码映射到大洲"""
-        # 简化的映射表，实际项目中应该更完整
-        continent_mapping = {
-            # 美洲
-            'US': 'americas', 'CA': 'americas', 'BR': 'americas', 'MX': 'americas',
-            # 欧洲-非洲
-            'GB': 'europe-africa', 'DE': 'europe-africa', 'FR': 'europe-africa',
-            'NL': 'europe-africa', 'IT': 'europe-africa', 'ES': 'europe-africa',
-            'SE': 'europe-africa', 'PL': 'europe-africa', 'ZA': 'europe-africa',
-            # 亚太
-            'CN': 'apac', 'JP': 'apac', 'SG': 'apac', 'AU': 'apac', 'IN': 'apac',
-            'KR': 'apac', 'HK': 'apac', 'TH': 'apac', 'ID': 'apac', 'MY': 'apac',
-            'PH': 'apac', 'AE': 'apac'
-        }
-        
-        return continent_mapping.get(country_code.upper(), 'apac')  # 默认为亚太
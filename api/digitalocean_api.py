@@ -1,18 +1,18 @@
 import os
-import asyncio
-import requests
-from typing import List, Dict, Any
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional
 from .region_mapper import region_mapper, CloudProvider
+from .telemetry import decode_json
+from .transport import http_transport
+from .pagination import Page, Paginator, page_from_url, pages_from_total
 
-# 加载环境变量
-load_dotenv()
+# 每页条目数（DigitalOcean API上限为200）
+PER_PAGE = 200
 
 
 class DigitalOceanAPI:
     """DigitalOcean API客户端"""
     
-    def __init__(self):
+    def __init__(self, transport=None, http_cache=None):
         """初始化DigitalOcean API客户端"""
         self.base_url = 'https://api.digitalocean.com/v2'
         self.token = os.getenv('DIGITALOCEAN_API_TOKEN')
@@ -20,36 +20,75 @@ class DigitalOceanAPI:
             'Authorization': f'Bearer {self.token}',
             'Content-Type': 'application/json'
         }
+        self.transport = transport or http_transport
+        self.http_cache = http_cache
+        self.cache_key = 'digitalocean:regions'
+        # 最近一次获取使用的缓存键（每页一个）
+        self.cache_keys = [self.cache_key]
     
-    async def fetch_regions(self) -> List[Dict[str, Any]]:
-        """获取DigitalOcean可用区域列表"""
-        try:
-            # 使用asyncio在线程池中运行同步请求
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.get(
-                    f'{self.base_url}/regions',
-                    headers=self.headers,
-                    timeout=30
-                )
-            )
-            
+    async def fetch_regions(self, only_changed: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """获取DigitalOcean可用区域列表
+
+        only_changed 为True且响应内容与上次写入数据库的一致时返回None。
+        请求失败时抛出异常，由收集器的容错策略处理。
+        """
+        paginator = Paginator(
+            lambda page: self._fetch_page('/regions', page),
+            page_count=self._page_count,
+            items=lambda data: data.get('regions', []),
+            has_next=lambda data: bool(((data.get('links') or {}).get('pages') or {}).get('next'))
+        )
+        
+        regions = []
+        async for region in paginator:
+            if region.get('available', False):
+                regions.append({
+                    'region_id': region['slug'],
+                    'region_name': region['name'], 
+                    'country_code': region_mapper.get_country_code(CloudProvider.DIGITALOCEAN, region['slug'], region['name']),
+                    'raw_data': region
+                })
+        
+        self.cache_keys = [self._page_cache_key(n) for n in range(1, paginator.pages_fetched + 1)]
+        if self.http_cache is not None:
+            # 页数或条目数变化（例如末尾的页面消失）也视为变化
+            shape_changed = self.http_cache.record_shape(self.cache_key, paginator.shape)
+            if only_changed and not paginator.changed and not shape_changed:
+                return None
+        
+        return regions
+    
+    async def _fetch_page(self, path: str, page: int) -> Page:
+        """获取列表接口的一页"""
+        url = f'{self.base_url}{path}'
+        params = {'page': page, 'per_page': PER_PAGE}
+        if self.http_cache is None:
+            # 通过共享的长连接传输发送请求
+            response = await self.transport.get('digitalocean', url, headers=self.headers, params=params)
             response.raise_for_status()
-            data = response.json()
-            
-            regions = []
-            for region in data.get('regions', []):
-                if region.get('available', False):
-                    regions.append({
-                        'region_id': region['slug'],
-                        'region_name': region['name'], 
-                        'country_code': region_mapper.get_country_code(CloudProvider.DIGITALOCEAN, region['slug']),
-                        'raw_data': region
-                    })
-            
-            return regions
-            
-        except Exception as e:
-            print(f"Error fetching DigitalOcean regions: {e}")
-            return []
+            return Page(page, decode_json(response))
+        
+        # 条件请求：未变化时服务器返回304，直接使用缓存的响应
+        cached = await self.http_cache.fetch(
+            self._page_cache_key(page),
+            lambda extra: self.transport.get(
+                'digitalocean', url, headers={**self.headers, **extra}, params=params
+            ),
+            conditional=True
+        )
+        return Page(page, decode_json(cached), cached.changed)
+    
+    @staticmethod
+    def _page_count(data: Dict[str, Any]) -> Optional[int]:
+        """从 meta.total 或 links.pages.last 得到总页数，只有 next 链接时返回None"""
+        total = (data.get('meta') or {}).get('total')
+        if total:
+            return pages_from_total(total, PER_PAGE)
+        pages = (data.get('links') or {}).get('pages') or {}
+        last = page_from_url(pages.get('last'))
+        if last:
+            return last
+        return None if pages.get('next') else 1
+    
+    def _page_cache_key(self, page: int) -> str:
+        return self.cache_key if page == 1 else f'{self.cache_key}:page{page}'
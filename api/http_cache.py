@@ -0,0 +1,184 @@
+"""
+HTTP响应缓存 - 持久化保存云服务商API的原始响应
+
+每个缓存项保存原始响应体、校验信息（ETag / Last-Modified）、获取时间和
+内容哈希。支持条件请求的API（Linode、DigitalOcean）每次发送
+If-None-Match / If-Modified-Since，返回304时直接使用缓存；签名API
+（阿里云、腾讯云）在TTL内不发送请求。
+
+缓存同时记录最近一次成功写入数据库的内容哈希（synced_hash），内容与
+已写入的数据一致时调用方可以跳过解析和数据库写入。只有在数据库事务
+提交后才调用 mark_synced，写入失败时下次刷新仍会重新写入。
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+# 签名API的默认缓存时间（秒）
+DEFAULT_TTL = 3600.0
+
+
+def content_hash(body: str, ignore_keys: Iterable[str] = ()) -> str:
+    """计算响应内容哈希，忽略每次请求都会变化的字段（如RequestId）"""
+    ignore_keys = set(ignore_keys)
+    if ignore_keys:
+        def strip(value):
+            if isinstance(value, dict):
+                return {k: strip(v) for k, v in value.items() if k not in ignore_keys}
+            if isinstance(value, list):
+                return [strip(v) for v in value]
+            return value
+        try:
+            body = json.dumps(strip(json.loads(body)), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            pass
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    """缓存的响应"""
+    body: str
+    content_hash: str
+    changed: bool
+    from_cache: bool
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class HttpResponseCache:
+    """磁盘上的HTTP响应缓存，每个缓存项一个JSON文件"""
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    async def fetch(self, key: str, send: Callable[[Dict[str, str]], Awaitable[Any]],
+                    conditional: bool = True, ttl: Optional[float] = None,
+                    ignore_keys: Iterable[str] = ()) -> CachedResponse:
+        """获取响应，必要时调用 send(额外请求头) 发送请求
+
+        conditional 为True时发送条件请求头并处理304；否则在TTL内直接使用缓存。
+        ignore_keys 中的字段不参与内容哈希的计算。
+        """
+        entry = self._load(key)
+        ttl = self.ttl if ttl is None else ttl
+
+        if entry is not None and not conditional and time.time() - entry['fetched_at'] < ttl:
+            self.hits += 1
+            return self._result(entry, from_cache=True)
+
+        headers = {}
+        if entry is not None and conditional:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = await send(headers)
+
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            entry['fetched_at'] = time.time()
+            entry['etag'] = response.headers.get('ETag') or entry.get('etag')
+            entry['last_modified'] = response.headers.get('Last-Modified') or entry.get('last_modified')
+            self._save(key, entry)
+            return self._result(entry, from_cache=True)
+
+        response.raise_for_status()
+        self.misses += 1
+        body = response.content.decode('utf-8')
+        entry = {
+            'key': key,
+            'body': body,
+            'content_hash': content_hash(body, ignore_keys),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'synced_hash': entry.get('synced_hash') if entry else None,
+            'shape': entry.get('shape') if entry else None,
+            'synced_shape': entry.get('synced_shape') if entry else None
+        }
+        self._save(key, entry)
+        return self._result(entry, from_cache=False)
+
+    def record_shape(self, key: str, shape: Dict[str, Any]) -> bool:
+        """在缓存项上记录分页列表的形状（页数、条目数）
+
+        返回形状是否与上次写入数据库时不同：每页内容都未变化但末尾的页面
+        消失时，只有页数或条目数能反映出变化。
+        """
+        with self._lock:
+            entry = self._load(key)
+            if entry is None:
+                return True
+            if entry.get('shape') != shape:
+                entry['shape'] = shape
+                self._save(key, entry)
+            return entry.get('synced_shape') != shape
+
+    def mark_synced(self, key: str):
+        """记录当前缓存内容（及分页形状）已成功写入数据库"""
+        with self._lock:
+            entry = self._load(key)
+            if entry is None:
+                return
+            if entry.get('synced_hash') != entry['content_hash'] or entry.get('synced_shape') != entry.get('shape'):
+                entry['synced_hash'] = entry['content_hash']
+                entry['synced_shape'] = entry.get('shape')
+                self._save(key, entry)
+
+    def clear(self):
+        """删除所有缓存项（例如数据库重建后）"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.unlink(os.path.join(self.directory, name))
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            'directory': self.directory,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated
+        }
+
+    def _result(self, entry: Dict[str, Any], from_cache: bool) -> CachedResponse:
+        return CachedResponse(
+            body=entry['body'],
+            content_hash=entry['content_hash'],
+            changed=entry['content_hash'] != entry.get('synced_hash'),
+            from_cache=from_cache
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.-]', '_', key) + '.json')
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key: str, entry: Dict[str, Any]):
+        """原子写入：先写临时文件再替换"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
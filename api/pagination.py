@@ -0,0 +1,119 @@
+"""
+分页 - 并发获取分页列表接口的所有页面
+
+先请求第一页并从响应中得到总页数，其余页面在有界并发下同时请求，
+每页到达后立即把解析出的条目交给调用方（不保证页面顺序）。总页数
+未知时按 next 链接逐页请求。
+"""
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# 单次列表最多获取的页数，防止异常的分页信息导致无限请求
+MAX_PAGES = 100
+
+
+@dataclass
+class Page:
+    """一页响应"""
+    number: int
+    data: Any
+    changed: bool = True
+
+
+class Paginator:
+    """分页获取器
+
+    fetch_page: 获取指定页（从1开始）的协程函数，返回 Page
+    page_count: 从第一页的数据中得到总页数，未知时返回None
+    items: 从一页的数据中取出条目列表
+    has_next: 总页数未知时判断一页之后是否还有下一页
+    concurrency: 同时请求的页数上限
+    """
+
+    def __init__(self, fetch_page: Callable[[int], Awaitable[Page]],
+                 page_count: Callable[[Any], Optional[int]], items: Callable[[Any], Iterable[Any]],
+                 has_next: Optional[Callable[[Any], bool]] = None,
+                 concurrency: int = 4, max_pages: int = MAX_PAGES):
+        self.fetch_page = fetch_page
+        self.page_count = page_count
+        self.items = items
+        self.has_next = has_next
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.pages_fetched = 0
+        self.items_fetched = 0
+        self.changed = False
+
+    @property
+    def shape(self) -> Dict[str, int]:
+        """本次获取的页数和条目数，页面内容都未变化时用于发现页面的增减"""
+        return {'pages': self.pages_fetched, 'items': self.items_fetched}
+
+    async def pages(self) -> AsyncIterator[Page]:
+        """按到达顺序产出所有页面"""
+        first = await self.fetch_page(1)
+        self._record(first)
+        yield first
+
+        count = self.page_count(first.data)
+        if count is None and self.has_next is not None:
+            # 总页数未知，只能按 next 链接逐页请求
+            page = first
+            while self.has_next(page.data) and page.number < self.max_pages:
+                page = await self.fetch_page(page.number + 1)
+                self._record(page)
+                yield page
+            return
+
+        total = min(max(int(count or 1), 1), self.max_pages)
+        if total == 1:
+            return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(number: int) -> Page:
+            async with semaphore:
+                return await self.fetch_page(number)
+
+        tasks = [asyncio.ensure_future(fetch(number)) for number in range(2, total + 1)]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                page = await next_page
+                self._record(page)
+                yield page
+        finally:
+            # 调用方提前结束或某一页失败时取消其余请求
+            for task in tasks:
+                task.cancel()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        """按到达顺序产出所有页面中的条目"""
+        async for page in self.pages():
+            for item in self.items(page.data):
+                yield item
+
+    def _record(self, page: Page):
+        self.pages_fetched += 1
+        self.items_fetched += sum(1 for _ in self.items(page.data))
+        self.changed = self.changed or page.changed
+
+
+def pages_from_total(total: Optional[int], per_page: int) -> int:
+    """根据条目总数计算页数"""
+    if not total:
+        return 1
+    return math.ceil(total / per_page)
+
+
+def page_from_url(url: Optional[str]) -> Optional[int]:
+    """从分页链接中取出 page 参数，例如 DigitalOcean 的 links.pages.last"""
+    if not url:
+        return None
+    values = parse_qs(urlsplit(url).query).get('page')
+    try:
+        return int(values[0]) if values else None
+    except ValueError:
+        return None
@@ -0,0 +1,145 @@
+"""
+区域解析器 - 为区域ID确定国家代码
+
+依次尝试:
+1. 区域目录中的精确映射 (provider, region_id)
+2. 云服务商的区域ID模式（如 nyc1、us-ord、cn-hangzhou、na-ashburn），
+   命名组 city / code / country 分别查地名表、城市代码表、国家表
+3. 在云服务商给出的区域名称（如 "Jakarta, ID"、"亚太地区(雅加达)"）中查找地名
+
+都没有结果时返回云服务商的默认国家，并标记为未解析，由收集器写入
+unmapped_regions 表。解析结果按 (provider, region_id, label) 缓存，目录
+重新加载后缓存整体失效；刷新时每个区域的解析为摊还 O(1)。
+"""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .catalog import CompiledCatalog, RegionCatalog, normalize_place, region_catalog
+
+# 解析结果缓存的最大条目数（超过后整体清空）
+MEMO_SIZE = 4096
+
+# 解析来源
+SOURCE_CATALOG = 'catalog'
+SOURCE_PATTERN = 'pattern'
+SOURCE_GAZETTEER = 'gazetteer'
+SOURCE_DEFAULT = 'default'
+
+# 名称中的拉丁字母单词和连续汉字
+_PLACE_TOKENS = re.compile(r'[a-z]+|[一-鿿]+')
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """区域的国家代码及其来源"""
+    country_code: str
+    source: str
+
+    @property
+    def resolved(self) -> bool:
+        return self.source != SOURCE_DEFAULT
+
+
+class RegionResolver:
+    """按目录、ID模式、地名依次解析区域国家代码（带缓存）"""
+
+    def __init__(self, catalog: Optional[RegionCatalog] = None, memo_size: int = MEMO_SIZE):
+        self._catalog = catalog or region_catalog
+        self.memo_size = memo_size
+        self._memo: Dict[Tuple[str, str, str], Resolution] = {}
+        self._compiled: Optional[CompiledCatalog] = None
+        self._lock = threading.Lock()
+
+    def resolve(self, provider: str, region_id: str, label: str = '') -> Resolution:
+        compiled = self._catalog.get()
+        if compiled is not self._compiled:
+            with self._lock:
+                if compiled is not self._compiled:
+                    self._memo = {}
+                    self._compiled = compiled
+
+        key = (provider, region_id, label or '')
+        memo = self._memo
+        resolution = memo.get(key)
+        if resolution is None:
+            resolution = self._resolve(compiled, provider, region_id, label or '')
+            if len(memo) >= self.memo_size:
+                memo.clear()
+            memo[key] = resolution
+        return resolution
+
+    def unmapped(self, provider: str, regions: Iterable[Dict]) -> List[Dict[str, str]]:
+        """收集器返回的区域中未能解析的部分（只检查目录中有的云服务商）"""
+        if provider not in self._catalog.get().provider_regions:
+            return []
+        unmapped = []
+        for region in regions:
+            resolution = self.resolve(provider, region['region_id'], region.get('region_name', ''))
+            if not resolution.resolved:
+                unmapped.append({
+                    'region_id': region['region_id'],
+                    'label': region.get('region_name', ''),
+                    'fallback_country': resolution.country_code
+                })
+        return unmapped
+
+    def _resolve(self, compiled: CompiledCatalog, provider: str, region_id: str, label: str) -> Resolution:
+        region = compiled.region(provider, region_id)
+        if region is not None:
+            return Resolution(region.country_code, SOURCE_CATALOG)
+
+        country_code = self._match_id(compiled, provider, region_id)
+        if country_code:
+            return Resolution(country_code, SOURCE_PATTERN)
+
+        country_code = self._match_label(compiled, label)
+        if country_code:
+            return Resolution(country_code, SOURCE_GAZETTEER)
+
+        return Resolution(compiled.default_countries.get(provider, 'US'), SOURCE_DEFAULT)
+
+    @staticmethod
+    def _match_id(compiled: CompiledCatalog, provider: str, region_id: str) -> Optional[str]:
+        for pattern, fixed in compiled.id_patterns.get(provider, ()):
+            match = pattern.match(region_id.lower())
+            if match is None:
+                continue
+            groups = match.groupdict()
+            if groups.get('city'):
+                country_code = compiled.gazetteer.get(normalize_place(groups['city']))
+                if country_code:
+                    return country_code
+            if groups.get('code'):
+                country_code = compiled.city_codes.get(groups['code'])
+                if country_code:
+                    return country_code
+            if groups.get('country'):
+                country = compiled.countries.get(groups['country'].upper())
+                if country is not None:
+                    return country.country_code
+            if fixed:
+                return fixed
+        return None
+
+    @staticmethod
+    def _match_label(compiled: CompiledCatalog, label: str) -> Optional[str]:
+        """在区域名称中查找地名（先查两个单词的地名，如 "sao paulo"）"""
+        if not label:
+            return None
+        tokens = _PLACE_TOKENS.findall(normalize_place(label))
+        gazetteer = compiled.gazetteer
+        for first, second in zip(tokens, tokens[1:]):
+            country_code = gazetteer.get(f'{first} {second}')
+            if country_code:
+                return country_code
+        for token in tokens:
+            country_code = gazetteer.get(token)
+            if country_code:
+                return country_code
+        return None
+
+
+# 全局解析器实例
+region_resolver = RegionResolver()
@@ -0,0 +1,160 @@
+"""
+云服务商注册表 - 按名称发现并延迟加载云服务商客户端
+
+内置云服务商以 "模块:类名" 登记，第三方云服务商通过
+importlib.metadata 的入口点（cloud_az.providers 组）注册，例如:
+
+    [project.entry-points."cloud_az.providers"]
+    vultr = "cloud_az_vultr:VultrAPI"
+
+列出名称不会导入任何客户端模块；只有真正执行收集时才导入并创建客户端。
+客户端需要接受 http_cache 关键字参数，并提供 fetch_regions(only_changed=False)
+和 cache_key。新的云服务商还需要在 providers 表中有对应记录才会写入数据库。
+"""
+import importlib
+import threading
+from collections.abc import Mapping
+from importlib import metadata
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+ENTRY_POINT_GROUP = 'cloud_az.providers'
+
+# 内置云服务商（名称 -> "模块:类名"）
+BUILTIN_PROVIDERS: Dict[str, str] = {
+    'linode': 'api.linode_api:LinodeAPI',
+    'digitalocean': 'api.digitalocean_api:DigitalOceanAPI',
+    'aliyun': 'api.aliyun_api:AliyunAPI',
+    'tencent': 'api.tencent_api:TencentAPI'
+}
+
+
+class UnknownProviderError(ValueError):
+    """请求了未注册的云服务商"""
+
+
+def _import_target(target: str) -> Any:
+    module_name, _, attr = target.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, attr) if attr else module
+
+
+class ProviderRegistry:
+    """云服务商注册表
+
+    builtins: 内置云服务商，同名的入口点不会覆盖内置实现
+    group: 入口点组名，None表示不发现第三方云服务商
+    """
+
+    def __init__(self, builtins: Optional[Dict[str, str]] = None,
+                 group: Optional[str] = ENTRY_POINT_GROUP):
+        self.builtins = dict(BUILTIN_PROVIDERS if builtins is None else builtins)
+        self.group = group
+        self._specs: Optional[Dict[str, Any]] = None
+        self._factories: Dict[str, Callable[..., Any]] = {}
+        self._lock = threading.Lock()
+
+    def _discover(self) -> Dict[str, Any]:
+        """合并内置云服务商和入口点（只读取元数据，不导入模块）"""
+        if self._specs is None:
+            with self._lock:
+                if self._specs is None:
+                    specs: Dict[str, Any] = {}
+                    if self.group:
+                        try:
+                            for entry_point in metadata.entry_points(group=self.group):
+                                specs[entry_point.name] = entry_point
+                        except Exception as e:
+                            print(f"Provider entry point discovery failed: {e}")
+                    specs.update(self.builtins)
+                    self._specs = specs
+        return self._specs
+
+    def names(self) -> List[str]:
+        """所有已注册的云服务商名称（内置的在前）"""
+        specs = self._discover()
+        return list(self.builtins) + sorted(name for name in specs if name not in self.builtins)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._discover()
+
+    def register(self, name: str, target: Any):
+        """登记云服务商，target 为 "模块:类名"、入口点或可调用的工厂"""
+        specs = self._discover()
+        with self._lock:
+            specs[name] = target
+            self._factories.pop(name, None)
+
+    def select(self, providers: Optional[Iterable[str]] = None) -> List[str]:
+        """校验并规范化云服务商子集，None表示全部；包含未注册的名称时抛出 UnknownProviderError"""
+        names = self.names()
+        if providers is None:
+            return names
+        wanted = set(providers)
+        unknown = sorted(wanted.difference(names))
+        if unknown:
+            raise UnknownProviderError(f"Unknown provider: {', '.join(unknown)}")
+        return [name for name in names if name in wanted]
+
+    def factory(self, name: str) -> Callable[..., Any]:
+        """导入并返回云服务商的客户端类（或工厂），结果缓存"""
+        factory = self._factories.get(name)
+        if factory is not None:
+            return factory
+        spec = self._discover().get(name)
+        if spec is None:
+            raise UnknownProviderError(f'Unknown provider: {name}')
+        if isinstance(spec, str):
+            factory = _import_target(spec)
+        elif isinstance(spec, metadata.EntryPoint):
+            factory = spec.load()
+        else:
+            factory = spec
+        self._factories[name] = factory
+        return factory
+
+    def create(self, name: str, **kwargs) -> Any:
+        """创建云服务商客户端"""
+        return self.factory(name)(**kwargs)
+
+    def loaded(self) -> List[str]:
+        """已导入的云服务商"""
+        return sorted(self._factories)
+
+
+class ProviderClients(Mapping):
+    """按需创建客户端的映射（名称 -> 客户端），首次访问时才导入对应模块"""
+
+    def __init__(self, registry: ProviderRegistry, **client_kwargs):
+        self.registry = registry
+        self.client_kwargs = client_kwargs
+        self._clients: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        client = self._clients.get(name)
+        if client is None:
+            if name not in self.registry:
+                raise KeyError(name)
+            client = self.registry.create(name, **self.client_kwargs)
+            self._clients[name] = client
+        return client
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and name in self.registry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.registry.names())
+
+    def __len__(self) -> int:
+        return len(self.registry.names())
+
+    def peek(self, name: str) -> Optional[Any]:
+        """返回已创建的客户端，不会创建新客户端"""
+        return self._clients.get(name)
+
+    def created(self) -> List[str]:
+        """已创建客户端的云服务商"""
+        return list(self._clients)
+
+
+# 进程内共享的注册表
+provider_registry = ProviderRegistry()
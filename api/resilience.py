@@ -0,0 +1,196 @@
+"""
+容错策略 - 云服务商API调用的重试、熔断
+
+- 重试：连接错误、超时、429和5xx等临时错误按指数退避重试，退避时间加入随机抖动
+- 熔断：某个云服务商连续失败达到阈值后熔断，一段时间内直接跳过该云服务商，
+  冷却结束后放行一次试探调用，成功则恢复
+- 熔断器状态变化记录为事件，由收集器写入 update_logs
+
+熔断器保存在进程内（每次刷新都会创建新的收集器，熔断状态需要跨刷新保留）。
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import requests
+
+from .telemetry import current_metrics
+
+T = TypeVar('T')
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """云服务商已熔断，本次调用被跳过"""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """是否为值得重试的临时错误"""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return False
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """指数退避重试策略（full jitter）"""
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def __post_init__(self):
+        # 至少调用一次，否则 call() 不执行请求直接返回None
+        if self.attempts < 1:
+            raise ValueError(f'RetryPolicy.attempts must be at least 1, got {self.attempts}')
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次（从0开始）失败后的等待时间"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """单个云服务商的熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 300.0,
+                 on_transition: Optional[Callable[[str, str, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_transition = on_transition
+        self.clock = clock
+        self.failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """当前状态（熔断冷却结束后变为半开）"""
+        with self._lock:
+            self._check_cooldown()
+            return self._state
+
+    def allow(self) -> bool:
+        """是否允许本次调用（半开状态下只放行一次试探调用）"""
+        with self._lock:
+            self._check_cooldown()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._transition(OPEN)
+
+    def _check_cooldown(self):
+        if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        previous, self._state = self._state, state
+        if self.on_transition is not None:
+            self.on_transition(self.name, previous, state)
+
+
+class ResiliencePolicy:
+    """按云服务商管理熔断器并执行带重试的调用"""
+
+    def __init__(self, retry: RetryPolicy = RetryPolicy(), failure_threshold: int = 3,
+                 reset_timeout: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.retry = retry
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._events: List[Tuple[str, str, str]] = []
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """获取云服务商的熔断器"""
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(
+                    provider, self.failure_threshold, self.reset_timeout,
+                    on_transition=self._record_event, clock=self.clock
+                )
+            return self._breakers[provider]
+
+    async def call(self, provider: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """通过熔断器调用 fn，临时错误按退避策略重试"""
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(f'Circuit open for {provider}')
+
+        try:
+            for attempt in range(self.retry.attempts):
+                try:
+                    result = await fn()
+                except Exception as e:
+                    if attempt + 1 >= self.retry.attempts or not is_transient(e):
+                        raise
+                    delay = self.retry.delay(attempt)
+                    print(f"Retrying {provider} in {delay:.2f}s after error: {e}")
+                    metrics = current_metrics()
+                    if metrics is not None:
+                        metrics.retries += 1
+                    await asyncio.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return result
+        except BaseException:
+            # 包括超过刷新截止时间被取消（CancelledError）：按失败记录，
+            # 同时清除半开状态的试探标记，否则熔断器之后不会再放行任何调用
+            breaker.record_failure()
+            raise
+
+    def drain_events(self) -> List[Tuple[str, str, str]]:
+        """取出尚未记录的熔断器状态变化 (云服务商, 原状态, 新状态)"""
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def stats(self) -> Dict[str, Any]:
+        """获取各云服务商的熔断器状态"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: {'state': b.state, 'failures': b.failures} for b in breakers}
+
+    def _record_event(self, provider: str, previous: str, state: str):
+        print(f"Circuit breaker for {provider}: {previous} -> {state}")
+        with self._lock:
+            self._events.append((provider, previous, state))
+
+
+# 全局共享的容错策略
+provider_resilience = ResiliencePolicy(
+    retry=RetryPolicy(attempts=max(1, int(os.getenv('RETRY_ATTEMPTS', '3')))),
+    failure_threshold=int(os.getenv('BREAKER_THRESHOLD', '3')),
+    reset_timeout=float(os.getenv('BREAKER_RESET_TIMEOUT', '300'))
+)
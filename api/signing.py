@@ -0,0 +1,233 @@
+"""
+请求签名 - 阿里云RPC签名和腾讯云TC3签名
+
+每个云服务商的签名器在构造时预先计算与单次请求无关的部分（规范请求头、
+已编码的公共参数、HMAC密钥状态），单次签名只处理变化的部分：
+
+- 腾讯云TC3：日期→服务→tc3_request 的派生密钥按UTC日期缓存，同一天内
+  的请求复用同一个已初始化的HMAC状态
+- 阿里云：公共参数预先编码为 key=value 片段，HMAC-SHA1 的密钥状态只初始化一次
+
+签名器是线程安全的，可以在批量请求时一次签好多个请求（sign_batch）。
+"""
+import base64
+import hashlib
+import hmac
+import itertools
+import os
+import threading
+import time
+import uuid
+import urllib.parse
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+EMPTY_JSON = '{}'
+# 阿里云签名器缓存的已编码参数片段数量上限
+PIECE_CACHE_SIZE = 4096
+
+
+def _quote(value: Any) -> str:
+    """按阿里云和RFC 3986的要求做百分号编码（只保留非保留字符）"""
+    return urllib.parse.quote(str(value), safe='~')
+
+
+class TencentRequest(NamedTuple):
+    """待签名的腾讯云请求"""
+    action: str
+    payload: str = EMPTY_JSON
+    region: Optional[str] = None
+
+
+class TC3Signer:
+    """腾讯云 TC3-HMAC-SHA256 签名器
+
+    派生密钥只依赖UTC日期，按天缓存；规范请求头中除 action 和时间戳外的
+    部分在构造时拼好。
+    """
+
+    algorithm = 'TC3-HMAC-SHA256'
+
+    def __init__(self, secret_id: Optional[str], secret_key: Optional[str],
+                 service: str, host: str, version: str,
+                 clock: Callable[[], float] = time.time):
+        self.secret_id = secret_id
+        self.secret_key = secret_key
+        self.service = service
+        self.host = host
+        self.version = version
+        self.clock = clock
+        self.content_type = 'application/json; charset=utf-8'
+        self.signed_headers = 'content-type;host;x-tc-action;x-tc-timestamp;x-tc-version'
+        self._canonical_prefix = f'POST\n/\n\ncontent-type:{self.content_type}\nhost:{host}\n'
+        self._canonical_suffix = f'x-tc-version:{version}\n\n{self.signed_headers}\n'
+        self._payload_hashes = {EMPTY_JSON: hashlib.sha256(EMPTY_JSON.encode('utf-8')).hexdigest()}
+        self._lock = threading.Lock()
+        self._day_key: Optional[Tuple[str, Any]] = None
+        self.derivations = 0
+
+    def signing_hmac(self, date: str):
+        """返回某UTC日期的派生密钥对应的HMAC状态（按天缓存），调用方需先copy()"""
+        cached = self._day_key
+        if cached is not None and cached[0] == date:
+            return cached[1]
+        with self._lock:
+            cached = self._day_key
+            if cached is None or cached[0] != date:
+                def sign(key: bytes, msg: str) -> bytes:
+                    return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+
+                secret_date = sign(('TC3' + self.secret_key).encode('utf-8'), date)
+                secret_service = sign(secret_date, self.service)
+                secret_signing = sign(secret_service, 'tc3_request')
+                cached = (date, hmac.new(secret_signing, digestmod=hashlib.sha256))
+                self._day_key = cached
+                self.derivations += 1
+            return cached[1]
+
+    def sign(self, action: str, payload: str = EMPTY_JSON, region: Optional[str] = None,
+             timestamp: Optional[int] = None) -> Dict[str, str]:
+        """签名一个请求，返回完整的请求头"""
+        timestamp = int(self.clock()) if timestamp is None else timestamp
+        date = time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+        hashed_payload = self._payload_hashes.get(payload)
+        if hashed_payload is None:
+            hashed_payload = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        canonical_request = (
+            f'{self._canonical_prefix}x-tc-action:{action.lower()}\n'
+            f'x-tc-timestamp:{timestamp}\n{self._canonical_suffix}{hashed_payload}'
+        )
+
+        credential_scope = f'{date}/{self.service}/tc3_request'
+        string_to_sign = (
+            f'{self.algorithm}\n{timestamp}\n{credential_scope}\n'
+            f'{hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()}'
+        )
+
+        mac = self.signing_hmac(date).copy()
+        mac.update(string_to_sign.encode('utf-8'))
+        authorization = (
+            f'{self.algorithm} Credential={self.secret_id}/{credential_scope}, '
+            f'SignedHeaders={self.signed_headers}, Signature={mac.hexdigest()}'
+        )
+
+        headers = {
+            'Authorization': authorization,
+            'Content-Type': self.content_type,
+            'Host': self.host,
+            'X-TC-Action': action,
+            'X-TC-Timestamp': str(timestamp),
+            'X-TC-Version': self.version
+        }
+        if region:
+            headers['X-TC-Region'] = region
+        return headers
+
+    def sign_batch(self, requests: Iterable[TencentRequest],
+                   timestamp: Optional[int] = None) -> List[Dict[str, str]]:
+        """使用同一时间戳批量签名多个请求"""
+        timestamp = int(self.clock()) if timestamp is None else timestamp
+        return [self.sign(r.action, r.payload, r.region, timestamp=timestamp) for r in requests]
+
+
+class AliyunRequest(NamedTuple):
+    """待签名的阿里云请求"""
+    action: str
+    params: Optional[Dict[str, Any]] = None
+
+
+class AliyunSigner:
+    """阿里云RPC风格（HMAC-SHA1，签名版本1.0）GET请求签名器
+
+    公共参数在构造时编码为 key=value 片段，HMAC密钥状态在首次签名时初始化。
+    """
+
+    def __init__(self, access_key_id: Optional[str], access_key_secret: Optional[str],
+                 endpoint: str, version: str = '2014-05-26',
+                 clock: Callable[[], float] = time.time):
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.endpoint = endpoint
+        self.version = version
+        self.clock = clock
+        self._common = {
+            'AccessKeyId': access_key_id,
+            'Format': 'JSON',
+            'SignatureMethod': 'HMAC-SHA1',
+            'SignatureVersion': '1.0',
+            'Version': version
+        }
+        # 每个参数预先编码为 (URL中的片段, 待签名字符串中再次编码的片段)
+        self._piece_cache: Dict[Tuple[str, Any], Tuple[str, str]] = {}
+        self._common_pieces = {
+            key: self._piece(key, value) for key, value in self._common.items()
+        }
+        self._string_to_sign_prefix = f'GET&{_quote("/")}&'
+        self._mac = None
+        # 随机数 = 实例随机前缀 + 进程号 + 递增计数，同一时刻的并发请求也不会重复
+        self._nonce_prefix = uuid.uuid4().hex[:16]
+        self._nonce_counter = itertools.count()
+        self._timestamp: Tuple[int, str] = (-1, '')
+
+    def _piece(self, key: str, value: Any) -> Tuple[str, str]:
+        """编码一个参数（action、RegionId 等取值有限，结果缓存）"""
+        cache_key = (key, value)
+        piece = self._piece_cache.get(cache_key)
+        if piece is None:
+            encoded = f'{_quote(key)}={_quote(value)}'
+            piece = (encoded, _quote(encoded))
+            if len(self._piece_cache) >= PIECE_CACHE_SIZE:
+                self._piece_cache.clear()
+            self._piece_cache[cache_key] = piece
+        return piece
+
+    def _next_nonce(self) -> str:
+        return f'{self._nonce_prefix}{os.getpid()}-{next(self._nonce_counter)}'
+
+    def _nonce_piece(self, nonce: Optional[str]) -> Tuple[str, str]:
+        if nonce is not None:
+            encoded = f'SignatureNonce={_quote(nonce)}'
+            return encoded, _quote(encoded)
+        # 自动生成的随机数只含字母、数字和'-'，不需要编码
+        nonce = self._next_nonce()
+        return f'SignatureNonce={nonce}', f'SignatureNonce%3D{nonce}'
+
+    def _current_timestamp(self) -> str:
+        """ISO 8601 UTC 时间戳，同一秒内复用格式化结果"""
+        now = int(self.clock())
+        cached = self._timestamp
+        if cached[0] != now:
+            cached = (now, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)))
+            self._timestamp = cached
+        return cached[1]
+
+    def _base_mac(self):
+        """签名密钥对应的HMAC状态（只初始化一次），调用方需先copy()"""
+        if self._mac is None:
+            self._mac = hmac.new((self.access_key_secret + '&').encode(), digestmod=hashlib.sha1)
+        return self._mac
+
+    def sign_url(self, action: str, params: Optional[Dict[str, Any]] = None,
+                 timestamp: Optional[str] = None, nonce: Optional[str] = None) -> str:
+        """签名一个请求，返回带签名的完整URL"""
+        if timestamp is None:
+            timestamp = self._current_timestamp()
+        pieces = dict(self._common_pieces)
+        pieces['Action'] = self._piece('Action', action)
+        pieces['SignatureNonce'] = self._nonce_piece(nonce)
+        pieces['Timestamp'] = self._piece('Timestamp', timestamp)
+        for key, value in (params or {}).items():
+            pieces[key] = self._piece(key, value)
+
+        ordered = [pieces[key] for key in sorted(pieces)]
+        query_string = '&'.join(piece for piece, _ in ordered)
+        # 待签名字符串是整个查询串的再次编码，等于各片段的再次编码以 %26 连接
+        mac = self._base_mac().copy()
+        mac.update((self._string_to_sign_prefix + '%26'.join(signed for _, signed in ordered)).encode())
+        signature = base64.b64encode(mac.digest()).decode()
+        return f'{self.endpoint}?{query_string}&Signature={_quote(signature)}'
+
+    def sign_batch(self, requests: Iterable[AliyunRequest]) -> List[str]:
+        """使用同一时间戳批量签名多个请求（每个请求的随机数不同）"""
+        timestamp = self._current_timestamp()
+        return [self.sign_url(r.action, r.params, timestamp=timestamp) for r in requests]
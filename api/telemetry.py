@@ -0,0 +1,113 @@
+"""
+收集遥测 - 记录每次刷新中各云服务商的耗时、响应大小和写入行数
+
+收集器为每个云服务商的任务设置当前的 ProviderMetrics（contextvars，
+asyncio任务创建时复制上下文，各云服务商互不干扰），传输层和容错策略
+在请求完成、重试时向其中累加数据：
+
+- 请求数、响应字节数、首字节时间（requests 的 Response.elapsed，从发送
+  请求到解析完响应头，新连接时包含建连时间；requests 不单独提供DNS和
+  建连耗时）
+- 网络时间：至少有一个请求在进行中的墙钟时间（并发分页不会重复计算）
+- 解析时间：客户端通过 decode_json 解码响应JSON的耗时
+- 其他时间：获取总时间减去网络和解析时间（重试等待、并发限制的排队、
+  签名、读取缓存、事件循环调度等）
+- 重试次数
+"""
+import contextvars
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+_current: contextvars.ContextVar[Optional['ProviderMetrics']] = contextvars.ContextVar(
+    'collection_metrics', default=None
+)
+
+
+@dataclass
+class ProviderMetrics:
+    """一次收集中单个云服务商的指标（时间单位为毫秒）"""
+    provider: str
+    status: str = 'running'
+    started_at: float = field(default_factory=time.time)
+    fetch_ms: float = 0.0
+    network_ms: float = 0.0
+    parse_ms: float = 0.0
+    overhead_ms: float = 0.0
+    ttfb_ms: Optional[float] = None
+    requests: int = 0
+    retries: int = 0
+    response_bytes: int = 0
+    rows_diffed: int = 0
+    rows_written: int = 0
+    db_write_ms: float = 0.0
+    _in_flight: int = field(default=0, repr=False)
+    _busy_since: float = field(default=0.0, repr=False)
+    _fetch_started: float = field(default_factory=time.perf_counter, repr=False)
+    _fetch_done: bool = field(default=False, repr=False)
+
+    @property
+    def total_ms(self) -> float:
+        """获取与写入数据库的总耗时"""
+        return self.fetch_ms + self.db_write_ms
+
+    def request_started(self):
+        if self._in_flight == 0:
+            self._busy_since = time.perf_counter()
+        self._in_flight += 1
+
+    def request_finished(self, response: Any = None):
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self.network_ms += (time.perf_counter() - self._busy_since) * 1000
+        self.requests += 1
+        if response is None:
+            return
+        content = getattr(response, 'content', None)
+        if isinstance(content, (bytes, str)):
+            self.response_bytes += len(content)
+        elapsed = getattr(response, 'elapsed', None)
+        if hasattr(elapsed, 'total_seconds'):
+            # 多个请求时记录最慢的首字节时间
+            self.ttfb_ms = max(self.ttfb_ms or 0.0, elapsed.total_seconds() * 1000)
+
+    def finish_fetch(self, status: Optional[str] = None):
+        """记录获取阶段结束（只记录第一次，超时取消后的清理不会覆盖）"""
+        if self._fetch_done:
+            return
+        self._fetch_done = True
+        if status is not None:
+            self.status = status
+        self.fetch_ms = (time.perf_counter() - self._fetch_started) * 1000
+        self.overhead_ms = max(self.fetch_ms - self.network_ms - self.parse_ms, 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {k: v for k, v in asdict(self).items() if not k.startswith('_')}
+        data['total_ms'] = self.total_ms
+        return data
+
+
+def current_metrics() -> Optional[ProviderMetrics]:
+    """当前任务正在记录的云服务商指标（不在收集中时为None）"""
+    return _current.get()
+
+
+def decode_json(response: Any) -> Any:
+    """调用 response.json() 解码响应，收集过程中把解码耗时计入 parse_ms"""
+    metrics = _current.get()
+    if metrics is None:
+        return response.json()
+    started = time.perf_counter()
+    try:
+        return response.json()
+    finally:
+        metrics.parse_ms += (time.perf_counter() - started) * 1000
+
+
+def bind_metrics(metrics: ProviderMetrics) -> contextvars.Token:
+    """把指标绑定到当前上下文（在云服务商的收集任务中调用）"""
+    return _current.set(metrics)
+
+
+def unbind_metrics(token: contextvars.Token):
+    _current.reset(token)
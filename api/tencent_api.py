@@ -1,22 +1,15 @@
 import os
-import asyncio
-import requests
-import hashlib
-import hmac
-import json
-import time
-from typing import List, Dict, Any
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional
 from .region_mapper import region_mapper, CloudProvider
-
-# 加载环境变量
-load_dotenv()
+from .signing import TC3Signer
+from .telemetry import decode_json
+from .transport import http_transport
 
 
 class TencentAPI:
     """腾讯云API客户端"""
     
-    def __init__(self):
+    def __init__(self, transport=None, http_cache=None):
         """初始化腾讯云API客户端"""
         self.secret_id = os.getenv('TENCENT_SECRET_ID')
         self.secret_key = os.getenv('TENCENT_SECRET_KEY')
@@ -24,84 +17,105 @@ class TencentAPI:
         self.service = 'cvm'
         self.version = '2017-03-12'
         self.action = 'DescribeRegions'
+        self._signer = None
+        self.transport = transport or http_transport
+        self.http_cache = http_cache
+        self.cache_key = 'tencent:regions'
+        self.cache_keys = [self.cache_key]
     
-    async def fetch_regions(self) -> List[Dict[str, Any]]:
-        """获取腾讯云可用区域列表"""
-        try:
-            # 生成请求头和签名
-            headers = self._generate_headers()
-            payload = '{}'
-            
-            # 使用asyncio在线程池中运行同步请求
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post(
-                    self.endpoint,
-                    headers=headers,
-                    data=payload,
-                    timeout=30
-                )
-            )
-            
+    @property
+    def signer(self) -> TC3Signer:
+        """签名器（缓存派生密钥），凭据变化时重新创建"""
+        signer = self._signer
+        if signer is None or (signer.secret_id, signer.secret_key) != (self.secret_id, self.secret_key):
+            signer = TC3Signer(self.secret_id, self.secret_key, self.service,
+                               'cvm.tencentcloudapi.com', self.version)
+            self._signer = signer
+        return signer
+    
+    async def fetch_regions(self, only_changed: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """获取腾讯云可用区域列表
+
+        only_changed 为True且响应内容与上次写入数据库的一致时返回None。
+        请求失败时抛出异常，由收集器的容错策略处理。
+        """
+        if self.http_cache is None:
+            response = await self._send()
             response.raise_for_status()
-            data = response.json()
-            
-            regions = []
-            if 'Response' in data and 'RegionSet' in data['Response']:
-                for region in data['Response']['RegionSet']:
-                    if region.get('RegionState') == 'AVAILABLE':
-                        regions.append({
-                            'region_id': region['Region'],
-                            'region_name': region['RegionName'],
-                            'country_code': region_mapper.get_country_code(CloudProvider.TENCENT, region['Region']),
-                            'raw_data': region
-                        })
-            
-            return regions
-            
-        except Exception as e:
-            print(f"Error fetching Tencent regions: {e}")
-            return []
+            data = decode_json(response)
+        else:
+            # 签名API不支持条件请求，在TTL内直接使用缓存的响应
+            cached = await self.http_cache.fetch(
+                self.cache_key,
+                lambda extra: self._send(),
+                conditional=False,
+                ignore_keys=('RequestId',)
+            )
+            if only_changed and not cached.changed:
+                return None
+            data = decode_json(cached)
+        
+        regions = []
+        if 'Response' in data and 'RegionSet' in data['Response']:
+            for region in data['Response']['RegionSet']:
+                if region.get('RegionState') == 'AVAILABLE':
+                    regions.append({
+                        'region_id': region['Region'],
+                        'region_name': region['RegionName'],
+                        'country_code': region_mapper.get_country_code(CloudProvider.TENCENT, region['Region'], region['RegionName']),
+                        'raw_data': region
+                    })
+        
+        # 本次获取涉及的缓存键，可用区请求会追加各自的键
+        self.cache_keys = [self.cache_key]
+        return regions
     
-    def _generate_headers(self) -> Dict[str, str]:
-        """生成腾讯云API请求头和签名"""
-        timestamp = int(time.time())
-        date = time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+    async def fetch_zones(self, region_id: str, only_changed: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """获取指定区域的可用区列表（DescribeZones）
+
+        only_changed 为True且响应内容与上次写入数据库的一致时返回None。
+        请求失败时抛出异常。
+        """
+        def send(extra):
+            # 签名API不发送条件请求头，extra 不使用
+            return self._send('DescribeZones', region_id)
         
-        # 步骤1：拼接规范请求串
-        http_request_method = 'POST'
-        canonical_uri = '/'
-        canonical_querystring = ''
-        canonical_headers = f'content-type:application/json; charset=utf-8\nhost:cvm.tencentcloudapi.com\nx-tc-action:{self.action.lower()}\nx-tc-timestamp:{timestamp}\nx-tc-version:{self.version}\n'
-        signed_headers = 'content-type;host;x-tc-action;x-tc-timestamp;x-tc-version'
+        if self.http_cache is None:
+            response = await send(None)
+            response.raise_for_status()
+            data = decode_json(response)
+        else:
+            key = f'tencent:zones:{region_id}'
+            cached = await self.http_cache.fetch(
+                key, send, conditional=False, ignore_keys=('RequestId',)
+            )
+            self.cache_keys.append(key)
+            if only_changed and not cached.changed:
+                return None
+            data = decode_json(cached)
+        
+        zones = []
+        for zone in data.get('Response', {}).get('ZoneSet', []):
+            if zone.get('ZoneState') == 'AVAILABLE':
+                zones.append({
+                    'zone_id': zone['Zone'],
+                    'zone_name': zone.get('ZoneName') or zone['Zone']
+                })
+        
+        return zones
+    
+    async def _send(self, action: Optional[str] = None, region: Optional[str] = None):
+        """生成签名并通过共享的长连接传输发送请求"""
+        headers = self._generate_headers(action, region)
         payload = '{}'
-        hashed_request_payload = hashlib.sha256(payload.encode('utf-8')).hexdigest()
-        canonical_request = f'{http_request_method}\n{canonical_uri}\n{canonical_querystring}\n{canonical_headers}\n{signed_headers}\n{hashed_request_payload}'
-
-        # 步骤2：拼接待签名字符串
-        algorithm = 'TC3-HMAC-SHA256'
-        credential_scope = f'{date}/{self.service}/tc3_request'
-        hashed_canonical_request = hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
-        string_to_sign = f'{algorithm}\n{timestamp}\n{credential_scope}\n{hashed_canonical_request}'
-
-        # 步骤3：计算签名
-        def sign(key, msg):
-            return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
-
-        secret_date = sign(('TC3' + self.secret_key).encode('utf-8'), date)
-        secret_service = sign(secret_date, self.service)
-        secret_signing = sign(secret_service, 'tc3_request')
-        signature = hmac.new(secret_signing, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
-
-        # 步骤4：拼接Authorization
-        authorization = f'{algorithm} Credential={self.secret_id}/{credential_scope}, SignedHeaders={signed_headers}, Signature={signature}'
-
-        return {
-            'Authorization': authorization,
-            'Content-Type': 'application/json; charset=utf-8',
-            'Host': 'cvm.tencentcloudapi.com',
-            'X-TC-Action': self.action,
-            'X-TC-Timestamp': str(timestamp),
-            'X-TC-Version': self.version
-        }
+        return await self.transport.post(
+            'tencent',
+            self.endpoint,
+            headers=headers,
+            data=payload
+        )
+    
+    def _generate_headers(self, action: Optional[str] = None,
+                          region: Optional[str] = None) -> Dict[str, str]:
+        """生成腾讯云API请求头和签名"""
+        return self.signer.sign(action or self.action, region=region)
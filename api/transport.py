@@ -0,0 +1,156 @@
+"""
+HTTP传输层 - 所有云服务商客户端共享的连接池
+
+每个主机使用一个长连接的 requests.Session（keep-alive，复用TCP/TLS连接），
+同步请求在专用的有界线程池中执行，每个云服务商有独立的并发上限，
+避免单个云服务商的大量请求占满线程池。
+"""
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .telemetry import current_metrics
+
+# 默认每个云服务商同时进行的请求数
+DEFAULT_PROVIDER_LIMIT = 4
+
+# 默认请求超时（连接超时, 读取超时）
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class HttpTransport:
+    """共享的HTTP传输
+
+    max_workers: 线程池大小（所有云服务商共享）
+    provider_limits: 各云服务商的并发上限，未配置的使用 default_limit
+    pool_maxsize: 每个主机保持的最大空闲连接数
+    """
+
+    def __init__(self, max_workers: int = 16, provider_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEFAULT_PROVIDER_LIMIT, pool_maxsize: int = 8,
+                 timeout=DEFAULT_TIMEOUT):
+        self.max_workers = max_workers
+        self.provider_limits = dict(provider_limits or {})
+        self.default_limit = default_limit
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sessions: Dict[Tuple[str, str], requests.Session] = {}
+        # 每个事件循环各自的信号量（asyncio信号量不能跨事件循环使用）
+        self._semaphores: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+        self.requests = 0
+
+    async def get(self, provider: str, url: str, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return await self._send(provider, 'get', url, **kwargs)
+
+    async def post(self, provider: str, url: str, **kwargs) -> requests.Response:
+        """发送POST请求"""
+        return await self._send(provider, 'post', url, **kwargs)
+
+    def limit_for(self, provider: str) -> int:
+        """获取云服务商的并发上限"""
+        return self.provider_limits.get(provider, self.default_limit)
+
+    def stats(self) -> Dict[str, object]:
+        """获取传输层统计信息"""
+        return {
+            'max_workers': self.max_workers,
+            'hosts': sorted(f'{scheme}://{host}' for scheme, host in self._sessions),
+            'requests': self.requests
+        }
+
+    def close(self):
+        """关闭所有连接和线程池"""
+        with self._lock:
+            if self._pid == os.getpid():
+                for session in self._sessions.values():
+                    session.close()
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+            self._sessions = {}
+            self._executor = None
+            self._pid = None
+
+    async def _send(self, provider: str, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        session = self._session_for(url)
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+
+        async with self._semaphore(loop, provider):
+            self.requests += 1
+            call = getattr(session, method)
+            # 收集过程中记录请求数、响应大小和首字节时间
+            metrics = current_metrics()
+            if metrics is None:
+                return await loop.run_in_executor(executor, lambda: call(url, **kwargs))
+            metrics.request_started()
+            response = None
+            try:
+                response = await loop.run_in_executor(executor, lambda: call(url, **kwargs))
+                return response
+            finally:
+                metrics.request_finished(response)
+
+    def _semaphore(self, loop, provider: str) -> asyncio.Semaphore:
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if provider not in semaphores:
+                semaphores[provider] = asyncio.Semaphore(self.limit_for(provider))
+            return semaphores[provider]
+
+    def _reset_after_fork(self):
+        """fork后的子进程不能复用父进程的连接和线程（调用方需持有锁）"""
+        if self._pid != os.getpid():
+            self._sessions = {}
+            self._executor = None
+            self._pid = os.getpid()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            self._reset_after_fork()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='http-transport'
+                )
+            return self._executor
+
+    def _session_for(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self._lock:
+            self._reset_after_fork()
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount(f'{parts.scheme}://', adapter)
+                self._sessions[key] = session
+            return session
+
+
+def _provider_limits_from_env() -> Dict[str, int]:
+    """从环境变量读取并发上限，例如 HTTP_LIMIT_ALIYUN=8"""
+    limits = {}
+    for provider in ('linode', 'digitalocean', 'aliyun', 'tencent'):
+        value = os.getenv(f'HTTP_LIMIT_{provider.upper()}')
+        if value:
+            limits[provider] = int(value)
+    return limits
+
+
+# 全局共享的传输实例
+http_transport = HttpTransport(
+    max_workers=int(os.getenv('HTTP_MAX_WORKERS', '16')),
+    provider_limits=_provider_limits_from_env()
+)
@@ -1,15 +1,56 @@
 import os
-import asyncio
-from datetime import datetime
-from flask import Flask, jsonify, render_template, request
+import hashlib
+from datetime import datetime, timezone
+from itertools import combinations
+from flask import Flask, Response, jsonify, render_template, request, g, url_for
 from flask_cors import CORS
 from dotenv import load_dotenv
 from database.models import DatabaseManager, Provider, Country, AvailabilityZone
-from api.cloud_collector import CloudAPICollector
+from database.wal import WalCheckpointer
+import sys
+from api.http_cache import HttpResponseCache, DEFAULT_TTL
+from api.catalog import region_catalog
+from api.registry import UnknownProviderError, provider_registry
+from services.response_cache import ResponseCache, normalize_list_arg
+from services.payload_store import PayloadStore, ENCODING_PREFERENCE, negotiate_encoding
+from services.spatial_index import RegionSpatialIndex
+from services.refresh_jobs import RefreshJobManager
+from services.scheduler import create_scheduler
 
 # 加载环境变量
 load_dotenv()
 
+# /api/regions/nearest 单次返回的最大区域数
+MAX_NEAREST = 100
+
+# /api/distance/matrix 返回完整矩阵时的最大区域数（更多区域请按云服务商筛选）
+MAX_MATRIX_REGIONS = 1000
+
+# 决定响应内容结构的源文件：部署新版本后旧的ETag / Last-Modified 不再命中
+RESPONSE_SOURCES = ('app.py', 'database/models.py', 'database/stats.py', 'services/payload_store.py')
+
+
+def _response_version():
+    """由响应相关源文件计算 (内容摘要, 最后修改时间)"""
+    base = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    mtime = 0
+    for name in RESPONSE_SOURCES:
+        path = os.path.join(base, name)
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        mtime = max(mtime, int(os.path.getmtime(path)))
+    return digest.hexdigest()[:8], mtime
+
+
+RESPONSE_VERSION, RESPONSE_MTIME = _response_version()
+
+# 支持条件请求（ETag / Last-Modified）的只读接口
+CONDITIONAL_ENDPOINTS = frozenset([
+    'get_regions', 'get_countries', 'get_providers',
+    'get_stats', 'get_color_mapping', 'get_bootstrap'
+])
+
 
 def create_app(test_config=None):
     """Flask应用工厂函数"""
@@ -19,7 +60,18 @@ def create_app(test_config=None):
     if test_config is None:
         app.config.from_mapping(
             SECRET_KEY=os.getenv('SECRET_KEY', 'dev-secret-key'),
-            DATABASE=os.getenv('DATABASE_URL', 'database/cloud_az.db')
+            DATABASE=os.getenv('DATABASE_URL', 'database/cloud_az.db'),
+            RESPONSE_CACHE_SIZE=int(os.getenv('RESPONSE_CACHE_SIZE', '256')),
+            RESPONSE_CACHE_BYTES=int(os.getenv('RESPONSE_CACHE_BYTES', str(64 * 1024 * 1024))),
+            DB_POOL_SIZE=int(os.getenv('DB_POOL_SIZE', '8')),
+            SQLITE_MMAP_SIZE=int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+            SQLITE_CACHE_SIZE=int(os.getenv('SQLITE_CACHE_SIZE', '-16000')),
+            WAL_CHECKPOINT_INTERVAL=float(os.getenv('WAL_CHECKPOINT_INTERVAL', '60')),
+            WAL_SIZE_LIMIT=int(os.getenv('WAL_SIZE_LIMIT', str(64 * 1024 * 1024))),
+            REFRESH_JOB_STALE_AFTER=float(os.getenv('REFRESH_JOB_STALE_AFTER', '300')),
+            HTTP_CACHE_DIR=os.getenv('HTTP_CACHE_DIR'),
+            HTTP_CACHE_TTL=float(os.getenv('HTTP_CACHE_TTL', str(DEFAULT_TTL))),
+            REFRESH_SCHEDULER=os.getenv('REFRESH_SCHEDULER', 'off')
         )
     else:
         app.config.from_mapping(test_config)
@@ -28,7 +80,154 @@ def create_app(test_config=None):
     CORS(app)
     
     # 初始化数据库管理器
-    db_manager = DatabaseManager(app.config['DATABASE'])
+    db_manager = DatabaseManager(
+        app.config['DATABASE'],
+        max_connections=app.config.get('DB_POOL_SIZE', 8),
+        mmap_size=app.config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        cache_size=app.config.get('SQLITE_CACHE_SIZE', -16000),
+        journal_size_limit=app.config.get('WAL_SIZE_LIMIT', 64 * 1024 * 1024)
+    )
+    
+    # 启动时执行数据库迁移
+    db_manager.migrate()
+    
+    # 国家和区域的大区分类与当前区域目录保持一致（目录在上次运行后可能已修改）
+    db_manager.reclassify_continents(region_catalog.get().classify)
+    # 本worker最近一次同步到数据库和响应缓存的目录版本
+    catalog_digest = {'value': region_catalog.get().digest}
+    
+    # WAL检查点：后台线程在WAL超过阈值时执行被动检查点
+    wal_checkpointer = WalCheckpointer(
+        db_manager,
+        interval=app.config.get('WAL_CHECKPOINT_INTERVAL', 60),
+        size_limit=app.config.get('WAL_SIZE_LIMIT', 64 * 1024 * 1024)
+    )
+    app.extensions['wal_checkpointer'] = wal_checkpointer
+    
+    # 响应缓存：数据代际号变化（刷新成功）时整体失效；距离矩阵等大响应体
+    # 按字节数限制总容量
+    response_cache = ResponseCache(
+        db_manager.generation,
+        max_entries=app.config.get('RESPONSE_CACHE_SIZE', 256),
+        max_bytes=app.config.get('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024),
+        sizeof=lambda payload: payload.size
+    )
+    app.extensions['response_cache'] = response_cache
+    
+    # 预序列化响应存储：每个数据代际只做一次JSON编码和压缩
+    payload_store = PayloadStore(
+        db_manager.generation,
+        lambda: _build_canonical_payloads(db_manager),
+        fallback=response_cache
+    )
+    app.extensions['payload_store'] = payload_store
+    
+    # 最近区域索引：按数据代际重建各云服务商的k-d树
+    spatial_index = RegionSpatialIndex(
+        db_manager.generation,
+        lambda: _get_region_points(db_manager)
+    )
+    app.extensions['spatial_index'] = spatial_index
+    
+    # 云服务商API响应缓存（默认与数据库文件放在一起）
+    http_cache = HttpResponseCache(
+        app.config.get('HTTP_CACHE_DIR') or f"{app.config['DATABASE']}.http_cache",
+        ttl=app.config.get('HTTP_CACHE_TTL', DEFAULT_TTL)
+    )
+    app.extensions['http_cache'] = http_cache
+    
+    # 后台刷新任务：收集器（及各云服务商客户端）在第一次刷新时才导入，只读worker不加载
+    def create_collector():
+        from api.cloud_collector import CloudAPICollector
+        return CloudAPICollector(http_cache=http_cache)
+    
+    def warm_after_refresh():
+        payload_store.warm()
+        spatial_index.warm()
+    
+    refresh_jobs = RefreshJobManager(
+        db_manager,
+        create_collector,
+        on_complete=warm_after_refresh,
+        stale_after=app.config.get('REFRESH_JOB_STALE_AFTER', 300)
+    )
+    app.extensions['refresh_jobs'] = refresh_jobs
+    
+    # 定时刷新：REFRESH_SCHEDULER=app 时在应用进程内运行，也可以独立运行 python -m services.scheduler
+    scheduler = create_scheduler(db_manager, refresh_jobs)
+    app.extensions['refresh_scheduler'] = scheduler
+    run_scheduler = app.config.get('REFRESH_SCHEDULER', 'off') == 'app'
+    
+    @app.before_request
+    def start_background_tasks():
+        """确保当前worker进程中的后台任务已启动（兼容gunicorn --preload）"""
+        wal_checkpointer.ensure_started()
+        if run_scheduler:
+            scheduler.ensure_started()
+    
+    @app.before_request
+    def sync_region_catalog():
+        """区域目录热加载后重新分类已有数据并推进代际号
+
+        大区名称和分类写在预生成的响应体里，不推进代际号时客户端会一直
+        收到旧名称的缓存响应和304。
+        """
+        compiled = region_catalog.get()
+        if compiled.digest == catalog_digest['value']:
+            return None
+        catalog_digest['value'] = compiled.digest
+        db_manager.reclassify_continents(compiled.classify)
+        db_manager.generation.bump()
+        return None
+    
+    @app.before_request
+    def check_conditional_get():
+        """基于数据代际号的条件请求检查，命中时直接返回304，不执行任何查询"""
+        if request.method not in ('GET', 'HEAD') or request.endpoint not in CONDITIONAL_ENDPOINTS:
+            return None
+        
+        generation = db_manager.generation.current()
+        etag = _make_etag(generation, request.path, request.args)
+        # 新部署的代码可能改变响应结构，Last-Modified 不早于源文件的修改时间
+        last_modified = max(int(db_manager.generation.updated_at), RESPONSE_MTIME)
+        g.conditional = (etag, last_modified)
+        
+        matched = []
+        if request.if_none_match:
+            matched = [
+                candidate for candidate in _etag_variants(etag)
+                if request.if_none_match.contains_weak(candidate)
+            ]
+            not_modified = bool(matched)
+        elif request.if_modified_since and last_modified:
+            not_modified = last_modified <= int(request.if_modified_since.timestamp())
+        else:
+            not_modified = False
+        
+        if not not_modified:
+            return None
+        
+        # 304与200响应携带相同的校验值：按与 Payload.select 相同的规则协商编码
+        encoding = negotiate_encoding(request.accept_encodings)
+        variant = f'{etag}-{encoding}' if encoding else etag
+        if matched and variant not in matched:
+            if etag not in matched:
+                # 客户端持有的编码版本与本次协商结果不同，返回完整响应
+                return None
+            # 响应体太小时不压缩，200响应同样使用未压缩版本的ETag
+            variant = etag
+        response = app.response_class(status=304)
+        response.headers['Vary'] = 'Accept-Encoding'
+        _set_validators(response, etag, last_modified, variant=variant)
+        return response
+    
+    @app.after_request
+    def add_validators(response):
+        """为只读接口的成功响应附加ETag和Last-Modified"""
+        conditional = g.pop('conditional', None)
+        if conditional and response.status_code == 200:
+            _set_validators(response, *conditional)
+        return response
     
     @app.route('/')
     def index():
@@ -39,10 +238,70 @@ def create_app(test_config=None):
     def get_regions():
         """获取所有区域数据API"""
         try:
-            providers_filter = request.args.get('providers', '')
-            selected_providers = providers_filter.split(',') if providers_filter else []
+            selected_providers = normalize_list_arg(request.args.get('providers', ''))
+            payload = payload_store.get(
+                'regions', {'providers': selected_providers},
+                lambda: _regions_payload(_get_all_regions(db_manager, list(selected_providers)))
+            )
+            return _payload_response(payload)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/regions/<provider>/<region_id>/zones')
+    def get_region_zones(provider, region_id):
+        """获取某区域的可用区列表API"""
+        try:
+            zones = db_manager.get_zones(provider, region_id)
+            if zones is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Region not found'
+                }), 404
+            return jsonify(_zones_payload(provider, region_id, zones))
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/regions/nearest')
+    def get_nearest_regions():
+        """获取距离给定坐标最近的区域API（大圆距离，单位公里）"""
+        try:
+            lat = request.args.get('lat', type=float)
+            lon = request.args.get('lon', type=float)
+            if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                return jsonify({
+                    'success': False,
+                    'error': 'lat and lon are required (-90..90, -180..180)'
+                }), 400
+            k = min(max(request.args.get('k', 5, type=int), 1), MAX_NEAREST)
+            selected_providers = normalize_list_arg(request.args.get('providers', ''))
             
-            regions = _get_all_regions(db_manager, selected_providers)
+            nearest = spatial_index.nearest(lat, lon, k, selected_providers)
+            return jsonify({
+                'success': True,
+                'lat': lat,
+                'lon': lon,
+                'k': k,
+                'regions': [dict(region, distance_km=round(distance, 1)) for distance, region in nearest],
+                'total': len(nearest)
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/regions/unmapped')
+    def get_unmapped_regions():
+        """获取无法确定国家的区域API（按默认国家写入，需要补充到区域目录）"""
+        try:
+            provider = request.args.get('provider', '').strip() or None
+            regions = db_manager.get_unmapped_regions(provider)
             return jsonify({
                 'success': True,
                 'regions': regions,
@@ -54,21 +313,59 @@ def create_app(test_config=None):
                 'error': str(e)
             }), 500
     
+    @app.route('/api/distance/matrix')
+    def get_distance_matrix():
+        """获取区域间的大圆距离矩阵API（公里，按数据代际缓存）"""
+        try:
+            selected_providers = normalize_list_arg(request.args.get('providers', ''))
+            payload = payload_store.get(
+                'distance_matrix', {'providers': selected_providers},
+                lambda: _distance_matrix_payload(_get_region_points(db_manager), selected_providers)
+            )
+            return _payload_response(payload)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/distance/closest')
+    def get_closest_regions():
+        """获取某云服务商每个区域在其他云服务商中最近的区域API"""
+        try:
+            from_provider = request.args.get('from_provider', '').strip().lower()
+            if not from_provider:
+                return jsonify({
+                    'success': False,
+                    'error': 'from_provider is required'
+                }), 400
+            to_providers = normalize_list_arg(request.args.get('to_provider', ''))
+            payload = payload_store.get(
+                'distance_closest', {'from': from_provider, 'to': to_providers},
+                lambda: _closest_regions_payload(_get_region_points(db_manager), from_provider, to_providers)
+            )
+            return _payload_response(payload)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
     @app.route('/api/countries')
     def get_countries():
         """获取国家数据API"""
         try:
-            continent_filter = request.args.get('continent', '')
-            countries_data = db_manager.get_all_countries_with_providers()
-            
-            if continent_filter:
-                countries_data = [c for c in countries_data if c['continent'] == continent_filter]
-            
-            return jsonify({
-                'success': True,
-                'countries': countries_data,
-                'total': len(countries_data)
-            })
+            continent_filter = request.args.get('continent', '').strip()
+            payload = payload_store.get(
+                'countries', {'continent': continent_filter},
+                lambda: _countries_payload(db_manager.get_all_countries_with_providers(), continent_filter)
+            )
+            return _payload_response(payload)
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -79,12 +376,11 @@ def create_app(test_config=None):
     def get_providers():
         """获取云服务商数据API"""
         try:
-            providers_data = _get_all_providers(db_manager)
-            return jsonify({
-                'success': True,
-                'providers': providers_data,
-                'total': len(providers_data)
-            })
+            payload = payload_store.get(
+                'providers', None,
+                lambda: _providers_payload(_get_all_providers(db_manager))
+            )
+            return _payload_response(payload)
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -93,29 +389,37 @@ def create_app(test_config=None):
     
     @app.route('/api/refresh', methods=['POST'])
     def refresh_data():
-        """刷新所有云服务数据API"""
+        """刷新云服务数据API（后台执行，立即返回任务ID）
+
+        可用 providers=tencent,aliyun（查询参数或JSON）只刷新部分云服务商。
+        """
         try:
-            # 创建API收集器
-            collector = CloudAPICollector()
-            
-            # 异步收集数据
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            regions_data = loop.run_until_complete(collector.collect_all_regions())
-            loop.close()
-            
-            # 更新数据库
-            collector.update_database(db_manager, regions_data)
+            body = request.get_json(silent=True) or {}
+            providers = body.get('providers', request.args.get('providers'))
+            if isinstance(providers, (list, tuple)):
+                providers = ','.join(str(p) for p in providers)
+            selected = normalize_list_arg(providers)
+            try:
+                targets = provider_registry.select(selected) if selected else None
+            except UnknownProviderError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
             
-            # 统计更新结果
-            total_regions = sum(len(regions) for regions in regions_data.values())
+            job, joined = refresh_jobs.submit(targets)
+            status_url = url_for('get_refresh_job', job_id=job['job_id'])
             
-            return jsonify({
+            response = jsonify({
                 'success': True,
-                'message': f'Successfully updated {total_regions} regions',
-                'updated_at': datetime.now().isoformat(),
-                'regions_by_provider': {k: len(v) for k, v in regions_data.items()}
+                'job_id': job['job_id'],
+                'status': job['status'],
+                'joined': joined,
+                'status_url': status_url
             })
+            response.status_code = 202
+            response.headers['Location'] = status_url
+            return response
             
         except Exception as e:
             return jsonify({
@@ -124,12 +428,52 @@ def create_app(test_config=None):
                 'updated_at': datetime.now().isoformat()
             }), 500
     
+    @app.route('/api/refresh/schedule')
+    def get_refresh_schedule():
+        """获取定时刷新计划API"""
+        return jsonify({
+            'success': True,
+            'enabled': run_scheduler,
+            'due': scheduler.due_providers(),
+            'schedule': scheduler.schedule(),
+            'breakers': _breaker_stats()
+        })
+    
+    @app.route('/api/refresh/<job_id>')
+    def get_refresh_job(job_id):
+        """查询刷新任务状态API"""
+        job = refresh_jobs.get(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Refresh job not found'
+            }), 404
+        return jsonify(dict(job, success=True))
+    
+    @app.route('/api/metrics/collection')
+    def get_collection_metrics():
+        """收集指标API：各云服务商最近N次刷新的耗时分位数和最近的记录"""
+        try:
+            runs = min(max(request.args.get('runs', 20, type=int), 1), 500)
+            provider = request.args.get('provider', '').strip() or None
+            return jsonify({
+                'success': True,
+                'runs': runs,
+                'summary': db_manager.get_collection_summary(runs),
+                'recent': db_manager.get_collection_metrics(provider, limit=runs)
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
     @app.route('/api/stats')
     def get_stats():
         """获取统计数据API"""
         try:
-            stats = _get_statistics(db_manager)
-            return jsonify(stats)
+            payload = payload_store.get('stats', None, lambda: _get_statistics(db_manager))
+            return _payload_response(payload)
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -140,22 +484,64 @@ def create_app(test_config=None):
     def get_color_mapping():
         """获取颜色映射API"""
         try:
-            providers_data = _get_all_providers(db_manager)
-            color_mapping = {
-                provider['name']: provider['color'] 
-                for provider in providers_data
-            }
-            
+            payload = payload_store.get(
+                'colors', None,
+                lambda: _colors_payload(_get_all_providers(db_manager))
+            )
+            return _payload_response(payload)
+        except Exception as e:
             return jsonify({
-                'success': True,
-                'color_mapping': color_mapping
-            })
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/catalog')
+    def get_catalog():
+        """区域目录API（前端的国家/区域中文名称和大区分类），目录文件修改后自动更新"""
+        try:
+            catalog = region_catalog.get()
+            response = Response(catalog.client_json, mimetype='application/json')
+            response.set_etag(f'catalog-{catalog.digest}')
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/bootstrap')
+    def get_bootstrap():
+        """页面首屏数据API（合并providers/regions/countries/stats/colors）"""
+        try:
+            payload = payload_store.get('bootstrap', None, lambda: _get_bootstrap_data(db_manager))
+            return _payload_response(payload)
         except Exception as e:
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
     
+    @app.route('/api/cache/stats')
+    def get_cache_stats():
+        """获取响应缓存统计API"""
+        return jsonify({
+            'success': True,
+            'cache': response_cache.stats(),
+            'payloads': payload_store.stats(),
+            'spatial_index': spatial_index.stats()
+        })
+    
+    @app.route('/api/db/stats')
+    def get_db_stats():
+        """获取数据库连接池统计API"""
+        return jsonify({
+            'success': True,
+            'pool': db_manager.pool_stats(),
+            'wal_size': wal_checkpointer.wal_size(),
+            'wal_checkpoints': wal_checkpointer.checkpoints
+        })
+    
     @app.route('/test')
     def test_page():
         """测试页面"""
@@ -205,19 +591,175 @@ def create_app(test_config=None):
     return app
 
 
-def _get_all_regions(db_manager, provider_filter=None):
-    """获取所有区域数据的辅助函数"""
-    import sqlite3
+def _breaker_stats():
+    """熔断器状态；本进程还没有执行过收集时不加载容错模块"""
+    resilience = sys.modules.get('api.resilience')
+    return resilience.provider_resilience.stats() if resilience is not None else {}
+
+
+def _make_etag(generation, path, args):
+    """由响应版本、代际号、路径和规范化查询参数生成强ETag"""
+    query = '&'.join(f'{k}={v}' for k, v in sorted(args.items(multi=True)))
+    digest = hashlib.sha1(f'{path}?{query}'.encode('utf-8')).hexdigest()[:16]
+    return f'{RESPONSE_VERSION}-{generation}-{digest}'
+
+
+def _etag_variants(etag):
+    """同一数据的各编码版本对应的ETag"""
+    return [etag] + [f'{etag}-{encoding}' for encoding in ENCODING_PREFERENCE]
+
+
+def _set_validators(response, etag, last_modified, variant=None):
+    """设置缓存校验相关响应头（variant 为已确定的编码版本ETag）"""
+    # 不同Content-Encoding的响应体不同，强ETag需要区分编码
+    if variant is None:
+        encoding = response.headers.get('Content-Encoding')
+        variant = f'{etag}-{encoding}' if encoding else etag
+    response.set_etag(variant)
+    if last_modified:
+        response.last_modified = datetime.fromtimestamp(last_modified, tz=timezone.utc)
+    # 允许缓存但每次都需要重新校验
+    response.headers['Cache-Control'] = 'no-cache'
+
+
+def _payload_response(payload):
+    """按Accept-Encoding返回预序列化的响应体，不做任何编码或压缩"""
+    body, encoding = payload.select(request.accept_encodings)
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def _regions_payload(regions):
+    """区域列表响应（区域已按云服务商、大区排序，groups 给出每个大区的范围）"""
+    return {
+        'success': True,
+        'regions': regions,
+        'groups': _region_groups(regions),
+        'total': len(regions)
+    }
+
+
+def _region_groups(regions):
+    """按云服务商和大区把已排序的区域列表分段
+
+    每段给出大区名称和在 regions 中的起始位置、数量，前端按段渲染，
+    不需要再对区域分类和分组。
+    """
+    names = region_catalog.get().macro_region_names
+    groups = []
+    for index, region in enumerate(regions):
+        last = groups[-1] if groups else None
+        if last and last['provider'] == region['provider'] and last['macro_region'] == region['continent']:
+            last['count'] += 1
+            continue
+        groups.append({
+            'provider': region['provider'],
+            'macro_region': region['continent'],
+            'name': names.get(region['continent'], region['continent']),
+            'start': index,
+            'count': 1
+        })
+    return groups
+
+
+def _zones_payload(provider, region_id, zones):
+    """可用区列表响应"""
+    return {
+        'success': True,
+        'provider': provider,
+        'region_id': region_id,
+        'zones': [
+            {'zone_id': zone.zone_id, 'zone_name': zone.zone_name, 'status': zone.status}
+            for zone in zones
+        ],
+        'total': len(zones)
+    }
+
+
+def _countries_payload(countries_data, continent_filter=''):
+    """国家列表响应（可按大洲过滤）"""
+    if continent_filter:
+        countries_data = [c for c in countries_data if c['continent'] == continent_filter]
+    return {
+        'success': True,
+        'countries': countries_data,
+        'total': len(countries_data)
+    }
+
+
+def _providers_payload(providers_data):
+    """云服务商列表响应"""
+    return {
+        'success': True,
+        'providers': providers_data,
+        'total': len(providers_data)
+    }
+
+
+def _colors_payload(providers_data):
+    """颜色映射响应"""
+    return {
+        'success': True,
+        'color_mapping': _get_color_mapping(providers_data)
+    }
+
+
+def _provider_subsets(provider_names, max_enumerated=6):
+    """规范化的云服务商过滤组合；云服务商过多时只枚举全部和单个"""
+    names = sorted(provider_names)
+    if len(names) > max_enumerated:
+        return [()] + [(name,) for name in names]
+    subsets = [()]
+    for size in range(1, len(names) + 1):
+        subsets.extend(combinations(names, size))
+    return subsets
+
+
+def _build_canonical_payloads(db_manager):
+    """在一个读事务中构建所有规范化响应的数据，返回 (缓存键, 数据) 列表"""
+    bootstrap = _get_bootstrap_data(db_manager)
+    providers = bootstrap['providers']
+    regions = bootstrap['regions']
+    countries = bootstrap['countries']
+    make_key = ResponseCache.make_key
+    
+    entries = [
+        (make_key('bootstrap'), bootstrap),
+        (make_key('providers'), _providers_payload(providers)),
+        (make_key('colors'), _colors_payload(providers)),
+        (make_key('stats'), bootstrap['stats']),
+    ]
+    
+    # 各云服务商组合的区域列表（区域已按云服务商排序，过滤后顺序不变）
+    for subset in _provider_subsets(p['name'] for p in providers):
+        selected = set(subset)
+        subset_regions = [r for r in regions if not selected or r['provider'] in selected]
+        entries.append((make_key('regions', {'providers': subset}), _regions_payload(subset_regions)))
     
-    conn = sqlite3.connect(db_manager.db_path)
-    cursor = conn.cursor()
+    # 各大洲的国家列表
+    for continent in [''] + sorted({c['continent'] for c in countries}):
+        entries.append((make_key('countries', {'continent': continent}),
+                        _countries_payload(countries, continent)))
     
+    return entries
+
+
+def _regions_query(provider_filter=None):
+    """区域列表的查询语句和参数
+
+    providers 固定为外层循环（CROSS JOIN）：按名称索引依次取云服务商，
+    每个云服务商在覆盖索引 idx_az_status_provider 中已按大区顺序、区域ID
+    排好序，整个查询不需要额外的排序步骤。
+    """
     query = '''
     SELECT az.region_id, az.region_name, p.name as provider_name,
-           az.country_code, az.continent, az.status
-    FROM availability_zones az
-    JOIN providers p ON az.provider_id = p.id
-    WHERE az.status = 'available'
+           az.country_code, az.continent, az.status, az.zone_count
+    FROM providers p
+    CROSS JOIN availability_zones az
+    WHERE az.provider_id = p.id AND az.status = 'available'
     '''
     
     params = []
@@ -226,11 +768,16 @@ def _get_all_regions(db_manager, provider_filter=None):
         query += f' AND p.name IN ({placeholders})'
         params.extend(provider_filter)
     
-    query += ' ORDER BY p.name, az.region_id'
+    query += ' ORDER BY p.name, az.macro_order, az.region_id'
+    return query, params
+
+
+def _get_all_regions(db_manager, provider_filter=None):
+    """获取所有区域数据的辅助函数"""
+    query, params = _regions_query(provider_filter)
     
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+    with db_manager.read_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
     
     regions = []
     for row in rows:
@@ -240,22 +787,91 @@ def _get_all_regions(db_manager, provider_filter=None):
             'provider': row[2],
             'country_code': row[3],
             'continent': row[4],
-            'status': row[5]
+            'status': row[5],
+            'zone_count': row[6]
         })
     
     return regions
 
 
+def _region_ref(region):
+    return {key: region[key] for key in ('provider', 'region_id', 'region_name', 'country_code')}
+
+
+def _distance_matrix_payload(points, providers=()):
+    """区域间距离矩阵的响应数据（行列顺序与 regions 相同）"""
+    # 延迟导入，未处理距离接口的worker不加载NumPy
+    from services.distance_matrix import DistanceMatrix
+    distances = DistanceMatrix(points)
+    rows = distances.indices(providers)
+    if len(rows) > MAX_MATRIX_REGIONS:
+        raise ValueError(f'Too many regions for a full matrix ({len(rows)} > {MAX_MATRIX_REGIONS}), '
+                         f'filter with providers=')
+    matrix = distances.matrix(rows)
+    return {
+        'success': True,
+        'unit': 'km',
+        'regions': [_region_ref(distances.regions[i]) for i in rows],
+        'matrix': matrix.astype('float64').round(1).tolist()
+    }
+
+
+def _closest_regions_payload(points, from_provider, to_providers=()):
+    """from_provider 的每个区域在目标云服务商（默认其他全部云服务商）中最近的区域"""
+    from services.distance_matrix import DistanceMatrix
+    distances = DistanceMatrix(points)
+    if not to_providers:
+        to_providers = tuple(sorted(set(distances.providers) - {from_provider}))
+    rows = distances.indices([from_provider])
+    cols = distances.indices(to_providers)
+    positions, nearest = distances.closest(rows, cols)
+    
+    pairs = []
+    for row, position, distance in zip(rows, positions, nearest):
+        closest = _region_ref(distances.regions[cols[position]]) if position >= 0 else None
+        pairs.append({
+            'region': _region_ref(distances.regions[row]),
+            'closest': closest,
+            'distance_km': round(float(distance), 1) if closest else None
+        })
+    return {
+        'success': True,
+        'from_provider': from_provider,
+        'to_providers': list(to_providers),
+        'unit': 'km',
+        'pairs': pairs,
+        'total': len(pairs)
+    }
+
+
+def _get_region_points(db_manager):
+    """获取有坐标的可用区域（最近区域索引的数据）"""
+    with db_manager.read_connection() as conn:
+        rows = conn.execute('''
+        SELECT az.region_id, az.region_name, p.name, az.country_code, az.continent,
+               az.zone_count, az.latitude, az.longitude
+        FROM availability_zones az
+        JOIN providers p ON az.provider_id = p.id
+        WHERE az.status = 'available' AND az.latitude IS NOT NULL AND az.longitude IS NOT NULL
+        ORDER BY p.name, az.macro_order, az.region_id
+        ''').fetchall()
+    
+    return [{
+        'region_id': row[0],
+        'region_name': row[1],
+        'provider': row[2],
+        'country_code': row[3],
+        'continent': row[4],
+        'zone_count': row[5],
+        'latitude': row[6],
+        'longitude': row[7]
+    } for row in rows]
+
+
 def _get_all_providers(db_manager):
     """获取所有云服务商数据的辅助函数"""
-    import sqlite3
-    
-    conn = sqlite3.connect(db_manager.db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, name, display_name, color FROM providers ORDER BY name')
-    rows = cursor.fetchall()
-    conn.close()
+    with db_manager.read_connection() as conn:
+        rows = conn.execute('SELECT id, name, display_name, color FROM providers ORDER BY name').fetchall()
     
     providers = []
     for row in rows:
@@ -270,53 +886,36 @@ def _get_all_providers(db_manager):
 
 
 def _get_statistics(db_manager):
-    """获取统计数据的辅助函数"""
-    import sqlite3
-    
-    conn = sqlite3.connect(db_manager.db_path)
-    cursor = conn.cursor()
-    
-    # 总区域数
-    cursor.execute('SELECT COUNT(*) FROM availability_zones WHERE status = "available"')
-    total_regions = cursor.fetchone()[0]
-    
-    # 总国家数
-    cursor.execute('SELECT COUNT(DISTINCT country_code) FROM availability_zones WHERE status = "available"')
-    total_countries = cursor.fetchone()[0]
-    
-    # 总云服务商数
-    cursor.execute('SELECT COUNT(*) FROM providers')
-    total_providers = cursor.fetchone()[0]
-    
-    # 每个云服务商的区域数
-    cursor.execute('''
-    SELECT p.name, COUNT(az.id)
-    FROM providers p
-    LEFT JOIN availability_zones az ON p.id = az.provider_id AND az.status = "available"
-    GROUP BY p.id, p.name
-    ORDER BY p.name
-    ''')
-    regions_by_provider = dict(cursor.fetchall())
-    
-    # 每个大洲的区域数
-    cursor.execute('''
-    SELECT continent, COUNT(*)
-    FROM availability_zones
-    WHERE status = "available"
-    GROUP BY continent
-    ORDER BY continent
-    ''')
-    regions_by_continent = dict(cursor.fetchall())
-    
-    conn.close()
+    """获取统计数据的辅助函数（读取刷新时预计算的统计快照）"""
+    stats = db_manager.get_stats_snapshot()
+    return dict(stats, success=True)
+
+
+def _get_color_mapping(providers_data):
+    """根据云服务商数据生成颜色映射"""
+    return {
+        provider['name']: provider['color']
+        for provider in providers_data
+    }
+
+
+def _get_bootstrap_data(db_manager):
+    """在同一个读事务中构建页面首屏所需的全部数据"""
+    # 各辅助函数在事务内复用同一个连接，保证五份数据来自同一数据快照
+    with db_manager.read_transaction():
+        providers = _get_all_providers(db_manager)
+        regions = _get_all_regions(db_manager)
+        countries = db_manager.get_all_countries_with_providers()
+        stats = _get_statistics(db_manager)
     
     return {
         'success': True,
-        'total_regions': total_regions,
-        'total_countries': total_countries,
-        'total_providers': total_providers,
-        'regions_by_provider': regions_by_provider,
-        'regions_by_continent': regions_by_continent
+        'providers': providers,
+        'regions': regions,
+        'region_groups': _region_groups(regions),
+        'countries': countries,
+        'stats': stats,
+        'color_mapping': _get_color_mapping(providers)
     }
 
 
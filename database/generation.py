@@ -0,0 +1,79 @@
+import os
+import time
+from typing import Optional, Tuple
+
+from services.file_lock import FileLock
+
+
+class DataGeneration:
+    """数据代际计数器
+
+    每次成功刷新数据后代际号加一。代际号保存在数据库旁边的小文件中，
+    gunicorn的多个worker通过stat该文件即可感知数据变化，无需查询SQLite。
+    推进代际号时持有跨进程的文件锁，多个进程同时提交也不会写出相同的代际号。
+    """
+
+    def __init__(self, db_path: str):
+        self.path = f'{db_path}.generation'
+        self._lock = FileLock(f'{self.path}.lock')
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._value = 0
+        self._updated_at = 0.0
+
+    def current(self) -> int:
+        """获取当前代际号（仅一次stat调用）"""
+        self._refresh()
+        return self._value
+
+    @property
+    def updated_at(self) -> float:
+        """最近一次代际变更的时间戳"""
+        self._refresh()
+        return self._updated_at
+
+    def bump(self) -> int:
+        """代际号加一并原子地写回文件（读取、加一、写回都在文件锁内完成）"""
+        self._lock.acquire(timeout=None, poll_interval=0.005)
+        try:
+            self._refresh(force=True)
+            value = self._value + 1
+            updated_at = time.time()
+
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(f'{value} {updated_at:.6f}')
+            os.replace(tmp_path, self.path)
+
+            self._value = value
+            self._updated_at = updated_at
+            self._stamp = self._stat()
+            return value
+        finally:
+            self._lock.release()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino)
+
+    def _refresh(self, force: bool = False):
+        """文件发生变化时重新读取代际号"""
+        stamp = self._stat()
+        if not force and stamp == self._stamp:
+            return
+
+        value, updated_at = 0, 0.0
+        if stamp is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    parts = f.read().split()
+                value = int(parts[0])
+                updated_at = float(parts[1]) if len(parts) > 1 else stamp[0] / 1e9
+            except (OSError, ValueError, IndexError):
+                return
+
+        self._value = value
+        self._updated_at = updated_at
+        self._stamp = stamp
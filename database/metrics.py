@@ -0,0 +1,98 @@
+"""
+收集指标 - 保存每次刷新各云服务商的指标并计算滚动聚合
+
+每次刷新每个云服务商写入 collection_metrics 一行，只保留最近
+METRICS_RETENTION 行。聚合按云服务商取最近N次记录，计算耗时的
+p50 / p95 等统计值。
+"""
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# collection_metrics 表保留的最多行数
+METRICS_RETENTION = 5000
+
+COLUMNS = (
+    'run_id', 'provider', 'status', 'started_at', 'total_ms', 'fetch_ms', 'network_ms',
+    'parse_ms', 'overhead_ms', 'ttfb_ms', 'db_write_ms', 'requests', 'retries', 'response_bytes',
+    'rows_diffed', 'rows_written'
+)
+
+
+def record_metrics(conn: sqlite3.Connection, run_id: Optional[str],
+                   rows: Iterable[Dict[str, Any]], retention: int = METRICS_RETENTION) -> int:
+    """写入一次刷新的指标并清理过旧的记录，返回写入行数"""
+    values = [
+        tuple(run_id if column == 'run_id' else row.get(column) for column in COLUMNS)
+        for row in rows
+    ]
+    if not values:
+        return 0
+    conn.executemany(
+        f"INSERT INTO collection_metrics ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(COLUMNS))})",
+        values
+    )
+    conn.execute('''
+    DELETE FROM collection_metrics
+    WHERE id <= (SELECT MAX(id) FROM collection_metrics) - ?
+    ''', (retention,))
+    return len(values)
+
+
+def recent_metrics(conn: sqlite3.Connection, provider: Optional[str] = None,
+                   limit: int = 50) -> List[Dict[str, Any]]:
+    """最近的指标记录（新的在前）"""
+    query = f"SELECT id, {', '.join(COLUMNS)} FROM collection_metrics"
+    params: List[Any] = []
+    if provider:
+        query += ' WHERE provider = ?'
+        params.append(provider)
+    query += ' ORDER BY id DESC LIMIT ?'
+    params.append(limit)
+    return [dict(zip(('id',) + COLUMNS, row)) for row in conn.execute(query, params)]
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """线性插值的百分位数（q 取 0-100），空序列返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_metrics(conn: sqlite3.Connection, last_runs: int = 20) -> Dict[str, Dict[str, Any]]:
+    """按云服务商汇总最近 last_runs 次记录"""
+    rows = conn.execute('''
+    SELECT provider, status, total_ms, fetch_ms, db_write_ms, response_bytes, retries, rows_written
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY provider ORDER BY id DESC) AS rn
+        FROM collection_metrics
+    )
+    WHERE rn <= ?
+    ''', (last_runs,)).fetchall()
+
+    grouped: Dict[str, List[tuple]] = {}
+    for row in rows:
+        grouped.setdefault(row[0], []).append(row)
+
+    summary = {}
+    for provider, items in sorted(grouped.items()):
+        total = [r[2] for r in items]
+        fetch = [r[3] for r in items]
+        summary[provider] = {
+            'runs': len(items),
+            'failures': sum(1 for r in items if r[1] not in ('succeeded', 'unchanged')),
+            'p50_ms': percentile(total, 50),
+            'p95_ms': percentile(total, 95),
+            'max_ms': max(total),
+            'fetch_p50_ms': percentile(fetch, 50),
+            'fetch_p95_ms': percentile(fetch, 95),
+            'db_write_p95_ms': percentile([r[4] for r in items], 95),
+            'avg_response_bytes': sum(r[5] for r in items) / len(items),
+            'total_retries': sum(r[6] for r in items),
+            'rows_written': sum(r[7] for r in items)
+        }
+    return summary
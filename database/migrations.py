@@ -0,0 +1,451 @@
+"""
+数据库迁移 - 带版本号的有序迁移
+
+每个迁移只执行一次，执行记录保存在 schema_version 表中。新增表结构或索引时，
+在 MIGRATIONS 末尾追加新的迁移即可，已发布的迁移不要修改。
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass(frozen=True)
+class Migration:
+    """迁移定义"""
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _m001_initial_schema(conn: sqlite3.Connection):
+    """初始表结构（与早期版本的create_tables一致，兼容已有数据库）"""
+    # 创建云服务提供商表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS providers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        display_name TEXT NOT NULL,
+        color TEXT NOT NULL,
+        api_endpoint TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # 创建国家表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS countries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        country_code TEXT UNIQUE NOT NULL,
+        country_name TEXT NOT NULL,
+        continent TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # 创建可用区域表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS availability_zones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        provider_id INTEGER NOT NULL,
+        region_id TEXT NOT NULL,
+        region_name TEXT NOT NULL,
+        country_code TEXT NOT NULL,
+        continent TEXT NOT NULL,
+        status TEXT DEFAULT 'available',
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (provider_id) REFERENCES providers(id),
+        FOREIGN KEY (country_code) REFERENCES countries(country_code)
+    )
+    ''')
+
+    # 创建数据更新记录表
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS update_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        provider_id INTEGER NOT NULL,
+        update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT NOT NULL,
+        message TEXT,
+        FOREIGN KEY (provider_id) REFERENCES providers(id)
+    )
+    ''')
+
+
+def _m002_unique_provider_region(conn: sqlite3.Connection):
+    """去除重复区域记录并添加 (provider_id, region_id) 唯一索引"""
+    # 每组重复记录保留最新插入的一条
+    conn.execute('''
+    DELETE FROM availability_zones
+    WHERE id NOT IN (
+        SELECT MAX(id) FROM availability_zones GROUP BY provider_id, region_id
+    )
+    ''')
+    conn.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_az_provider_region
+    ON availability_zones (provider_id, region_id)
+    ''')
+
+
+def _m003_query_indexes(conn: sqlite3.Connection):
+    """为区域、统计和国家查询添加索引"""
+    # /api/regions：按状态过滤并按云服务商、区域排序，覆盖所有返回列
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_status_provider
+    ON availability_zones (status, provider_id, region_id, region_name, country_code, continent)
+    ''')
+    # /api/stats：按状态统计国家数、按大洲分组
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_status_country
+    ON availability_zones (status, country_code)
+    ''')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_status_continent
+    ON availability_zones (status, continent)
+    ''')
+    # get_all_countries_with_providers：countries 与 availability_zones 按国家代码关联
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_country_status
+    ON availability_zones (country_code, status, provider_id)
+    ''')
+    # 按云服务商查询最近的更新日志
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_update_logs_provider_time
+    ON update_logs (provider_id, update_time)
+    ''')
+
+
+def _m004_stats_snapshot(conn: sqlite3.Connection):
+    """添加预计算的统计快照表"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS stats_snapshot (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_regions INTEGER NOT NULL,
+        total_countries INTEGER NOT NULL,
+        total_providers INTEGER NOT NULL,
+        regions_by_provider TEXT NOT NULL,
+        regions_by_continent TEXT NOT NULL,
+        providers_by_country TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _m005_refresh_jobs(conn: sqlite3.Connection):
+    """添加后台刷新任务表（多个worker共享任务状态）"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS refresh_jobs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        progress TEXT NOT NULL DEFAULT '{}',
+        result TEXT,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_refresh_jobs_status
+    ON refresh_jobs (status, updated_at)
+    ''')
+
+
+def _m006_refresh_schedule(conn: sqlite3.Connection):
+    """添加定时刷新计划表，刷新任务记录目标云服务商"""
+    conn.execute('ALTER TABLE refresh_jobs ADD COLUMN providers TEXT')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS refresh_schedule (
+        provider TEXT PRIMARY KEY,
+        last_run_at REAL,
+        last_status TEXT,
+        next_run_at REAL NOT NULL
+    )
+    ''')
+
+
+def _m007_zones(conn: sqlite3.Connection):
+    """添加可用区表（区域的子级），区域表增加写入时维护的可用区数量"""
+    conn.execute('''
+    ALTER TABLE availability_zones ADD COLUMN zone_count INTEGER NOT NULL DEFAULT 0
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS zones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        az_id INTEGER NOT NULL,
+        zone_id TEXT NOT NULL,
+        zone_name TEXT NOT NULL,
+        status TEXT DEFAULT 'available',
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (az_id) REFERENCES availability_zones(id) ON DELETE CASCADE,
+        UNIQUE (az_id, zone_id)
+    )
+    ''')
+    # /api/regions 的覆盖索引加入 zone_count，返回可用区数量不需要回表
+    conn.execute('DROP INDEX IF EXISTS idx_az_status_provider')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_status_provider
+    ON availability_zones (status, provider_id, region_id, region_name, country_code, continent, zone_count)
+    ''')
+
+
+def _m008_collection_metrics(conn: sqlite3.Connection):
+    """添加收集指标表（每次刷新每个云服务商一行）"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS collection_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT,
+        provider TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started_at REAL NOT NULL,
+        total_ms REAL NOT NULL,
+        fetch_ms REAL NOT NULL,
+        network_ms REAL NOT NULL,
+        parse_ms REAL NOT NULL,
+        ttfb_ms REAL,
+        db_write_ms REAL NOT NULL,
+        requests INTEGER NOT NULL,
+        retries INTEGER NOT NULL,
+        response_bytes INTEGER NOT NULL,
+        rows_diffed INTEGER NOT NULL,
+        rows_written INTEGER NOT NULL
+    )
+    ''')
+    # 按云服务商取最近N次记录
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_collection_metrics_provider
+    ON collection_metrics (provider, id)
+    ''')
+
+
+# m009 编写时区域目录中的大区顺序和各国家所属的大区。迁移只使用这里冻结的数据，
+# 之后修改 region_catalog.json 不会改变新数据库的迁移结果（运行时由
+# reclassify_continents 按当前目录重新分类）
+_M009_MACRO_ORDER = ('north-america', 'south-america', 'europe', 'asia-pacific', 'china', 'africa', 'others')
+_M009_DEFAULT_MACRO_REGION = 'others'
+_M009_MACRO_REGION_COUNTRIES = {
+    'north-america': 'CA MX US',
+    'south-america': 'AR BR CL CO EC PE PY UY VE',
+    'europe': (
+        'AL AM AT AZ BA BE BG BY CH CZ DE DK EE ES FI FR GB GE GR HR HU IE IS IT LT LV ME MK '
+        'NL NO PL PT RO RS RU SE SI SK TR UA'
+    ),
+    'asia-pacific': (
+        'AE AF AU BD BH BN FJ HK ID IL IN IQ IR JO JP KH KR KW LA LB LK MM MO MY NZ OM PG PH '
+        'PK PS QA SA SG SY TH TW VN YE'
+    ),
+    'china': 'CN',
+    'africa': 'DZ EG ET GH KE LY MA NG TN TZ UG ZA'
+}
+
+
+def _m009_macro_regions(conn: sqlite3.Connection):
+    """大洲统一为区域目录中的大区，区域表增加写入时维护的大区排序"""
+    macro_regions = {
+        code: macro_region
+        for macro_region, codes in _M009_MACRO_REGION_COUNTRIES.items() for code in codes.split()
+    }
+
+    def classify(code):
+        macro_region = macro_regions.get((code or '').upper(), _M009_DEFAULT_MACRO_REGION)
+        return macro_region, _M009_MACRO_ORDER.index(macro_region)
+
+    conn.execute('''
+    ALTER TABLE availability_zones ADD COLUMN macro_order INTEGER NOT NULL DEFAULT 0
+    ''')
+    # 已有数据按国家代码重新分类（之后由收集器在写入时维护）
+    updates = []
+    for (code,) in conn.execute('SELECT DISTINCT country_code FROM availability_zones').fetchall():
+        updates.append(classify(code) + (code,))
+    conn.executemany('''
+    UPDATE availability_zones SET continent = ?, macro_order = ? WHERE country_code = ?
+    ''', updates)
+    conn.executemany(
+        'UPDATE countries SET continent = ? WHERE country_code = ?',
+        [(classify(code)[0], code)
+         for (code,) in conn.execute('SELECT country_code FROM countries').fetchall()]
+    )
+    # /api/regions 按云服务商、大区顺序、区域ID返回，覆盖索引按相同顺序排列
+    conn.execute('DROP INDEX IF EXISTS idx_az_status_provider')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_status_provider
+    ON availability_zones (status, provider_id, macro_order, region_id, region_name,
+                           country_code, continent, zone_count)
+    ''')
+    # /api/stats：按大区分组并按大区顺序输出
+    conn.execute('DROP INDEX IF EXISTS idx_az_status_continent')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_az_status_continent
+    ON availability_zones (status, continent, macro_order)
+    ''')
+
+
+def _m010_unmapped_regions(conn: sqlite3.Connection):
+    """添加未解析区域表（区域目录和回退规则都无法确定国家的区域）"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS unmapped_regions (
+        provider TEXT NOT NULL,
+        region_id TEXT NOT NULL,
+        label TEXT NOT NULL DEFAULT '',
+        fallback_country TEXT NOT NULL,
+        first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        seen_count INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (provider, region_id)
+    )
+    ''')
+
+
+# m011 编写时区域目录中的区域坐标和国家代表位置 (纬度, 经度)，同样冻结在迁移中
+_M011_REGION_COORDS = {
+    'aliyun': {
+        'ap-northeast-1': (35.68, 139.69), 'ap-northeast-2': (37.57, 126.98),
+        'ap-southeast-1': (1.35, 103.82), 'ap-southeast-3': (3.14, 101.69),
+        'ap-southeast-5': (-6.21, 106.85), 'ap-southeast-6': (14.6, 120.98),
+        'ap-southeast-7': (13.76, 100.5), 'cn-beijing': (39.9, 116.41), 'cn-chengdu': (30.57, 104.07),
+        'cn-fuzhou': (26.07, 119.3), 'cn-guangzhou': (23.13, 113.26), 'cn-hangzhou': (30.27, 120.16),
+        'cn-heyuan': (23.74, 114.7), 'cn-hongkong': (22.32, 114.17), 'cn-huhehaote': (40.84, 111.75),
+        'cn-nanjing': (32.06, 118.8), 'cn-qingdao': (36.07, 120.38), 'cn-shanghai': (31.23, 121.47),
+        'cn-shenzhen': (22.54, 114.06), 'cn-wuhan-lr': (30.59, 114.31), 'cn-wulanchabu': (41.03, 113.13),
+        'cn-zhangjiakou': (40.77, 114.88), 'eu-central-1': (50.11, 8.68), 'eu-west-1': (51.51, -0.13),
+        'me-east-1': (25.2, 55.27), 'na-south-1': (20.59, -100.39), 'us-east-1': (39.04, -77.49),
+        'us-west-1': (37.39, -122.08)
+    },
+    'digitalocean': {
+        'ams2': (52.37, 4.9), 'ams3': (52.37, 4.9), 'blr1': (12.97, 77.59), 'fra1': (50.11, 8.68),
+        'lon1': (51.51, -0.13), 'nyc1': (40.71, -74.01), 'nyc2': (40.71, -74.01), 'nyc3': (40.71, -74.01),
+        'sfo1': (37.77, -122.42), 'sfo2': (37.77, -122.42), 'sfo3': (37.77, -122.42),
+        'sgp1': (1.35, 103.82), 'syd1': (-33.87, 151.21), 'tor1': (43.65, -79.38)
+    },
+    'linode': {
+        'ap-northeast': (35.68, 139.69), 'ap-south': (1.35, 103.82), 'ap-southeast': (-33.87, 151.21),
+        'ap-west': (19.08, 72.88), 'au-mel': (-37.81, 144.96), 'br-gru': (-23.55, -46.63),
+        'ca-central': (43.65, -79.38), 'de-fra-2': (50.11, 8.68), 'es-mad': (40.42, -3.7),
+        'eu-central': (50.11, 8.68), 'eu-west': (51.51, -0.13), 'fr-par': (48.86, 2.35),
+        'gb-lon': (51.51, -0.13), 'id-cgk': (-6.21, 106.85), 'in-bom-2': (19.08, 72.88),
+        'in-maa': (13.08, 80.27), 'it-mil': (45.46, 9.19), 'jp-osa': (34.69, 135.5),
+        'jp-tyo-3': (35.68, 139.69), 'nl-ams': (52.37, 4.9), 'se-sto': (59.33, 18.07),
+        'sg-sin-2': (1.35, 103.82), 'us-central': (32.78, -96.8), 'us-east': (40.74, -74.17),
+        'us-iad': (38.91, -77.04), 'us-lax': (34.05, -118.24), 'us-mia': (25.76, -80.19),
+        'us-ord': (41.88, -87.63), 'us-sea': (47.61, -122.33), 'us-southeast': (33.75, -84.39),
+        'us-west': (37.55, -121.99)
+    },
+    'tencent': {
+        'ap-bangkok': (13.76, 100.5), 'ap-beijing': (39.9, 116.41), 'ap-chengdu': (30.57, 104.07),
+        'ap-chongqing': (29.56, 106.55), 'ap-guangzhou': (23.13, 113.26), 'ap-hongkong': (22.32, 114.17),
+        'ap-jakarta': (-6.21, 106.85), 'ap-nanjing': (32.06, 118.8), 'ap-seoul': (37.57, 126.98),
+        'ap-shanghai': (31.23, 121.47), 'ap-singapore': (1.35, 103.82), 'ap-tokyo': (35.68, 139.69),
+        'eu-frankfurt': (50.11, 8.68), 'eu-moscow': (55.76, 37.62), 'na-ashburn': (39.04, -77.49),
+        'na-siliconvalley': (37.39, -122.08), 'na-toronto': (43.65, -79.38),
+        'sa-saopaulo': (-23.55, -46.63)
+    }
+}
+_M011_COUNTRY_COORDS = {
+    'AE': (25.2, 55.27), 'AF': (34.56, 69.21), 'AL': (41.33, 19.82), 'AM': (40.18, 44.51),
+    'AR': (-34.6, -58.38), 'AT': (48.21, 16.37), 'AU': (-33.87, 151.21), 'AZ': (40.41, 49.87),
+    'BA': (43.86, 18.41), 'BD': (23.81, 90.41), 'BE': (50.85, 4.35), 'BG': (42.7, 23.32),
+    'BH': (26.23, 50.59), 'BN': (4.9, 114.94), 'BR': (-23.55, -46.63), 'BY': (53.9, 27.56),
+    'CA': (43.65, -79.38), 'CH': (47.38, 8.54), 'CL': (-33.45, -70.67), 'CN': (39.9, 116.41),
+    'CO': (4.71, -74.07), 'CZ': (50.08, 14.44), 'DE': (50.11, 8.68), 'DK': (55.68, 12.57),
+    'DZ': (36.75, 3.06), 'EC': (-0.18, -78.47), 'EE': (59.44, 24.75), 'EG': (30.04, 31.24),
+    'ES': (40.42, -3.7), 'ET': (9.03, 38.74), 'FI': (60.17, 24.94), 'FJ': (-18.14, 178.44),
+    'FR': (48.86, 2.35), 'GB': (51.51, -0.13), 'GE': (41.72, 44.79), 'GH': (5.6, -0.19),
+    'GR': (37.98, 23.73), 'HK': (22.32, 114.17), 'HR': (45.81, 15.98), 'HU': (47.5, 19.04),
+    'ID': (-6.21, 106.85), 'IE': (53.35, -6.26), 'IL': (32.09, 34.78), 'IN': (19.08, 72.88),
+    'IQ': (33.31, 44.36), 'IR': (35.69, 51.39), 'IS': (64.15, -21.94), 'IT': (45.46, 9.19),
+    'JO': (31.95, 35.93), 'JP': (35.68, 139.69), 'KE': (-1.29, 36.82), 'KH': (11.56, 104.93),
+    'KR': (37.57, 126.98), 'KW': (29.38, 47.99), 'LA': (17.98, 102.63), 'LB': (33.89, 35.5),
+    'LK': (6.93, 79.86), 'LT': (54.69, 25.28), 'LV': (56.95, 24.11), 'LY': (32.89, 13.19),
+    'MA': (33.57, -7.59), 'ME': (42.44, 19.26), 'MK': (42, 21.43), 'MM': (16.87, 96.2),
+    'MO': (22.2, 113.54), 'MX': (19.43, -99.13), 'MY': (3.14, 101.69), 'NG': (6.52, 3.38),
+    'NL': (52.37, 4.9), 'NO': (59.91, 10.75), 'NZ': (-36.85, 174.76), 'OM': (23.59, 58.41),
+    'PE': (-12.05, -77.04), 'PG': (-9.44, 147.18), 'PH': (14.6, 120.98), 'PK': (24.86, 67.01),
+    'PL': (52.23, 21.01), 'PS': (31.9, 35.2), 'PT': (38.72, -9.14), 'PY': (-25.26, -57.58),
+    'QA': (25.29, 51.53), 'RO': (44.43, 26.1), 'RS': (44.79, 20.45), 'RU': (55.76, 37.62),
+    'SA': (24.71, 46.68), 'SE': (59.33, 18.07), 'SG': (1.35, 103.82), 'SI': (46.06, 14.51),
+    'SK': (48.15, 17.11), 'SY': (33.51, 36.29), 'TH': (13.76, 100.5), 'TN': (36.81, 10.18),
+    'TR': (41.01, 28.98), 'TW': (25.03, 121.57), 'TZ': (-6.79, 39.21), 'UA': (50.45, 30.52),
+    'UG': (0.35, 32.58), 'US': (39.83, -98.58), 'UY': (-34.9, -56.16), 'VE': (10.48, -66.9),
+    'VN': (21.03, 105.85), 'YE': (15.37, 44.19), 'ZA': (-26.2, 28.05)
+}
+
+
+def _m011_region_coordinates(conn: sqlite3.Connection):
+    """区域表增加坐标（纬度、经度），已有数据按冻结的区域目录坐标回填"""
+    conn.execute('ALTER TABLE availability_zones ADD COLUMN latitude REAL')
+    conn.execute('ALTER TABLE availability_zones ADD COLUMN longitude REAL')
+    updates = []
+    for az_id, provider, region_id, country_code in conn.execute('''
+    SELECT az.id, p.name, az.region_id, az.country_code
+    FROM availability_zones az JOIN providers p ON az.provider_id = p.id
+    ''').fetchall():
+        # 目录中没有的区域使用所在国家的代表位置
+        coords = _M011_REGION_COORDS.get(provider, {}).get(region_id) or \
+            _M011_COUNTRY_COORDS.get((country_code or '').upper())
+        if coords is not None:
+            updates.append(coords + (az_id,))
+    conn.executemany('UPDATE availability_zones SET latitude = ?, longitude = ? WHERE id = ?', updates)
+
+
+def _m012_collection_overhead(conn: sqlite3.Connection):
+    """收集指标增加其他时间（重试等待、排队等），parse_ms 只记录JSON解码"""
+    conn.execute('ALTER TABLE collection_metrics ADD COLUMN overhead_ms REAL')
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'initial_schema', _m001_initial_schema),
+    Migration(2, 'unique_provider_region', _m002_unique_provider_region),
+    Migration(3, 'query_indexes', _m003_query_indexes),
+    Migration(4, 'stats_snapshot', _m004_stats_snapshot),
+    Migration(5, 'refresh_jobs', _m005_refresh_jobs),
+    Migration(6, 'refresh_schedule', _m006_refresh_schedule),
+    Migration(7, 'zones', _m007_zones),
+    Migration(8, 'collection_metrics', _m008_collection_metrics),
+    Migration(9, 'macro_regions', _m009_macro_regions),
+    Migration(10, 'unmapped_regions', _m010_unmapped_regions),
+    Migration(11, 'region_coordinates', _m011_region_coordinates),
+    Migration(12, 'collection_overhead', _m012_collection_overhead),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """获取当前数据库的迁移版本号（未初始化时为0）"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def run_migrations(db_manager, migrations: List[Migration] = None) -> List[int]:
+    """按顺序执行所有未执行的迁移，返回本次执行的版本号列表"""
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+    applied = []
+
+    # 写事务会先获取写锁，多个worker同时启动时只有一个会真正执行迁移
+    with db_manager.transaction() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        current = get_schema_version(conn)
+
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+            migration.apply(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                (migration.version, migration.name)
+            )
+            applied.append(migration.version)
+
+    for version in applied:
+        print(f"Applied database migration {version}")
+    return applied
@@ -1,7 +1,17 @@
+import os
 import sqlite3
+import urllib.parse
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from .generation import DataGeneration
+from .pool import ConnectionPool
+from .migrations import run_migrations, get_schema_version
+from .stats import compute_stats, rebuild_stats_snapshot, read_stats_snapshot
+from .metrics import record_metrics, recent_metrics, summarize_metrics
+
+# 云服务商不再返回的区域标记为该状态（保留记录，不再计入统计和接口）
+REMOVED_STATUS = 'unavailable'
 
 
 @dataclass  
@@ -34,6 +44,20 @@ class AvailabilityZone:
     country_code: str
     continent: str
     status: str = 'available'
+    macro_order: int = 0
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    id: Optional[int] = None
+    last_updated: Optional[datetime] = None
+
+
+@dataclass
+class Zone:
+    """可用区数据模型（区域的子级）"""
+    zone_id: str
+    zone_name: str
+    status: str = 'available'
+    az_id: Optional[int] = None
     id: Optional[int] = None
     last_updated: Optional[datetime] = None
 
@@ -51,129 +75,161 @@ class UpdateLog:
 class DatabaseManager:
     """数据库管理器"""
     
-    def __init__(self, db_path: str = 'database/cloud_az.db'):
+    def __init__(self, db_path: str = 'database/cloud_az.db', max_connections: int = 8,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size: int = -16000,
+                 wal_autocheckpoint: int = 1000, journal_size_limit: int = 64 * 1024 * 1024):
         self.db_path = db_path
+        self.max_connections = max_connections
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.wal_autocheckpoint = wal_autocheckpoint
+        self.journal_size_limit = journal_size_limit
+        self.generation = DataGeneration(db_path)
         self._init_db()
     
     def _init_db(self):
-        """初始化数据库连接"""
-        pass
-    
-    def create_tables(self):
-        """创建所有数据库表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 创建云服务提供商表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS providers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            display_name TEXT NOT NULL,
-            color TEXT NOT NULL,
-            api_endpoint TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # 创建国家表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS countries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            country_code TEXT UNIQUE NOT NULL,
-            country_name TEXT NOT NULL,
-            continent TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """初始化数据库连接池
+
+        - 读写连接池：WAL日志模式 + synchronous=NORMAL，写入不阻塞读取
+        - 只读连接池：以 mode=ro 打开，供只读接口使用，开启mmap读取
+        """
+        self.pool = ConnectionPool(
+            self.db_path,
+            max_connections=self.max_connections,
+            on_connect=self._configure_writer
         )
-        ''')
         
-        # 创建可用区域表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS availability_zones (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            provider_id INTEGER NOT NULL,
-            region_id TEXT NOT NULL,
-            region_name TEXT NOT NULL,
-            country_code TEXT NOT NULL,
-            continent TEXT NOT NULL,
-            status TEXT DEFAULT 'available',
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (provider_id) REFERENCES providers(id),
-            FOREIGN KEY (country_code) REFERENCES countries(country_code)
-        )
-        ''')
+        # 先用读写连接确保数据库文件存在并切换到WAL模式（WAL模式会持久化到文件中）
+        with self.pool.connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
         
-        # 创建数据更新记录表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS update_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            provider_id INTEGER NOT NULL,
-            update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT NOT NULL,
-            message TEXT,
-            FOREIGN KEY (provider_id) REFERENCES providers(id)
+        read_uri = f'file:{urllib.parse.quote(os.path.abspath(self.db_path))}?mode=ro'
+        self.read_pool = ConnectionPool(
+            read_uri,
+            max_connections=self.max_connections,
+            uri=True,
+            on_connect=self._configure_reader
         )
-        ''')
-        
-        conn.commit()
-        conn.close()
+    
+    def _configure_writer(self, conn: sqlite3.Connection):
+        """读写连接的PRAGMA设置"""
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA wal_autocheckpoint={int(self.wal_autocheckpoint)}')
+        conn.execute(f'PRAGMA journal_size_limit={int(self.journal_size_limit)}')
+    
+    def _configure_reader(self, conn: sqlite3.Connection):
+        """只读连接的PRAGMA设置"""
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+    
+    def connection(self):
+        """从连接池获取读写连接（上下文管理器，同一线程内可重入）"""
+        return self.pool.connection()
+    
+    def transaction(self, immediate: bool = True):
+        """在写事务中执行（上下文管理器，嵌套时加入外层事务）"""
+        return self.pool.transaction(immediate=immediate)
+    
+    def read_connection(self):
+        """从只读连接池获取连接，读取不会被刷新写入阻塞"""
+        return self.read_pool.connection()
+    
+    def read_transaction(self):
+        """在只读事务中执行，事务内的多次查询看到同一数据快照"""
+        return self.read_pool.transaction(immediate=False)
+    
+    def checkpoint(self, mode: str = 'PASSIVE'):
+        """执行WAL检查点，返回 (busy, wal页数, 已检查点页数)"""
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f'Invalid checkpoint mode: {mode}')
+        with self.connection() as conn:
+            return tuple(conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone())
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return {
+            'writer': self.pool.stats(),
+            'reader': self.read_pool.stats()
+        }
+    
+    def close(self):
+        """关闭连接池中的空闲连接"""
+        self.read_pool.close()
+        self.pool.close()
+    
+    def create_tables(self):
+        """创建所有数据库表（执行全部未执行的迁移）"""
+        self.migrate()
+    
+    def migrate(self) -> List[int]:
+        """执行数据库迁移，返回本次执行的迁移版本号"""
+        applied = run_migrations(self)
+        if applied:
+            # 表结构变化后重新计算统计快照；迁移可能改写了数据，推进代际号
+            self.refresh_stats_snapshot()
+            self._data_changed()
+            # 新建或重建索引后更新统计信息（sqlite_stat1），供查询规划器选择索引
+            with self.connection() as conn:
+                conn.execute('ANALYZE')
+        return applied
+    
+    def _data_changed(self):
+        """数据已变更：所在事务提交后推进代际号，使各worker的缓存和ETag失效"""
+        self.pool.after_commit(self.generation.bump)
+    
+    def schema_version(self) -> int:
+        """获取当前数据库的迁移版本号"""
+        with self.connection() as conn:
+            return get_schema_version(conn)
     
     def create_provider(self, provider: Provider) -> Optional[int]:
         """创建云服务提供商记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-            INSERT INTO providers (name, display_name, color, api_endpoint)
-            VALUES (?, ?, ?, ?)
-            ''', (provider.name, provider.display_name, provider.color, provider.api_endpoint))
-            
-            provider_id = cursor.lastrowid
-            conn.commit()
-            return provider_id
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                INSERT INTO providers (name, display_name, color, api_endpoint)
+                VALUES (?, ?, ?, ?)
+                ''', (provider.name, provider.display_name, provider.color, provider.api_endpoint))
+                rebuild_stats_snapshot(conn)
+                self._data_changed()
+                return cursor.lastrowid
         except sqlite3.Error:
             return None
-        finally:
-            conn.close()
     
     def get_provider(self, provider_id: int) -> Optional[Provider]:
         """根据ID获取云服务提供商"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT id, name, display_name, color, api_endpoint, created_at
-        FROM providers WHERE id = ?
-        ''', (provider_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            row = conn.execute('''
+            SELECT id, name, display_name, color, api_endpoint, created_at
+            FROM providers WHERE id = ?
+            ''', (provider_id,)).fetchone()
         
-        if row:
-            return Provider(
-                id=row[0],
-                name=row[1],
-                display_name=row[2],
-                color=row[3],
-                api_endpoint=row[4],
-                created_at=datetime.fromisoformat(row[5]) if row[5] else None
-            )
-        return None
+        return self._row_to_provider(row)
     
     def get_provider_by_name(self, name: str) -> Optional[Provider]:
         """根据名称获取云服务提供商"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            row = conn.execute('''
+            SELECT id, name, display_name, color, api_endpoint, created_at
+            FROM providers WHERE name = ?
+            ''', (name,)).fetchone()
         
-        cursor.execute('''
-        SELECT id, name, display_name, color, api_endpoint, created_at
-        FROM providers WHERE name = ?
-        ''', (name,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        return self._row_to_provider(row)
+    
+    def get_all_providers(self) -> List[Provider]:
+        """获取所有云服务提供商"""
+        with self.read_connection() as conn:
+            rows = conn.execute('''
+            SELECT id, name, display_name, color, api_endpoint, created_at
+            FROM providers ORDER BY name
+            ''').fetchall()
         
+        return [self._row_to_provider(row) for row in rows]
+    
+    def _row_to_provider(self, row) -> Optional[Provider]:
+        """将查询结果行转换为Provider对象"""
         if row:
             return Provider(
                 id=row[0],
@@ -187,35 +243,24 @@ class DatabaseManager:
     
     def create_country(self, country: Country) -> Optional[int]:
         """创建国家记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-            INSERT INTO countries (country_code, country_name, continent)
-            VALUES (?, ?, ?)
-            ''', (country.country_code, country.country_name, country.continent))
-            
-            country_id = cursor.lastrowid
-            conn.commit()
-            return country_id
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                INSERT INTO countries (country_code, country_name, continent)
+                VALUES (?, ?, ?)
+                ''', (country.country_code, country.country_name, country.continent))
+                self._data_changed()
+                return cursor.lastrowid
         except sqlite3.Error:
             return None
-        finally:
-            conn.close()
     
     def get_country(self, country_id: int) -> Optional[Country]:
         """根据ID获取国家"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT id, country_code, country_name, continent, created_at
-        FROM countries WHERE id = ?
-        ''', (country_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            row = conn.execute('''
+            SELECT id, country_code, country_name, continent, created_at
+            FROM countries WHERE id = ?
+            ''', (country_id,)).fetchone()
         
         if row:
             return Country(
@@ -227,58 +272,379 @@ class DatabaseManager:
             )
         return None
     
-    def create_availability_zone(self, az: AvailabilityZone) -> Optional[int]:
-        """创建可用区域记录（带去重）"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+    def create_availability_zone(self, az: AvailabilityZone, refresh_stats: bool = True) -> Optional[int]:
+        """创建可用区域记录（带去重）
+
+        批量逐条写入时传 refresh_stats=False，并在同一事务的最后调用一次
+        refresh_stats_snapshot，避免每条记录都重新计算统计快照。
+        """
         try:
-            # 使用INSERT OR IGNORE避免重复，然后UPDATE
-            cursor.execute('''
-            INSERT OR IGNORE INTO availability_zones 
-            (provider_id, region_id, region_name, country_code, continent, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (az.provider_id, az.region_id, az.region_name, 
-                  az.country_code, az.continent, az.status))
-            
-            # 总是更新记录以确保数据最新
-            cursor.execute('''
-            UPDATE availability_zones 
-            SET region_name = ?, country_code = ?, continent = ?, 
-                status = ?, last_updated = CURRENT_TIMESTAMP
-            WHERE provider_id = ? AND region_id = ?
-            ''', (az.region_name, az.country_code, az.continent, 
-                  az.status, az.provider_id, az.region_id))
-            
-            # 获取记录ID
-            cursor.execute('''
-            SELECT id FROM availability_zones 
-            WHERE provider_id = ? AND region_id = ?
-            ''', (az.provider_id, az.region_id))
-            
-            result = cursor.fetchone()
-            conn.commit()
-            return result[0] if result else None
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                
+                # 使用INSERT OR IGNORE避免重复，然后UPDATE
+                cursor.execute('''
+                INSERT OR IGNORE INTO availability_zones 
+                (provider_id, region_id, region_name, country_code, continent, status, macro_order,
+                 latitude, longitude)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (az.provider_id, az.region_id, az.region_name, 
+                      az.country_code, az.continent, az.status, az.macro_order,
+                      az.latitude, az.longitude))
+                
+                # 总是更新记录以确保数据最新
+                cursor.execute('''
+                UPDATE availability_zones 
+                SET region_name = ?, country_code = ?, continent = ?, 
+                    status = ?, macro_order = ?, latitude = ?, longitude = ?,
+                    last_updated = CURRENT_TIMESTAMP
+                WHERE provider_id = ? AND region_id = ?
+                ''', (az.region_name, az.country_code, az.continent, 
+                      az.status, az.macro_order, az.latitude, az.longitude,
+                      az.provider_id, az.region_id))
+                
+                # 获取记录ID
+                cursor.execute('''
+                SELECT id FROM availability_zones 
+                WHERE provider_id = ? AND region_id = ?
+                ''', (az.provider_id, az.region_id))
+                
+                result = cursor.fetchone()
+                if refresh_stats:
+                    rebuild_stats_snapshot(conn)
+                self._data_changed()
+                return result[0] if result else None
                 
         except sqlite3.Error as e:
             print(f"Database error in create_availability_zone: {e}")
             return None
-        finally:
-            conn.close()
     
-    def get_availability_zone(self, az_id: int) -> Optional[AvailabilityZone]:
-        """根据ID获取可用区域"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def upsert_availability_zones(self, provider_id: int, zones: List[AvailabilityZone],
+                                  refresh_stats: bool = True) -> Dict[str, int]:
+        """在一个事务中批量写入某云服务商的区域数据
+
+        只写入新增和有变化的记录，返回新增、更新、未变化的记录数。
+        批量写入多个云服务商时可传入 refresh_stats=False，并在外层事务
+        结束前调用一次 refresh_stats_snapshot。
+        """
+        diff = self.sync_availability_zones(
+            provider_id, zones, refresh_stats=refresh_stats, remove_missing=False
+        )
+        return {
+            'inserted': diff['added'],
+            'updated': diff['changed'],
+            'unchanged': diff['unchanged']
+        }
+    
+    def sync_availability_zones(self, provider_id: int, zones: List[AvailabilityZone],
+                                refresh_stats: bool = True,
+                                remove_missing: bool = True) -> Dict[str, int]:
+        """将某云服务商的区域数据同步为给定的完整列表
+
+        一次读取该云服务商的现有记录并与新数据比较，只写入新增和有变化的
+        记录；remove_missing 为True时，列表中不存在的可用区域标记为
+        REMOVED_STATUS。返回 added / changed / unchanged / removed 计数。
+        """
+        # 同一批次中重复的区域以最后一条为准
+        batch = {az.region_id: az for az in zones}
+        diff = {'added': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
         
-        cursor.execute('''
-        SELECT id, provider_id, region_id, region_name, country_code, 
-               continent, status, last_updated
-        FROM availability_zones WHERE id = ?
-        ''', (az_id,))
+        with self.transaction() as conn:
+            existing = {
+                row[0]: tuple(row[1:])
+                for row in conn.execute('''
+                SELECT region_id, region_name, country_code, continent, status, macro_order,
+                       latitude, longitude
+                FROM availability_zones WHERE provider_id = ?
+                ''', (provider_id,))
+            }
+            
+            rows = []
+            for region_id, az in batch.items():
+                values = (az.region_name, az.country_code, az.continent, az.status, az.macro_order,
+                          az.latitude, az.longitude)
+                current = existing.get(region_id)
+                if current is None:
+                    diff['added'] += 1
+                elif current != values:
+                    diff['changed'] += 1
+                else:
+                    diff['unchanged'] += 1
+                    continue
+                rows.append((provider_id, region_id) + values)
+            
+            removed = []
+            if remove_missing:
+                removed = [
+                    (REMOVED_STATUS, provider_id, region_id)
+                    for region_id, current in existing.items()
+                    if region_id not in batch and current[3] != REMOVED_STATUS
+                ]
+                diff['removed'] = len(removed)
+            
+            if rows:
+                conn.executemany('''
+                INSERT INTO availability_zones
+                (provider_id, region_id, region_name, country_code, continent, status, macro_order,
+                 latitude, longitude)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (provider_id, region_id) DO UPDATE SET
+                    region_name = excluded.region_name,
+                    country_code = excluded.country_code,
+                    continent = excluded.continent,
+                    status = excluded.status,
+                    macro_order = excluded.macro_order,
+                    latitude = excluded.latitude,
+                    longitude = excluded.longitude,
+                    last_updated = CURRENT_TIMESTAMP
+                ''', rows)
+            
+            if removed:
+                conn.executemany('''
+                UPDATE availability_zones
+                SET status = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE provider_id = ? AND region_id = ?
+                ''', removed)
+            
+            if rows or removed:
+                self._data_changed()
+                if refresh_stats:
+                    rebuild_stats_snapshot(conn)
         
-        row = cursor.fetchone()
-        conn.close()
+        return diff
+    
+    def sync_zones(self, provider_id: int, zones_by_region: Dict[str, List[Zone]]) -> Dict[str, int]:
+        """将某云服务商各区域的可用区同步为给定的完整列表
+
+        zones_by_region 以区域ID为键，只同步其中出现的区域（未获取到可用区的
+        区域不要传入，保留现有数据）。列表中不存在的可用区标记为
+        REMOVED_STATUS，并在同一事务中更新有变化区域的 zone_count。
+        返回 added / changed / unchanged / removed 计数。
+        """
+        diff = {'added': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+        if not zones_by_region:
+            return diff
+
+        with self.transaction() as conn:
+            region_ids = {
+                row[0]: row[1]
+                for row in conn.execute(
+                    'SELECT region_id, id FROM availability_zones WHERE provider_id = ?',
+                    (provider_id,)
+                )
+            }
+            # 按区域分组的现有可用区
+            existing: Dict[int, Dict[str, tuple]] = {}
+            for az_id, zone_id, zone_name, status in conn.execute('''
+            SELECT z.az_id, z.zone_id, z.zone_name, z.status
+            FROM zones z JOIN availability_zones az ON z.az_id = az.id
+            WHERE az.provider_id = ?
+            ''', (provider_id,)):
+                existing.setdefault(az_id, {})[zone_id] = (zone_name, status)
+
+            rows = []
+            removed = []
+            touched = set()
+            for region_id, zones in zones_by_region.items():
+                az_id = region_ids.get(region_id)
+                if az_id is None:
+                    continue
+                # 同一区域中重复的可用区以最后一条为准
+                batch = {zone.zone_id: zone for zone in zones}
+                current_zones = existing.get(az_id, {})
+                for zone_id, zone in batch.items():
+                    values = (zone.zone_name, zone.status)
+                    current = current_zones.get(zone_id)
+                    if current is None:
+                        diff['added'] += 1
+                    elif current != values:
+                        diff['changed'] += 1
+                    else:
+                        diff['unchanged'] += 1
+                        continue
+                    rows.append((az_id, zone_id) + values)
+                    touched.add(az_id)
+                for zone_id, current in current_zones.items():
+                    if zone_id not in batch and current[1] != REMOVED_STATUS:
+                        removed.append((REMOVED_STATUS, az_id, zone_id))
+                        touched.add(az_id)
+            diff['removed'] = len(removed)
+
+            if rows:
+                conn.executemany('''
+                INSERT INTO zones (az_id, zone_id, zone_name, status)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (az_id, zone_id) DO UPDATE SET
+                    zone_name = excluded.zone_name,
+                    status = excluded.status,
+                    last_updated = CURRENT_TIMESTAMP
+                ''', rows)
+
+            if removed:
+                conn.executemany('''
+                UPDATE zones SET status = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE az_id = ? AND zone_id = ?
+                ''', removed)
+
+            if rows or removed:
+                self._data_changed()
+
+            # 可用区数量在写入时维护，读取区域列表时不需要关联 zones 表
+            if touched:
+                conn.executemany('''
+                UPDATE availability_zones SET zone_count = (
+                    SELECT COUNT(*) FROM zones WHERE az_id = ? AND status = 'available'
+                ) WHERE id = ?
+                ''', [(az_id, az_id) for az_id in touched])
+
+        return diff
+
+    def get_zones(self, provider_name: str, region_id: str) -> Optional[List[Zone]]:
+        """获取某区域的可用区列表，区域不存在时返回None"""
+        with self.read_connection() as conn:
+            region = conn.execute('''
+            SELECT az.id FROM availability_zones az
+            JOIN providers p ON az.provider_id = p.id
+            WHERE p.name = ? AND az.region_id = ?
+            ''', (provider_name, region_id)).fetchone()
+            if region is None:
+                return None
+            rows = conn.execute('''
+            SELECT id, az_id, zone_id, zone_name, status, last_updated
+            FROM zones WHERE az_id = ? AND status = 'available'
+            ORDER BY zone_id
+            ''', (region[0],)).fetchall()
+
+        return [
+            Zone(
+                id=row[0],
+                az_id=row[1],
+                zone_id=row[2],
+                zone_name=row[3],
+                status=row[4],
+                last_updated=datetime.fromisoformat(row[5]) if row[5] else None
+            )
+            for row in rows
+        ]
+
+    def record_collection_metrics(self, run_id: Optional[str], rows: List[Dict[str, Any]]) -> int:
+        """记录一次刷新中各云服务商的收集指标"""
+        with self.transaction() as conn:
+            return record_metrics(conn, run_id, rows)
+    
+    def get_collection_metrics(self, provider: Optional[str] = None,
+                               limit: int = 50) -> List[Dict[str, Any]]:
+        """获取最近的收集指标记录"""
+        with self.read_connection() as conn:
+            return recent_metrics(conn, provider, limit)
+    
+    def get_collection_summary(self, last_runs: int = 20) -> Dict[str, Dict[str, Any]]:
+        """按云服务商汇总最近N次收集的耗时分位数等指标"""
+        with self.read_connection() as conn:
+            return summarize_metrics(conn, last_runs)
+    
+    def sync_unmapped_regions(self, provider_name: str, regions: List[Dict[str, str]]) -> int:
+        """将某云服务商的未解析区域同步为给定的完整列表
+
+        regions 为本次刷新中无法确定国家的区域（region_id / label /
+        fallback_country）。已记录的区域更新最后出现时间和次数，不再出现
+        （已补充映射或已下线）的区域删除。返回当前未解析区域数。
+        """
+        with self.transaction() as conn:
+            if regions:
+                conn.executemany('''
+                INSERT INTO unmapped_regions (provider, region_id, label, fallback_country)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (provider, region_id) DO UPDATE SET
+                    label = excluded.label,
+                    fallback_country = excluded.fallback_country,
+                    last_seen = CURRENT_TIMESTAMP,
+                    seen_count = seen_count + 1
+                ''', [(provider_name, r['region_id'], r.get('label') or '', r['fallback_country'])
+                      for r in regions])
+            placeholders = ','.join('?' * len(regions))
+            conn.execute(f'''
+            DELETE FROM unmapped_regions
+            WHERE provider = ? AND region_id NOT IN ({placeholders})
+            ''', [provider_name] + [r['region_id'] for r in regions])
+        return len(regions)
+    
+    def get_unmapped_regions(self, provider_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取未解析的区域（按云服务商、区域ID排序）"""
+        query = '''
+        SELECT provider, region_id, label, fallback_country, first_seen, last_seen, seen_count
+        FROM unmapped_regions
+        '''
+        params: List[Any] = []
+        if provider_name:
+            query += ' WHERE provider = ?'
+            params.append(provider_name)
+        query += ' ORDER BY provider, region_id'
+        with self.read_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            dict(zip(('provider', 'region_id', 'label', 'fallback_country',
+                      'first_seen', 'last_seen', 'seen_count'), row))
+            for row in rows
+        ]
+    
+    def reclassify_continents(self, classify: Callable[[str], Tuple[str, int]]) -> int:
+        """按 classify(国家代码) -> (大区, 大区排序) 重新分类国家和区域的大洲
+
+        大区分类的唯一来源是区域目录，目录重新加载后由刷新和应用启动时调用，
+        countries 和 availability_zones 的 continent 与目录保持一致。只写入
+        分类有变化的记录，返回写入的记录数。
+        """
+        with self.transaction() as conn:
+            codes = {
+                row[0] for row in conn.execute('''
+                SELECT country_code FROM countries
+                UNION SELECT country_code FROM availability_zones
+                ''') if row[0]
+            }
+            classes = {code: classify(code) for code in codes}
+            
+            started = conn.total_changes
+            conn.executemany('''
+            UPDATE countries SET continent = ?
+            WHERE country_code = ? AND continent IS NOT ?
+            ''', [(macro_region, code, macro_region) for code, (macro_region, _) in classes.items()])
+            zones_started = conn.total_changes
+            conn.executemany('''
+            UPDATE availability_zones SET continent = ?, macro_order = ?
+            WHERE country_code = ? AND (continent IS NOT ? OR macro_order != ?)
+            ''', [(macro_region, order, code, macro_region, order)
+                  for code, (macro_region, order) in classes.items()])
+            
+            changed = conn.total_changes - started
+            if conn.total_changes != zones_started:
+                rebuild_stats_snapshot(conn)
+            if changed:
+                self._data_changed()
+            return changed
+    
+    def refresh_stats_snapshot(self) -> Dict[str, Any]:
+        """重新计算统计快照（在调用方的写事务中执行时与数据写入一同提交）"""
+        with self.transaction() as conn:
+            return rebuild_stats_snapshot(conn)
+    
+    def get_stats_snapshot(self) -> Dict[str, Any]:
+        """读取统计快照（单次主键查询），快照缺失时实时计算"""
+        with self.read_connection() as conn:
+            try:
+                snapshot = read_stats_snapshot(conn)
+            except sqlite3.OperationalError:
+                snapshot = None
+            return snapshot if snapshot is not None else compute_stats(conn)
+    
+    def get_availability_zone(self, az_id: int) -> Optional[AvailabilityZone]:
+        """根据ID获取可用区域"""
+        with self.connection() as conn:
+            row = conn.execute('''
+            SELECT id, provider_id, region_id, region_name, country_code, 
+                   continent, status, macro_order, latitude, longitude, last_updated
+            FROM availability_zones WHERE id = ?
+            ''', (az_id,)).fetchone()
         
         if row:
             return AvailabilityZone(
@@ -289,57 +655,44 @@ class DatabaseManager:
                 country_code=row[4],
                 continent=row[5],
                 status=row[6],
-                last_updated=datetime.fromisoformat(row[7]) if row[7] else None
+                macro_order=row[7],
+                latitude=row[8],
+                longitude=row[9],
+                last_updated=datetime.fromisoformat(row[10]) if row[10] else None
             )
         return None
     
     def get_countries_by_provider(self, provider_name: str) -> List[str]:
         """获取指定云服务商覆盖的国家列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            rows = conn.execute('''
+            SELECT DISTINCT az.country_code
+            FROM availability_zones az
+            JOIN providers p ON az.provider_id = p.id
+            WHERE p.name = ? AND az.status = 'available'
+            ''', (provider_name,)).fetchall()
         
-        cursor.execute('''
-        SELECT DISTINCT az.country_code
-        FROM availability_zones az
-        JOIN providers p ON az.provider_id = p.id
-        WHERE p.name = ? AND az.status = 'available'
-        ''', (provider_name,))
-        
-        countries = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return countries
+        return [row[0] for row in rows]
     
     def create_update_log(self, log: UpdateLog) -> Optional[int]:
         """创建更新日志记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-            INSERT INTO update_logs (provider_id, status, message)
-            VALUES (?, ?, ?)
-            ''', (log.provider_id, log.status, log.message))
-            
-            log_id = cursor.lastrowid
-            conn.commit()
-            return log_id
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                INSERT INTO update_logs (provider_id, status, message)
+                VALUES (?, ?, ?)
+                ''', (log.provider_id, log.status, log.message))
+                return cursor.lastrowid
         except sqlite3.Error:
             return None
-        finally:
-            conn.close()
     
     def get_update_log(self, log_id: int) -> Optional[UpdateLog]:
         """根据ID获取更新日志"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT id, provider_id, update_time, status, message
-        FROM update_logs WHERE id = ?
-        ''', (log_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            row = conn.execute('''
+            SELECT id, provider_id, update_time, status, message
+            FROM update_logs WHERE id = ?
+            ''', (log_id,)).fetchone()
         
         if row:
             return UpdateLog(
@@ -353,21 +706,19 @@ class DatabaseManager:
     
     def get_all_countries_with_providers(self) -> List[Dict[str, Any]]:
         """获取所有国家及其云服务商信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT c.country_code, c.country_name, c.continent,
-               GROUP_CONCAT(p.name) as providers
-        FROM countries c
-        LEFT JOIN availability_zones az ON c.country_code = az.country_code
-        LEFT JOIN providers p ON az.provider_id = p.id
-        WHERE az.status = 'available' OR az.status IS NULL
-        GROUP BY c.country_code, c.country_name, c.continent
-        ''')
+        with self.read_connection() as conn:
+            rows = conn.execute('''
+            SELECT c.country_code, c.country_name, c.continent,
+                   GROUP_CONCAT(p.name) as providers
+            FROM countries c
+            LEFT JOIN availability_zones az ON c.country_code = az.country_code
+            LEFT JOIN providers p ON az.provider_id = p.id
+            WHERE az.status = 'available' OR az.status IS NULL
+            GROUP BY c.country_code, c.country_name, c.continent
+            ''').fetchall()
         
         countries_data = []
-        for row in cursor.fetchall():
+        for row in rows:
             providers = row[3].split(',') if row[3] else []
             countries_data.append({
                 'country_code': row[0],
@@ -376,5 +727,4 @@ class DatabaseManager:
                 'providers': providers
             })
         
-        conn.close()
         return countries_data
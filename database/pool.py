@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """等待可用连接超时"""
+
+
+class ConnectionPool:
+    """线程安全的SQLite连接池
+
+    - 同一线程内嵌套获取连接时复用同一个连接（可重入）
+    - 归还的连接进入空闲栈，后续请求直接复用，避免每次请求都重新建立连接
+    - 打开的连接数达到上限时阻塞等待，并记录等待次数
+    - 检测到fork（如gunicorn --preload）后丢弃父进程的连接并重建连接池
+    """
+
+    def __init__(self, db_path: str, max_connections: int = 8, timeout: float = 30.0,
+                 uri: bool = False, on_connect: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.uri = uri
+        self._on_connect = on_connect
+        # fork后继承来的连接只保留引用、不关闭，避免影响父进程持有的数据库句柄
+        self._inherited: List[sqlite3.Connection] = []
+        self._reset()
+
+    def _reset(self):
+        """(重新)初始化连接池状态"""
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._idle: List[sqlite3.Connection] = []
+        self._open = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.opened = 0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._inherited.extend(self._idle)
+            self._reset()
+
+    @contextmanager
+    def connection(self):
+        """获取连接（上下文管理器），同一线程内可重入"""
+        self._check_fork()
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            local.depth += 1
+            try:
+                yield conn
+            finally:
+                local.depth -= 1
+            return
+
+        conn = self._acquire()
+        local.conn = conn
+        local.depth = 1
+        try:
+            yield conn
+        finally:
+            local.conn = None
+            local.depth = 0
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """在事务中执行（上下文管理器）
+
+        已处于事务中时以SAVEPOINT嵌套在外层事务中，异常时只回滚到该保存点；
+        否则开启新事务，正常退出时提交，异常时回滚。
+        写事务默认使用BEGIN IMMEDIATE，提前获取写锁避免锁升级死锁。
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                savepoint = f'sp_{self._local.depth}'
+                conn.execute(f'SAVEPOINT {savepoint}')
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute(f'ROLLBACK TO {savepoint}')
+                    conn.execute(f'RELEASE {savepoint}')
+                    raise
+                else:
+                    conn.execute(f'RELEASE {savepoint}')
+                return
+
+            conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            self._local.after_commit = []
+            try:
+                yield conn
+            except BaseException:
+                self._local.after_commit = None
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+                callbacks, self._local.after_commit = self._local.after_commit, None
+                for callback in callbacks:
+                    callback()
+
+    def after_commit(self, callback: Callable[[], Any]):
+        """当前线程的事务提交后调用 callback（不在事务中时立即调用）
+
+        同一事务中重复注册的同一个 callback 只调用一次；事务回滚时全部丢弃。
+        """
+        pending = getattr(self._local, 'after_commit', None)
+        if pending is None:
+            callback()
+        elif callback not in pending:
+            pending.append(callback)
+
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            self.checkouts += 1
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open < self.max_connections:
+                    self._open += 1
+                    break
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise PoolTimeout(f'No database connection available within {self.timeout}s')
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, conn: sqlite3.Connection):
+        if self._pid != os.getpid():
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            uri=self.uri,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        if self._on_connect:
+            self._on_connect(conn)
+        with self._cond:
+            self.opened += 1
+        return conn
+
+    def close(self):
+        """关闭所有空闲连接"""
+        self._check_fork()
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        with self._cond:
+            return {
+                'max_connections': self.max_connections,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'opened': self.opened
+            }
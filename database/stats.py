@@ -0,0 +1,109 @@
+"""
+统计快照 - 预先计算 /api/stats 所需的统计数据
+
+统计数据只在写入区域数据时变化，因此在写事务内重新计算并保存到 stats_snapshot
+表（只有一行），读取时只需一次主键查询，开销与区域数量无关。
+"""
+import json
+import sqlite3
+from typing import Any, Dict, Optional
+
+SNAPSHOT_ID = 1
+
+
+def compute_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """实时计算统计数据"""
+    cursor = conn.cursor()
+
+    # 总区域数
+    cursor.execute("SELECT COUNT(*) FROM availability_zones WHERE status = 'available'")
+    total_regions = cursor.fetchone()[0]
+
+    # 总国家数
+    cursor.execute("SELECT COUNT(DISTINCT country_code) FROM availability_zones WHERE status = 'available'")
+    total_countries = cursor.fetchone()[0]
+
+    # 总云服务商数
+    cursor.execute('SELECT COUNT(*) FROM providers')
+    total_providers = cursor.fetchone()[0]
+
+    # 每个云服务商的区域数
+    cursor.execute('''
+    SELECT p.name, COUNT(az.id)
+    FROM providers p
+    LEFT JOIN availability_zones az ON p.id = az.provider_id AND az.status = 'available'
+    GROUP BY p.id, p.name
+    ORDER BY p.name
+    ''')
+    regions_by_provider = dict(cursor.fetchall())
+
+    # 每个大区的区域数（按大区显示顺序）
+    cursor.execute('''
+    SELECT continent, COUNT(*)
+    FROM availability_zones
+    WHERE status = 'available'
+    GROUP BY continent
+    ORDER BY MIN(macro_order), continent
+    ''')
+    regions_by_continent = dict(cursor.fetchall())
+
+    # 每个国家的云服务商数
+    cursor.execute('''
+    SELECT country_code, COUNT(DISTINCT provider_id)
+    FROM availability_zones
+    WHERE status = 'available'
+    GROUP BY country_code
+    ORDER BY country_code
+    ''')
+    providers_by_country = dict(cursor.fetchall())
+
+    return {
+        'total_regions': total_regions,
+        'total_countries': total_countries,
+        'total_providers': total_providers,
+        'regions_by_provider': regions_by_provider,
+        'regions_by_continent': regions_by_continent,
+        'providers_by_country': providers_by_country
+    }
+
+
+def rebuild_stats_snapshot(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """重新计算并保存统计快照（应在写事务内调用）"""
+    stats = compute_stats(conn)
+    conn.execute('''
+    INSERT OR REPLACE INTO stats_snapshot
+    (id, total_regions, total_countries, total_providers,
+     regions_by_provider, regions_by_continent, providers_by_country, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (
+        SNAPSHOT_ID,
+        stats['total_regions'],
+        stats['total_countries'],
+        stats['total_providers'],
+        json.dumps(stats['regions_by_provider']),
+        json.dumps(stats['regions_by_continent']),
+        json.dumps(stats['providers_by_country'])
+    ))
+    return stats
+
+
+def read_stats_snapshot(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+    """读取统计快照（单次主键查询），不存在时返回None"""
+    row = conn.execute('''
+    SELECT total_regions, total_countries, total_providers,
+           regions_by_provider, regions_by_continent, providers_by_country, updated_at
+    FROM stats_snapshot WHERE id = ?
+    ''', (SNAPSHOT_ID,)).fetchone()
+
+    if not row:
+        return None
+
+    return {
+        'total_regions': row[0],
+        'total_countries': row[1],
+        'total_providers': row[2],
+        'regions_by_provider': json.loads(row[3]),
+        'regions_by_continent': json.loads(row[4]),
+        'providers_by_country': json.loads(row[5]),
+        'updated_at': row[6]
+    }
@@ -0,0 +1,60 @@
+import os
+import threading
+from typing import Optional, Tuple
+
+
+class WalCheckpointer:
+    """WAL检查点策略
+
+    SQLite在写事务提交时会自动做被动检查点（wal_autocheckpoint），但长时间有读连接时
+    WAL文件仍可能持续增长。本类在后台线程中定期检查WAL文件大小，超过阈值时执行
+    被动检查点（不阻塞读写），配合journal_size_limit将WAL文件截断到有限大小。
+    """
+
+    def __init__(self, db_manager, interval: float = 60.0, size_limit: int = 64 * 1024 * 1024):
+        self.db_manager = db_manager
+        self.interval = interval
+        self.size_limit = size_limit
+        self.wal_path = f'{db_manager.db_path}-wal'
+        self.checkpoints = 0
+        self._pid: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def wal_size(self) -> int:
+        """当前WAL文件大小（字节）"""
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    def maybe_checkpoint(self, force: bool = False) -> Optional[Tuple[int, int, int]]:
+        """WAL超过阈值（或force）时执行被动检查点"""
+        if not force and self.wal_size() < self.size_limit:
+            return None
+        result = self.db_manager.checkpoint('PASSIVE')
+        self.checkpoints += 1
+        return result
+
+    def ensure_started(self):
+        """确保当前进程中后台线程已启动（fork后的子进程会重新启动）"""
+        if self.interval <= 0:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='wal-checkpointer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop.set()
+
+    def _run(self):
+        stop = self._stop
+        while not stop.wait(self.interval):
+            try:
+                self.maybe_checkpoint()
+            except Exception as e:
+                print(f"WAL checkpoint failed: {e}")
@@ -0,0 +1,94 @@
+"""
+区域间距离矩阵
+
+用NumPy广播按块计算haversine大圆距离（float32，单位公里）。每次只计算
+若干行与全部目标列之间的距离，单个块的元素数不超过 block_elements，
+临时数组的内存与区域总数的平方无关；只在需要完整矩阵时才分配 N×M 的
+结果。接口层通过 PayloadStore 按数据代际缓存计算结果。
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .spatial_index import EARTH_RADIUS_KM
+
+# 单个计算块的最大元素数（float32，每个临时数组约4MB）
+BLOCK_ELEMENTS = 1 << 20
+
+
+class DistanceMatrix:
+    """一组区域之间的距离计算（坐标为空的区域不参与计算）"""
+
+    def __init__(self, regions: Sequence[Dict[str, Any]], block_elements: int = BLOCK_ELEMENTS):
+        self.regions: List[Dict[str, Any]] = [
+            r for r in regions if r.get('latitude') is not None and r.get('longitude') is not None
+        ]
+        self.block_elements = block_elements
+        self.providers = np.array([r['provider'] for r in self.regions], dtype=object)
+        self._lat = np.radians(np.array([r['latitude'] for r in self.regions], dtype=np.float64)).astype(np.float32)
+        self._lon = np.radians(np.array([r['longitude'] for r in self.regions], dtype=np.float64)).astype(np.float32)
+        self._cos_lat = np.cos(self._lat)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def indices(self, providers: Optional[Sequence[str]] = None) -> np.ndarray:
+        """属于给定云服务商的区域下标（未指定时为全部区域）"""
+        if not providers:
+            return np.arange(len(self.regions))
+        return np.flatnonzero(np.isin(self.providers, list(providers)))
+
+    def blocks(self, rows: np.ndarray, cols: np.ndarray) -> Iterator[Tuple[int, np.ndarray]]:
+        """按块计算 rows × cols 的距离，依次返回 (块的起始行, 距离块)"""
+        step = max(1, self.block_elements // max(len(cols), 1))
+        lat2, lon2, cos2 = self._lat[cols], self._lon[cols], self._cos_lat[cols]
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            yield start, self._haversine(self._lat[block], self._lon[block], self._cos_lat[block],
+                                         lat2, lon2, cos2)
+
+    def matrix(self, rows: Optional[np.ndarray] = None, cols: Optional[np.ndarray] = None) -> np.ndarray:
+        """完整的距离矩阵（float32，rows × cols）"""
+        rows = self.indices() if rows is None else rows
+        cols = rows if cols is None else cols
+        result = np.empty((len(rows), len(cols)), dtype=np.float32)
+        for start, block in self.blocks(rows, cols):
+            result[start:start + len(block)] = block
+        return result
+
+    def closest(self, rows: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """rows 中每个区域在 cols 中最近的区域，返回 (cols中的位置, 距离)
+
+        不会把区域自身作为最近的区域；cols 为空时位置为-1、距离为inf。
+        """
+        positions = np.full(len(rows), -1, dtype=np.int64)
+        distances = np.full(len(rows), np.inf, dtype=np.float32)
+        if len(cols) == 0:
+            return positions, distances
+        for start, block in self.blocks(rows, cols):
+            block[rows[start:start + len(block), None] == cols[None, :]] = np.inf
+            nearest = block.argmin(axis=1)
+            positions[start:start + len(block)] = nearest
+            distances[start:start + len(block)] = block[np.arange(len(block)), nearest]
+        positions[np.isinf(distances)] = -1
+        return positions, distances
+
+    @staticmethod
+    def _haversine(lat1, lon1, cos1, lat2, lon2, cos2) -> np.ndarray:
+        # 原地运算，每个块只分配两个与块同样大小的临时数组
+        h = lat1[:, None] - lat2[None, :]
+        h *= 0.5
+        np.sin(h, out=h)
+        h *= h
+        dlon = lon1[:, None] - lon2[None, :]
+        dlon *= 0.5
+        np.sin(dlon, out=dlon)
+        dlon *= dlon
+        dlon *= cos1[:, None]
+        dlon *= cos2[None, :]
+        h += dlon
+        np.clip(h, 0.0, 1.0, out=h)
+        np.sqrt(h, out=h)
+        np.arcsin(h, out=h)
+        h *= np.float32(2.0 * EARTH_RADIUS_KM)
+        return h
@@ -0,0 +1,87 @@
+"""
+文件锁 - 同一台主机上多个进程之间的互斥
+
+基于 fcntl.flock，进程退出（包括崩溃）时操作系统自动释放锁，不会残留。
+不支持 fcntl 的平台上退化为进程内的线程锁。
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows等平台只做进程内互斥
+    fcntl = None
+
+
+class FileLock:
+    """非重入的跨进程文件锁"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def locked(self) -> bool:
+        """当前进程是否持有该锁"""
+        return self._fd is not None
+
+    def acquire(self, timeout: Optional[float] = 0, poll_interval: float = 0.5,
+                on_wait: Optional[Callable[[], None]] = None) -> bool:
+        """获取锁
+
+        timeout 为0时不等待，为None时一直等待；on_wait 在每次等待时调用
+        （例如刷新任务心跳）。获取成功返回True。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._try_acquire():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if on_wait is not None:
+                on_wait()
+            time.sleep(poll_interval)
+
+    def release(self):
+        """释放锁"""
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire(timeout=None)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _try_acquire(self) -> bool:
+        # 先取得进程内的锁，保护 _fd 不被同一进程的其他线程覆盖
+        if not self._thread_lock.acquire(blocking=False):
+            return False
+        if fcntl is None:
+            self._fd = -1
+            return True
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            self._thread_lock.release()
+            raise
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            self._thread_lock.release()
+            return False
+        self._fd = fd
+        return True
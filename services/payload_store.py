@@ -0,0 +1,127 @@
+import gzip
+import json
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from .response_cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只提供gzip/deflate
+    brotli = None
+
+# 协商时的编码优先级（压缩率从高到低）
+ENCODING_PREFERENCE = ('br', 'gzip', 'deflate')
+
+# 当前环境能够生成的压缩编码
+AVAILABLE_ENCODINGS = tuple(e for e in ENCODING_PREFERENCE if e != 'br' or brotli is not None)
+
+
+def negotiate_encoding(accept_encodings, available: Iterable[str] = AVAILABLE_ENCODINGS) -> Optional[str]:
+    """按编码优先级和Accept-Encoding的q值选择压缩编码，都不接受时返回None"""
+    available = set(available)
+    best, best_quality = None, 0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        quality = accept_encodings[encoding] if accept_encodings else 0
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+@dataclass(frozen=True)
+class Payload:
+    """预序列化、预压缩的JSON响应体"""
+    body: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def from_data(cls, data: Any) -> 'Payload':
+        """序列化为紧凑JSON并生成各压缩版本"""
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        encoded = {
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+            'deflate': zlib.compress(body, 9)
+        }
+        if brotli is not None:
+            encoded['br'] = brotli.compress(body)
+        return cls(body=body, encoded=encoded)
+
+    @property
+    def size(self) -> int:
+        """原始内容与各压缩版本的总字节数"""
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+    def select(self, accept_encodings) -> Tuple[bytes, Optional[str]]:
+        """根据Accept-Encoding选择响应体，返回 (bytes, Content-Encoding)"""
+        best = negotiate_encoding(accept_encodings, self.encoded)
+
+        # 压缩后反而更大时直接返回原始内容
+        if best is None or len(self.encoded[best]) >= len(self.body):
+            return self.body, None
+        return self.encoded[best], best
+
+
+class PayloadStore:
+    """按数据代际预先生成的响应体存储
+
+    数据代际号变化后，第一次访问会在一个读事务中构建所有规范化响应
+    （各云服务商子集的区域列表、各大洲的国家列表、统计、颜色等），
+    一次性完成序列化和压缩。之后的请求直接返回存储的字节，不再做任何
+    JSON编码或压缩。非规范化的请求参数退回到按需构建的响应缓存。
+    """
+
+    def __init__(self, generation, build_all: Callable[[], Iterable[Tuple[Hashable, Any]]],
+                 fallback: ResponseCache):
+        self.generation = generation
+        self.build_all = build_all
+        self.fallback = fallback
+        # (代际号, 响应体) 作为一个元组整体替换，读取方总是看到相互匹配的一对
+        self._snapshot: Tuple[Optional[int], Dict[Hashable, Payload]] = (None, {})
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def warm(self) -> int:
+        """为当前数据代际构建全部规范化响应体，返回数量"""
+        return len(self._current(self.generation.current()))
+
+    def get(self, endpoint: str, args: Optional[Dict[str, Any]],
+            builder: Callable[[], Any]) -> Payload:
+        """获取响应体：优先使用预生成的规范化响应，否则按需构建并缓存"""
+        key = ResponseCache.make_key(endpoint, args)
+        payload = self._current(self.generation.current()).get(key)
+        if payload is not None:
+            return payload
+        return self.fallback.get_or_build(endpoint, args, lambda: Payload.from_data(builder()))
+
+    def stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        generation, payloads = self._snapshot
+        return {
+            'generation': generation,
+            'payloads': len(payloads),
+            'bytes': sum(len(p.body) for p in payloads.values()),
+            'builds': self.builds,
+            'encodings': ['identity'] + list(AVAILABLE_ENCODINGS)
+        }
+
+    def _current(self, generation: int) -> Dict[Hashable, Payload]:
+        """给定代际的响应体集合，代际号不一致时重新构建"""
+        snapshot = self._snapshot
+        if snapshot[0] != generation:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot[0] != generation:
+                    snapshot = self._rebuild(generation)
+        return snapshot[1]
+
+    def _rebuild(self, generation: int) -> Tuple[int, Dict[Hashable, Payload]]:
+        """重新构建全部响应体（调用方需持有锁）"""
+        payloads = {key: Payload.from_data(data) for key, data in self.build_all()}
+        # 整体替换，读取方要么看到旧的完整集合，要么看到新的完整集合
+        self._snapshot = (generation, payloads)
+        self.builds += 1
+        return self._snapshot
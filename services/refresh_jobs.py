@@ -0,0 +1,275 @@
+"""
+后台刷新任务 - 数据刷新在后台线程中执行，接口立即返回任务ID
+
+任务状态保存在 refresh_jobs 表中，所有worker共享：任意worker都可以查询
+任务进度，已有任务在运行时新的刷新请求会直接加入该任务，不会重复调用
+云服务商API。实际的数据收集由主机级文件锁保护，应用内的刷新任务和
+独立运行的调度器不会同时收集数据。
+"""
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .file_lock import FileLock
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class RefreshJobManager:
+    """刷新任务管理器
+
+    collector_factory: 返回数据收集器实例的可调用对象
+    on_complete: 数据写入完成后调用（例如预先生成响应体），异常不影响任务结果
+    stale_after: 运行中的任务超过该秒数没有心跳即视为已失效（worker崩溃等），
+                 之后的刷新请求会创建新任务
+    lock_timeout: 等待其他进程中的刷新结束的最长时间，超时后任务失败
+    heartbeat_interval: 任务运行期间定期刷新心跳的间隔，默认为 stale_after 的三分之一
+    """
+
+    def __init__(self, db_manager, collector_factory: Callable[[], Any],
+                 on_complete: Optional[Callable[[], Any]] = None,
+                 max_workers: int = 1, stale_after: float = 300.0,
+                 lock_timeout: float = 600.0, heartbeat_interval: Optional[float] = None):
+        self.db_manager = db_manager
+        self.collector_factory = collector_factory
+        self.on_complete = on_complete
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self.lock_timeout = lock_timeout
+        self.heartbeat_interval = heartbeat_interval or stale_after / 3
+        self.lock = FileLock(f'{db_manager.db_path}.refresh.lock')
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, providers: Optional[Sequence[str]] = None) -> Tuple[Dict[str, Any], bool]:
+        """提交刷新任务，返回 (任务, 是否加入了已有任务)
+
+        providers 为None时刷新全部云服务商；已有任务覆盖所请求的云服务商时直接加入。
+        """
+        requested = sorted(set(providers)) if providers is not None else None
+        threshold = f'-{int(self.stale_after)} seconds'
+
+        with self.db_manager.transaction() as conn:
+            # BEGIN IMMEDIATE 持有写锁，多个worker同时提交时只会创建一个任务
+            # 失效的任务标记为失败，避免一直显示为运行中
+            conn.execute('''
+            UPDATE refresh_jobs
+            SET status = ?, error = 'Job stopped responding',
+                finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE status IN (?, ?) AND updated_at < datetime('now', ?)
+            ''', (FAILED,) + ACTIVE_STATUSES + (threshold,))
+
+            job_id, joined = None, False
+            for row in conn.execute('''
+            SELECT id, providers FROM refresh_jobs
+            WHERE status IN (?, ?)
+            ORDER BY created_at DESC
+            ''', ACTIVE_STATUSES):
+                if self._covers(row[1], requested):
+                    job_id, joined = row[0], True
+                    break
+
+            if not joined:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    'INSERT INTO refresh_jobs (id, status, providers) VALUES (?, ?, ?)',
+                    (job_id, QUEUED, json.dumps(requested) if requested is not None else None)
+                )
+
+        if not joined:
+            future = self._get_executor().submit(self._run, job_id, requested)
+            with self._lock:
+                self._futures[job_id] = future
+            future.add_done_callback(lambda _: self._forget(job_id))
+        return self.get(job_id), joined
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态，不存在时返回None"""
+        with self.db_manager.read_connection() as conn:
+            row = conn.execute('''
+            SELECT id, status, progress, result, error, created_at, updated_at, finished_at,
+                   providers
+            FROM refresh_jobs WHERE id = ?
+            ''', (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'job_id': row[0],
+            'status': row[1],
+            'progress': json.loads(row[2]) if row[2] else {},
+            'result': json.loads(row[3]) if row[3] else None,
+            'error': row[4],
+            'created_at': row[5],
+            'updated_at': row[6],
+            'finished_at': row[7],
+            'providers': json.loads(row[8]) if row[8] else None,
+            'done': row[1] not in ACTIVE_STATUSES
+        }
+
+    def wait(self, job_id: str, timeout: Optional[float] = None,
+             poll_interval: float = 1.0) -> Optional[Dict[str, Any]]:
+        """等待任务完成并返回最终状态（其他进程中的任务通过轮询等待）"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+            return self.get(job_id)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['done']:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def shutdown(self, wait: bool = True):
+        """关闭后台线程池"""
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+        self._executor = None
+        self._executor_pid = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """延迟创建线程池（fork后的子进程重新创建）"""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='refresh-job'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    @staticmethod
+    def _covers(job_providers: Optional[str], requested: Optional[List[str]]) -> bool:
+        """已有任务是否覆盖所请求的云服务商"""
+        if job_providers is None:
+            return True
+        if requested is None:
+            return False
+        return set(requested) <= set(json.loads(job_providers))
+
+    def _forget(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id: str, providers: Optional[List[str]] = None):
+        """在后台线程中执行刷新"""
+        # 同一主机上同时只运行一个数据收集（应用内任务或独立调度器），等待时保持心跳
+        if not self.lock.acquire(timeout=self.lock_timeout, poll_interval=1.0,
+                                 on_wait=lambda: self._update(job_id)):
+            self._update(job_id, status=FAILED, error='Another refresh is still running')
+            return
+        try:
+            # 单个云服务商的请求或数据库写入可能很久没有进度回调，心跳由后台线程定期刷新
+            with self._heartbeat(job_id):
+                self._collect(job_id, providers)
+        finally:
+            self.lock.release()
+
+    @contextlib.contextmanager
+    def _heartbeat(self, job_id: str):
+        """在上下文期间每隔 heartbeat_interval 秒刷新一次任务心跳"""
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(self.heartbeat_interval):
+                self._update(job_id)
+
+        thread = threading.Thread(target=beat, name=f'refresh-heartbeat-{job_id[:8]}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _collect(self, job_id: str, providers: Optional[List[str]]):
+        progress: Dict[str, Dict[str, Any]] = {}
+        self._update(job_id, status=RUNNING, progress=progress)
+
+        def report(provider_name: str, status: str, count: int):
+            progress[provider_name] = {'status': status, 'regions': count}
+            self._update(job_id, progress=progress)
+
+        try:
+            collector = self.collector_factory()
+
+            kwargs = {'progress': report}
+            if providers is not None:
+                kwargs['providers'] = providers
+            loop = asyncio.new_event_loop()
+            try:
+                regions_data = loop.run_until_complete(collector.collect_all_regions(**kwargs))
+            finally:
+                loop.close()
+
+            collector.update_database(self.db_manager, regions_data, run_id=job_id)
+
+            if self.on_complete is not None:
+                try:
+                    self.on_complete()
+                except Exception as e:
+                    print(f"Refresh job {job_id} post-processing failed: {e}")
+
+            # 未写入的云服务商（内容未变化、失败、熔断、超时）结果为None
+            regions_by_provider = {
+                k: len(v) if v is not None else None for k, v in regions_data.items()
+            }
+            total_regions = sum(v for v in regions_by_provider.values() if v)
+            statuses = {k: p['status'] for k, p in progress.items()}
+            result = {
+                'message': f'Successfully updated {total_regions} regions',
+                'regions_by_provider': regions_by_provider,
+                'unchanged': sorted(k for k, v in statuses.items() if v == 'unchanged'),
+                'failed': sorted(k for k, v in statuses.items() if v not in ('succeeded', 'unchanged'))
+            }
+            self._update(job_id, status=SUCCEEDED, progress=progress, result=result)
+        except Exception as e:
+            print(f"Refresh job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, progress=progress, error=str(e))
+
+    def _update(self, job_id: str, status: Optional[str] = None,
+                progress: Optional[Dict[str, Any]] = None,
+                result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """更新任务状态，同时刷新心跳时间"""
+        assignments = ['updated_at = CURRENT_TIMESTAMP']
+        params = []
+        if status is not None:
+            assignments.append('status = ?')
+            params.append(status)
+            if status not in ACTIVE_STATUSES:
+                assignments.append('finished_at = CURRENT_TIMESTAMP')
+        if progress is not None:
+            assignments.append('progress = ?')
+            params.append(json.dumps(progress))
+        if result is not None:
+            assignments.append('result = ?')
+            params.append(json.dumps(result))
+        if error is not None:
+            assignments.append('error = ?')
+            params.append(error)
+        params.append(job_id)
+
+        try:
+            with self.db_manager.transaction() as conn:
+                conn.execute(
+                    f"UPDATE refresh_jobs SET {', '.join(assignments)} WHERE id = ?", params
+                )
+        except Exception as e:
+            print(f"Failed to update refresh job {job_id}: {e}")
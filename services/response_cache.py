@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_list_arg(value: Optional[str]) -> Tuple[str, ...]:
+    """规范化逗号分隔的查询参数：去空白、去重、小写并排序"""
+    if not value:
+        return ()
+    items = {item.strip().lower() for item in value.split(',')}
+    items.discard('')
+    return tuple(sorted(items))
+
+
+class ResponseCache:
+    """按数据代际失效的进程内响应缓存
+
+    以 (endpoint, 规范化参数) 为键缓存各接口的结果。数据代际号变化时，
+    整个缓存在下一次访问时被原子地清空；容量有限，按LRU淘汰。
+    指定 sizeof 时还按结果的总字节数（max_bytes）限制容量，超过
+    max_bytes 的单个结果不缓存。
+    """
+
+    def __init__(self, generation, max_entries: int = 256, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.generation = generation
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._entries_generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(endpoint: str, args: Optional[Dict[str, Any]] = None) -> Hashable:
+        """生成缓存键"""
+        if not args:
+            return (endpoint,)
+        return (endpoint,) + tuple(sorted(args.items()))
+
+    def get_or_build(self, endpoint: str, args: Optional[Dict[str, Any]],
+                     builder: Callable[[], Any]) -> Any:
+        """命中则返回缓存结果，否则调用builder构建并缓存"""
+        key = self.make_key(endpoint, args)
+        # 先读取代际号再构建，构建期间若发生刷新，结果会在下次访问时失效
+        generation = self.generation.current()
+
+        with self._lock:
+            self._sync_generation(generation)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = builder()
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if self._entries_generation == generation:
+                self._bytes += size - self._sizes.get(key, 0)
+                self._entries[key] = value
+                self._sizes[key] = size
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries or (
+                        self.max_bytes is not None and self._bytes > self.max_bytes):
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._bytes -= self._sizes.pop(evicted)
+                    self.evictions += 1
+
+        return value
+
+    def invalidate(self):
+        """清空缓存"""
+        with self._lock:
+            self._clear()
+            self._entries_generation = None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'generation': self._entries_generation,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _sync_generation(self, generation: int):
+        """代际号变化时清空缓存（调用方需持有锁）"""
+        if self._entries_generation != generation:
+            self._clear()
+            self._entries_generation = generation
+
+    def _clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self._bytes = 0
@@ -0,0 +1,238 @@
+"""
+定时刷新调度器 - 按云服务商的刷新间隔自动刷新数据
+
+每个云服务商的下次刷新时间保存在 refresh_schedule 表中：
+- 刷新间隔可以按云服务商配置，并加入随机抖动，避免多个云服务商或多台主机同时请求
+- 服务停止一段时间后重新启动时，已过期的云服务商在下一次检查时刷新一次（合并为
+  一个刷新任务），不会补跑错过的每一次
+- 刷新失败的云服务商按较短的重试间隔重新安排
+
+调度器可以在应用进程内运行（REFRESH_SCHEDULER=app），也可以独立运行：
+
+    python -m services.scheduler          # 持续运行
+    python -m services.scheduler --once   # 只检查并执行一次到期的刷新
+
+多个gunicorn worker或独立进程同时运行调度器时，每次检查都需要先获取主机级
+文件锁，同一时间只有一个调度器在检查和刷新；实际的数据收集由刷新任务的锁保护。
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .file_lock import FileLock
+
+# 默认刷新间隔（秒）
+DEFAULT_INTERVAL = 6 * 3600
+
+# 刷新失败后的默认重试间隔（秒）
+DEFAULT_RETRY_INTERVAL = 15 * 60
+
+# 视为刷新成功的云服务商进度状态
+SUCCESS_STATUSES = ('succeeded', 'unchanged')
+
+
+class RefreshScheduler:
+    """按云服务商间隔调度刷新任务
+
+    refresh_jobs: RefreshJobManager，到期的云服务商通过刷新任务执行
+    intervals: 各云服务商的刷新间隔（秒），未配置的使用 default_interval
+    jitter: 间隔的随机抖动比例，例如0.1表示 ±10%
+    poll_interval: 后台线程检查到期云服务商的间隔（秒）
+    """
+
+    def __init__(self, db_manager, refresh_jobs, intervals: Optional[Dict[str, float]] = None,
+                 default_interval: float = DEFAULT_INTERVAL, jitter: float = 0.1,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL, poll_interval: float = 60.0,
+                 job_timeout: float = 1800.0, clock: Callable[[], float] = time.time):
+        self.db_manager = db_manager
+        self.refresh_jobs = refresh_jobs
+        self.intervals = dict(intervals or {})
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self.retry_interval = retry_interval
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.clock = clock
+        self.lock = FileLock(f'{db_manager.db_path}.scheduler.lock')
+        self.runs = 0
+        self._pid: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def interval_for(self, provider: str) -> float:
+        """获取云服务商的刷新间隔"""
+        return self.intervals.get(provider, self.default_interval)
+
+    def next_run_time(self, provider: str, now: float, failed: bool = False) -> float:
+        """计算下次刷新时间（加入随机抖动）"""
+        interval = self.interval_for(provider)
+        if failed:
+            interval = min(interval, self.retry_interval)
+        return now + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def due_providers(self, now: Optional[float] = None) -> List[str]:
+        """获取已到刷新时间的云服务商（从未刷新过的视为到期）"""
+        now = self.clock() if now is None else now
+        schedule = {row['provider']: row for row in self.schedule()}
+        return [
+            provider.name for provider in self.db_manager.get_all_providers()
+            if provider.name not in schedule or schedule[provider.name]['next_run_at'] <= now
+        ]
+
+    def schedule(self) -> List[Dict[str, Any]]:
+        """获取各云服务商的刷新计划"""
+        with self.db_manager.read_connection() as conn:
+            rows = conn.execute('''
+            SELECT provider, last_run_at, last_status, next_run_at
+            FROM refresh_schedule ORDER BY provider
+            ''').fetchall()
+        return [
+            {'provider': row[0], 'last_run_at': row[1], 'last_status': row[2], 'next_run_at': row[3]}
+            for row in rows
+        ]
+
+    def run_pending(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """检查并刷新到期的云服务商
+
+        其他调度器正在检查时返回None，否则返回 {'due': [...], 'job': 任务或None}
+        """
+        if not self.lock.acquire(timeout=0):
+            return None
+        try:
+            due = self.due_providers(now)
+            if not due:
+                return {'due': [], 'job': None}
+
+            print(f"Scheduled refresh for: {', '.join(due)}")
+            job, _ = self.refresh_jobs.submit(providers=due)
+            job = self.refresh_jobs.wait(job['job_id'], timeout=self.job_timeout)
+            self._record(due, job)
+            self.runs += 1
+            return {'due': due, 'job': job}
+        finally:
+            self.lock.release()
+
+    def run_forever(self):
+        """在当前线程中持续运行，直到 stop() 被调用"""
+        stop = self._stop
+        while True:
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"Scheduled refresh failed: {e}")
+            # 检查间隔同样加入抖动，多个worker的检查时间错开
+            if stop.wait(self.poll_interval * (1 + random.uniform(0, self.jitter))):
+                return
+
+    def ensure_started(self):
+        """确保当前进程中后台线程已启动（fork后的子进程会重新启动）"""
+        if self.poll_interval <= 0:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run_forever, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop.set()
+
+    def _record(self, providers: List[str], job: Optional[Dict[str, Any]]):
+        """根据刷新任务结果记录各云服务商的下次刷新时间"""
+        now = self.clock()
+        progress = (job or {}).get('progress') or {}
+        job_succeeded = job is not None and job['status'] == 'succeeded'
+
+        rows = []
+        for provider in providers:
+            status = progress.get(provider, {}).get('status')
+            ok = job_succeeded and status in SUCCESS_STATUSES
+            rows.append((
+                provider,
+                now,
+                status or (job['status'] if job else 'timeout'),
+                self.next_run_time(provider, now, failed=not ok)
+            ))
+
+        with self.db_manager.transaction() as conn:
+            conn.executemany('''
+            INSERT OR REPLACE INTO refresh_schedule (provider, last_run_at, last_status, next_run_at)
+            VALUES (?, ?, ?, ?)
+            ''', rows)
+
+
+def intervals_from_env(providers=('linode', 'digitalocean', 'aliyun', 'tencent')) -> Dict[str, float]:
+    """从环境变量读取各云服务商的刷新间隔，例如 REFRESH_INTERVAL_ALIYUN=43200"""
+    intervals = {}
+    for provider in providers:
+        value = os.getenv(f'REFRESH_INTERVAL_{provider.upper()}')
+        if value:
+            intervals[provider] = float(value)
+    return intervals
+
+
+def create_scheduler(db_manager, refresh_jobs, poll_interval: Optional[float] = None) -> RefreshScheduler:
+    """按环境变量配置创建调度器"""
+    return RefreshScheduler(
+        db_manager,
+        refresh_jobs,
+        intervals=intervals_from_env(),
+        default_interval=float(os.getenv('REFRESH_INTERVAL', str(DEFAULT_INTERVAL))),
+        jitter=float(os.getenv('REFRESH_JITTER', '0.1')),
+        retry_interval=float(os.getenv('REFRESH_RETRY_INTERVAL', str(DEFAULT_RETRY_INTERVAL))),
+        poll_interval=(poll_interval if poll_interval is not None
+                       else float(os.getenv('REFRESH_POLL_INTERVAL', '60')))
+    )
+
+
+def main(argv=None):
+    """独立运行调度器"""
+    from dotenv import load_dotenv
+    from api.cloud_collector import CloudAPICollector
+    from api.http_cache import HttpResponseCache, DEFAULT_TTL
+    from database.models import DatabaseManager
+    from .refresh_jobs import RefreshJobManager
+
+    parser = argparse.ArgumentParser(description='定时刷新云服务区域数据')
+    parser.add_argument('--once', action='store_true', help='只执行一次到期的刷新后退出')
+    parser.add_argument('--database', help='数据库路径（默认读取DATABASE_URL）')
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    db_path = args.database or os.getenv('DATABASE_URL', 'database/cloud_az.db')
+    db_manager = DatabaseManager(db_path)
+    db_manager.migrate()
+
+    http_cache = HttpResponseCache(
+        os.getenv('HTTP_CACHE_DIR') or f'{db_path}.http_cache',
+        ttl=float(os.getenv('HTTP_CACHE_TTL', str(DEFAULT_TTL)))
+    )
+    refresh_jobs = RefreshJobManager(
+        db_manager, lambda: CloudAPICollector(http_cache=http_cache)
+    )
+    scheduler = create_scheduler(db_manager, refresh_jobs)
+
+    try:
+        if args.once:
+            result = scheduler.run_pending()
+            if result is None:
+                print("Another scheduler is running, skipped")
+            elif not result['due']:
+                print("No providers due for refresh")
+        else:
+            print(f"Refresh scheduler started (poll every {scheduler.poll_interval:.0f}s)")
+            scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        refresh_jobs.shutdown()
+        db_manager.close()
+
+
+if __name__ == '__main__':
+    main()
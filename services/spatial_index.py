@@ -0,0 +1,165 @@
+"""
+最近区域空间索引
+
+区域坐标转换为单位球面上的三维坐标后建立k-d树：球面上两点的弦长与
+大圆距离单调对应，按欧氏距离（弦长）找到的最近点就是大圆距离最近的点，
+也不会受经度±180°和两极附近的影响。每个云服务商一棵树，按数据代际号
+在刷新后整体重建；查询只访问k-d树中可能更近的分支，不扫描全表。
+"""
+import heapq
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 地球平均半径（公里）
+EARTH_RADIUS_KM = 6371.0088
+
+Vector = Tuple[float, float, float]
+
+
+def unit_vector(latitude: float, longitude: float) -> Vector:
+    """经纬度（十进制度）转换为单位球面上的三维坐标"""
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord_squared: float) -> float:
+    """单位球面上弦长的平方转换为大圆距离（公里）"""
+    half_chord = min(math.sqrt(chord_squared) / 2.0, 1.0)
+    return 2.0 * math.asin(half_chord) * EARTH_RADIUS_KM
+
+
+class KDTree:
+    """三维k-d树（只读，构建后不再修改）
+
+    节点保存在平行列表中，按中位数划分，划分轴取当前点集范围最大的维度。
+    """
+
+    def __init__(self, points: Sequence[Vector], items: Sequence[Any]):
+        self._points: List[Vector] = []
+        self._items: List[Any] = []
+        self._axis: List[int] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        self._root = self._build(list(zip(points, items)))
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _build(self, entries: List[Tuple[Vector, Any]]) -> int:
+        if not entries:
+            return -1
+        axis = max(range(3), key=lambda a: (max(e[0][a] for e in entries) - min(e[0][a] for e in entries)))
+        entries.sort(key=lambda e: e[0][axis])
+        median = len(entries) // 2
+
+        node = len(self._points)
+        self._points.append(entries[median][0])
+        self._items.append(entries[median][1])
+        self._axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._left[node] = self._build(entries[:median])
+        self._right[node] = self._build(entries[median + 1:])
+        return node
+
+    def nearest(self, target: Vector, k: int) -> List[Tuple[float, Any]]:
+        """距离 target 最近的 k 个点，返回按距离排序的 (弦长平方, item)"""
+        if k <= 0 or self._root < 0:
+            return []
+        points, axes, left, right = self._points, self._axis, self._left, self._right
+        # 大顶堆（取负的距离）保存当前最近的 k 个点
+        best: List[Tuple[float, int]] = []
+
+        def visit(node: int):
+            point = points[node]
+            dx = target[0] - point[0]
+            dy = target[1] - point[1]
+            dz = target[2] - point[2]
+            distance = dx * dx + dy * dy + dz * dz
+            if len(best) < k:
+                heapq.heappush(best, (-distance, node))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, node))
+
+            diff = target[axes[node]] - point[axes[node]]
+            near, far = (left[node], right[node]) if diff < 0 else (right[node], left[node])
+            if near >= 0:
+                visit(near)
+            # 划分平面比当前第k近的点更近时，另一侧才可能有更近的点
+            if far >= 0 and (len(best) < k or diff * diff < -best[0][0]):
+                visit(far)
+
+        visit(self._root)
+        return sorted(((-distance, self._items[node]) for distance, node in best), key=lambda c: c[0])
+
+
+class RegionSpatialIndex:
+    """按数据代际重建的最近区域索引
+
+    load_points 返回带 provider / latitude / longitude 的区域字典，数据代际号
+    变化后第一次查询（或刷新完成后调用 warm）时重新加载并构建各云服务商的
+    k-d树，新索引构建完成后整体替换。
+    """
+
+    def __init__(self, generation, load_points: Callable[[], Iterable[Dict[str, Any]]]):
+        self.generation = generation
+        self.load_points = load_points
+        # (代际号, k-d树) 作为一个元组整体替换，查询方总是看到相互匹配的一对
+        self._snapshot: Tuple[Optional[int], Dict[str, KDTree]] = (None, {})
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def warm(self) -> int:
+        """为当前数据代际构建索引，返回索引中的区域数"""
+        return sum(len(tree) for tree in self._current().values())
+
+    def nearest(self, latitude: float, longitude: float, k: int = 5,
+                providers: Sequence[str] = ()) -> List[Tuple[float, Dict[str, Any]]]:
+        """距离给定坐标最近的 k 个区域，返回按距离排序的 (大圆距离公里数, 区域)"""
+        trees = self._current()
+        selected = [trees[p] for p in providers if p in trees] if providers else list(trees.values())
+        target = unit_vector(latitude, longitude)
+
+        candidates = []
+        for tree in selected:
+            candidates.extend(tree.nearest(target, k))
+        # 按距离合并各云服务商的结果（距离相同时保持原顺序，不比较区域字典）
+        best = heapq.nsmallest(k, candidates, key=lambda c: c[0])
+        return [(chord_to_km(distance), region) for distance, region in best]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        generation, trees = self._snapshot
+        return {
+            'generation': generation,
+            'providers': {provider: len(tree) for provider, tree in trees.items()},
+            'builds': self.builds
+        }
+
+    def _current(self) -> Dict[str, KDTree]:
+        generation = self.generation.current()
+        snapshot = self._snapshot
+        if snapshot[0] != generation:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot[0] != generation:
+                    snapshot = self._rebuild(generation)
+        return snapshot[1]
+
+    def _rebuild(self, generation: int) -> Tuple[int, Dict[str, KDTree]]:
+        """重新构建全部k-d树（调用方需持有锁）"""
+        grouped: Dict[str, Tuple[List[Vector], List[Dict[str, Any]]]] = {}
+        for region in self.load_points():
+            if region.get('latitude') is None or region.get('longitude') is None:
+                continue
+            points, items = grouped.setdefault(region['provider'], ([], []))
+            points.append(unit_vector(region['latitude'], region['longitude']))
+            items.append(region)
+        # 整体替换，查询方要么看到旧的完整索引，要么看到新的完整索引
+        trees = {provider: KDTree(points, items) for provider, (points, items) in grouped.items()}
+        self._snapshot = (generation, trees)
+        self.builds += 1
+        return self._snapshot
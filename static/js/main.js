@@ -3,123 +3,6 @@
  * Cloud AZ Visualizer Main Application
  */
 
-/**
- * 区域分类器 - 负责将区域按六大区分类
- */
-class RegionClassifier {
-    constructor() {
-        // 国家代码到大区的映射表（静态配置，避免重复创建）
-        this.COUNTRY_TO_REGION = Object.freeze({
-            // 北美
-            'US': 'north-america', 
-            'CA': 'north-america',
-            'MX': 'north-america',
-            
-            // 南美  
-            'BR': 'south-america',
-            'AR': 'south-america',
-            'CL': 'south-america',
-            'CO': 'south-america',
-            'PE': 'south-america',
-            'UY': 'south-america',
-            'VE': 'south-america',
-            'EC': 'south-america',
-            'PY': 'south-america',
-            
-            // 欧洲
-            'DE': 'europe', 'GB': 'europe', 'FR': 'europe',
-            'IT': 'europe', 'ES': 'europe', 'NL': 'europe', 
-            'SE': 'europe', 'FI': 'europe', 'IE': 'europe',
-            'PL': 'europe', 'CZ': 'europe', 'AT': 'europe',
-            'BE': 'europe', 'CH': 'europe', 'DK': 'europe',
-            'NO': 'europe', 'PT': 'europe', 'GR': 'europe',
-            
-            // 亚太（不含中国）
-            'JP': 'asia-pacific', 'KR': 'asia-pacific', 'SG': 'asia-pacific',
-            'AU': 'asia-pacific', 'IN': 'asia-pacific', 'ID': 'asia-pacific',
-            'MY': 'asia-pacific', 'TH': 'asia-pacific', 'PH': 'asia-pacific',
-            'AE': 'asia-pacific', 'HK': 'asia-pacific', 'NZ': 'asia-pacific',
-            'VN': 'asia-pacific', 'BD': 'asia-pacific', 'LK': 'asia-pacific',
-            
-            // 中国
-            'CN': 'china'
-        });
-        
-        // 大区显示顺序（不可变）
-        this.CONTINENT_ORDER = Object.freeze([
-            'north-america', 'south-america', 'europe', 
-            'asia-pacific', 'china', 'others'
-        ]);
-        
-        // 大区中文名称映射（不可变）
-        this.CONTINENT_NAMES = Object.freeze({
-            'north-america': '🇺🇸 北美',
-            'south-america': '🇧🇷 南美', 
-            'europe': '🇪🇺 欧洲',
-            'asia-pacific': '🌏 亚太地区',
-            'china': '🇨🇳 中国',
-            'others': '🌐 其他地区'
-        });
-    }
-    
-    /**
-     * 根据国家代码分类区域
-     * @param {string} countryCode - 国家代码
-     * @returns {string} 大区标识
-     */
-    classifyRegion(countryCode) {
-        return this.COUNTRY_TO_REGION[countryCode] || 'others';
-    }
-    
-    /**
-     * 按大区分组区域
-     * @param {Array} regions - 区域列表
-     * @returns {Object} 分组后的区域
-     */
-    groupRegionsByContinent(regions) {
-        const grouped = {};
-        
-        regions.forEach(region => {
-            const continent = this.classifyRegion(region.country_code);
-            
-            if (!grouped[continent]) {
-                grouped[continent] = [];
-            }
-            grouped[continent].push(region);
-        });
-        
-        return grouped;
-    }
-    
-    /**
-     * 获取大区中文名称
-     * @param {string} continent - 大区标识
-     * @returns {string} 中文名称
-     */
-    getContinentName(continent) {
-        return this.CONTINENT_NAMES[continent] || continent;
-    }
-    
-    /**
-     * 获取大区排序数组
-     * @returns {Array} 排序后的大区列表
-     */
-    getContinentOrder() {
-        return [...this.CONTINENT_ORDER]; // 返回副本避免修改
-    }
-    
-    /**
-     * 获取包含区域的排序后大区列表
-     * @param {Object} groupedRegions - 分组后的区域
-     * @returns {Array} 有区域的大区列表（按顺序）
-     */
-    getOrderedContinentsWithRegions(groupedRegions) {
-        return this.CONTINENT_ORDER.filter(continent => 
-            groupedRegions[continent] && groupedRegions[continent].length > 0
-        );
-    }
-}
-
 class CloudAZApp {
     constructor() {
         console.log('🚀 初始化云服务区域可视化系统');
@@ -128,6 +11,7 @@ class CloudAZApp {
         this.data = {
             providers: [],
             regions: [],
+            regionSections: {},
             countries: [],
             stats: {},
             colorMapping: {}
@@ -136,9 +20,6 @@ class CloudAZApp {
         // 选中的云服务商
         this.selectedProviders = ['linode', 'digitalocean', 'aliyun', 'tencent'];
         
-        // 初始化区域分类器
-        this.regionClassifier = new RegionClassifier();
-        
         // 初始化
         this.init();
     }
@@ -148,8 +29,11 @@ class CloudAZApp {
             // 绑定事件监听器
             this.bindEventListeners();
             
-            // 加载初始数据
-            await this.loadAllData();
+            // 加载初始数据和区域中文名称
+            await Promise.all([
+                this.loadAllData(),
+                window.translationManager ? window.translationManager.ensureLoaded() : null
+            ]);
             
             // 渲染界面
             this.renderUI();
@@ -192,28 +76,21 @@ class CloudAZApp {
         console.log('📊 开始加载数据...');
         
         try {
-            // 并发加载所有数据
-            const [providersRes, regionsRes, countriesRes, statsRes, colorsRes] = await Promise.all([
-                fetch('/api/providers'),
-                fetch('/api/regions'),
-                fetch('/api/countries'),
-                fetch('/api/stats'),
-                fetch('/api/colors')
-            ]);
+            // 一次请求加载首屏所需的全部数据
+            const response = await fetch('/api/bootstrap');
+            const bootstrap = await response.json();
             
-            // 解析响应
-            const providers = await providersRes.json();
-            const regions = await regionsRes.json();
-            const countries = await countriesRes.json();
-            const stats = await statsRes.json();
-            const colors = await colorsRes.json();
+            if (!bootstrap.success) {
+                throw new Error(bootstrap.error || '数据加载失败');
+            }
             
             // 存储数据
-            this.data.providers = providers.providers || [];
-            this.data.regions = regions.regions || [];
-            this.data.countries = countries.countries || [];
-            this.data.stats = stats;
-            this.data.colorMapping = colors.color_mapping || {};
+            this.data.providers = bootstrap.providers || [];
+            this.data.regions = bootstrap.regions || [];
+            this.data.regionSections = this.buildRegionSections(bootstrap.region_groups || []);
+            this.data.countries = bootstrap.countries || [];
+            this.data.stats = bootstrap.stats || {};
+            this.data.colorMapping = bootstrap.color_mapping || {};
             
             console.log('✅ 数据加载完成:', {
                 providers: this.data.providers.length,
@@ -351,8 +228,8 @@ class CloudAZApp {
             return;
         }
         
-        // 按云服务商分组区域
-        const regionsByProvider = this.groupRegionsByProvider();
+        // 服务端已按云服务商和大区分好段
+        const sectionsByProvider = this.data.regionSections;
         
         // 清空容器
         container.innerHTML = '';
@@ -363,8 +240,8 @@ class CloudAZApp {
         providerOrder.forEach(providerName => {
             const provider = this.data.providers.find(p => p.name === providerName);
             if (provider) {
-                const providerRegions = regionsByProvider[provider.name] || [];
-                const column = this.createProviderColumn(provider, providerRegions);
+                const providerSections = sectionsByProvider[provider.name] || [];
+                const column = this.createProviderColumn(provider, providerSections);
                 container.appendChild(column);
             }
         });
@@ -372,51 +249,53 @@ class CloudAZApp {
         console.log('📋 区域列表已渲染:', {
             providers: this.data.providers.length,
             regions: this.data.regions.length,
-            grouped: Object.keys(regionsByProvider).length
+            grouped: Object.keys(sectionsByProvider).length
         });
     }
     
     /**
-     * 按云服务商分组区域
+     * 按服务端返回的分段切分区域列表（区域已按云服务商、大区排序）
+     * @param {Array} groups - [{provider, macro_region, name, start, count}]
+     * @returns {Object} 云服务商 -> [{macroRegion, name, regions}]
      */
-    groupRegionsByProvider() {
-        const grouped = {};
+    buildRegionSections(groups) {
+        const sections = {};
         
-        this.data.regions.forEach(region => {
-            if (!grouped[region.provider]) {
-                grouped[region.provider] = [];
+        groups.forEach(group => {
+            if (!sections[group.provider]) {
+                sections[group.provider] = [];
             }
-            grouped[region.provider].push(region);
+            sections[group.provider].push({
+                macroRegion: group.macro_region,
+                name: group.name,
+                regions: this.data.regions.slice(group.start, group.start + group.count)
+            });
         });
         
-        return grouped;
+        return sections;
     }
     
     /**
      * 创建云服务商列
      */
-    createProviderColumn(provider, regions) {
+    createProviderColumn(provider, sections) {
         const column = document.createElement('div');
         column.className = 'provider-column';
         column.style.borderLeftColor = provider.color;
         
+        const total = sections.reduce((sum, section) => sum + section.regions.length, 0);
+        
         // 标题
         const header = document.createElement('h4');
         header.innerHTML = `
             <span class="provider-badge" style="background: ${provider.color}"></span>
-            ${provider.display_name} (${regions.length})
+            ${provider.display_name} (${total})
         `;
         column.appendChild(header);
         
-        // 使用分类器按大区分组
-        const regionsByContinent = this.regionClassifier.groupRegionsByContinent(regions);
-        
-        // 按顺序渲染有区域的大区
-        const orderedContinents = this.regionClassifier.getOrderedContinentsWithRegions(regionsByContinent);
-        orderedContinents.forEach(continent => {
-            const continentRegions = regionsByContinent[continent];
-            const section = this.createContinentSection(continent, continentRegions);
-            column.appendChild(section);
+        // 按服务端给出的大区顺序渲染
+        sections.forEach(section => {
+            column.appendChild(this.createContinentSection(section.name, section.regions));
         });
         
         return column;
@@ -426,13 +305,13 @@ class CloudAZApp {
     /**
      * 创建大洲区域段
      */
-    createContinentSection(continent, regions) {
+    createContinentSection(continentName, regions) {
         const section = document.createElement('div');
         section.className = 'continent-section';
         
         // 大洲标题
         const title = document.createElement('h5');
-        title.textContent = this.regionClassifier.getContinentName(continent);
+        title.textContent = continentName;
         section.appendChild(title);
         
         // 区域列表
@@ -445,7 +324,7 @@ class CloudAZApp {
             
             // 获取中文区域名称，如果没有翻译则使用原名称
             const chineseRegionName = window.translationManager ? 
-                window.translationManager.getRegionName(region.region_id) : 
+                window.translationManager.getRegionName(region.region_id, region.provider) : 
                 region.region_name;
             
             // 如果中文名称和原名称不同，显示中文名称，否则显示原名称
@@ -456,6 +335,7 @@ class CloudAZApp {
             item.innerHTML = `
                 <span class="region-code">${region.region_id}</span>
                 <span class="region-name">${displayName}</span>
+                ${region.zone_count ? `<span class="region-zones">${region.zone_count} 个可用区</span>` : ''}
             `;
             list.appendChild(item);
         });
@@ -511,20 +391,28 @@ class CloudAZApp {
                 }
             });
             
-            const result = await response.json();
+            const submitted = await response.json();
+            
+            if (!submitted.success) {
+                throw new Error(submitted.error || '刷新失败');
+            }
             
-            if (result.success) {
+            // 轮询后台任务状态直到完成
+            const job = await this.waitForRefreshJob(submitted.status_url);
+            
+            if (job.status === 'succeeded') {
                 // 重新加载数据
                 await this.loadAllData();
                 
                 // 重新渲染界面
                 this.renderUI();
                 
+                const result = job.result || {};
                 this.showMessage(`数据刷新成功！更新了 ${result.regions_by_provider ? Object.values(result.regions_by_provider).reduce((a, b) => a + b, 0) : 0} 个区域`, 'success');
                 
                 console.log('✅ 数据刷新完成');
             } else {
-                throw new Error(result.error || '刷新失败');
+                throw new Error(job.error || '刷新失败');
             }
             
         } catch (error) {
@@ -538,6 +426,37 @@ class CloudAZApp {
         }
     }
     
+    /**
+     * 轮询刷新任务状态，任务结束后返回最终状态
+     */
+    async waitForRefreshJob(statusUrl, interval = 1000, timeout = 300000) {
+        const refreshBtn = document.getElementById('refresh-btn');
+        const deadline = Date.now() + timeout;
+        
+        while (Date.now() < deadline) {
+            const response = await fetch(statusUrl, { cache: 'no-store' });
+            const job = await response.json();
+            
+            if (!job.success) {
+                throw new Error(job.error || '无法获取刷新任务状态');
+            }
+            if (job.done) {
+                return job;
+            }
+            
+            // 显示已完成的云服务商数量
+            if (refreshBtn && job.progress) {
+                const states = Object.values(job.progress);
+                const finished = states.filter(p => p.status !== 'running').length;
+                refreshBtn.textContent = `🔄 刷新中 (${finished}/${states.length || '?'})...`;
+            }
+            
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+        
+        throw new Error('刷新超时，请稍后查看结果');
+    }
+    
     /**
      * 更新最后更新时间
      */
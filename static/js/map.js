@@ -20,7 +20,7 @@ class WorldMapVisualizer {
         this.height = 840;
         
         // 初始化翻译管理器
-        this.translationManager = new TranslationManager();
+        this.translationManager = window.translationManager || new TranslationManager();
         
         console.log('🗺️ 初始化世界地图可视化组件');
         this.init();
@@ -157,6 +157,7 @@ class WorldMapVisualizer {
         
         // 按国家分组区域数据
         const countryProviders = this.groupRegionsByCountry(regionsData, selectedProviders);
+        this.countryZones = this.countZonesByCountry(regionsData, selectedProviders);
         
         // 更新国家颜色
         this.mapGroup.selectAll('.country')
@@ -187,6 +188,19 @@ class WorldMapVisualizer {
         return countryProviders;
     }
     
+    countZonesByCountry(regionsData, selectedProviders) {
+        // 可用区数量由服务端在写入时维护，这里只按国家求和
+        const countryZones = {};
+        
+        regionsData.forEach(region => {
+            if (selectedProviders.includes(region.provider) && region.zone_count) {
+                countryZones[region.country_code] = (countryZones[region.country_code] || 0) + region.zone_count;
+            }
+        });
+        
+        return countryZones;
+    }
+    
     getCountryCode(numericId) {
         // 将数字ID转换为ISO 3166-1 alpha-2国家代码 (完整映射)
         const idMapping = {
@@ -363,11 +377,12 @@ class WorldMapVisualizer {
         
         const countryCode = this.getCountryCode(countryData.id);
         const chineseName = this.translationManager.getCountryName(countryCode);
+        const zoneCount = (this.countryZones || {})[countryCode] || 0;
         
         tooltip
             .style('left', (event.pageX + 10) + 'px')
             .style('top', (event.pageY - 10) + 'px')
-            .html(`${chineseName} (${countryCode})`);
+            .html(`${chineseName} (${countryCode})${zoneCount ? ` · ${zoneCount} 个可用区` : ''}`);
     }
     
     hideTooltip() {
@@ -469,18 +484,25 @@ class WorldMapVisualizer {
 
 /**
  * 翻译管理器 - 处理国家和区域的中文名称
+ * 数据来自服务端编译的区域目录（/api/catalog），同一份目录也驱动大区分类
  */
 class TranslationManager {
     constructor() {
+        this.catalog = null;
         this.translations = null;
         this.isLoaded = false;
-        this.loadTranslations();
+        this.loading = this.loadTranslations();
     }
     
     async loadTranslations() {
         try {
-            const response = await fetch('/static/data/translations.json');
-            this.translations = await response.json();
+            const response = await fetch('/api/catalog');
+            const catalog = await response.json();
+            if (catalog.success === false) {
+                throw new Error(catalog.error || '区域目录加载失败');
+            }
+            this.catalog = catalog;
+            this.translations = { countries: catalog.countries || {}, regions: catalog.regions || {} };
             this.isLoaded = true;
             console.log('✅ 翻译数据加载完成');
         } catch (error) {
@@ -495,16 +517,15 @@ class TranslationManager {
         return this.translations.countries[countryCode] || countryCode;
     }
     
-    getRegionName(regionId) {
+    getRegionName(regionId, provider) {
         if (!this.translations) return regionId;
-        return this.translations.regions[regionId] || regionId;
+        const providerRegions = this.translations.regions[provider] || {};
+        return providerRegions[regionId] || regionId;
     }
     
-    // 确保翻译数据已加载
+    // 确保翻译数据已加载（加载中时等待同一个请求）
     async ensureLoaded() {
-        if (!this.isLoaded) {
-            await this.loadTranslations();
-        }
+        await this.loading;
     }
 }
 
@@ -90,7 +90,7 @@ class TestLinodeAPI:
             ]
         }
         
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.json.return_value = mock_response_data
             mock_response.raise_for_status.return_value = None
@@ -108,11 +108,12 @@ class TestLinodeAPI:
     @pytest.mark.asyncio 
     async def test_fetch_regions_failure(self):
         """测试Linode API请求失败"""
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_get.side_effect = Exception("API Error")
             
-            regions = await self.api.fetch_regions()
-            assert regions == []
+            # 客户端不再吞掉异常，由收集器的容错策略处理
+            with pytest.raises(Exception, match="API Error"):
+                await self.api.fetch_regions()
 
 
 class TestDigitalOceanAPI:
@@ -146,7 +147,7 @@ class TestDigitalOceanAPI:
             ]
         }
         
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.json.return_value = mock_response_data
             mock_response.raise_for_status.return_value = None
@@ -190,7 +191,7 @@ class TestAliyunAPI:
             }
         }
         
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.json.return_value = mock_response_data
             mock_response.raise_for_status.return_value = None  
@@ -236,7 +237,7 @@ class TestTencentAPI:
             }
         }
         
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.json.return_value = mock_response_data
             mock_response.raise_for_status.return_value = None
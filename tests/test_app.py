@@ -4,7 +4,7 @@ import tempfile
 import os
 from unittest.mock import Mock, patch, AsyncMock
 from app import create_app
-from database.models import DatabaseManager
+from database.models import DatabaseManager, Provider
 
 
 class TestFlaskApp:
@@ -29,7 +29,9 @@ class TestFlaskApp:
 
     def teardown_method(self):
         """每个测试方法后执行"""
-        os.unlink(self.test_db.name)
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
     
     def _create_test_data(self, db_manager):
         """创建测试数据"""
@@ -68,8 +70,10 @@ class TestFlaskApp:
             AvailabilityZone(provider_ids['tencent'], 'ap-beijing', '华北地区(北京)', 'CN', 'apac')
         ]
         
-        for az in azs_data:
-            db_manager.create_availability_zone(az)
+        with db_manager.transaction():
+            for az in azs_data:
+                db_manager.create_availability_zone(az, refresh_stats=False)
+            db_manager.refresh_stats_snapshot()
 
     def test_index_route(self):
         """测试首页路由"""
@@ -126,7 +130,7 @@ class TestFlaskApp:
 
     @patch('api.cloud_collector.CloudAPICollector')
     def test_api_refresh_route(self, mock_collector_class):
-        """测试数据刷新API"""
+        """测试数据刷新API（后台任务）"""
         # Mock CloudAPICollector
         mock_collector = Mock()
         mock_collector.collect_all_regions = AsyncMock(return_value={
@@ -137,13 +141,23 @@ class TestFlaskApp:
         mock_collector_class.return_value = mock_collector
         
         response = self.client.post('/api/refresh')
-        assert response.status_code == 200
+        assert response.status_code == 202
         
         data = json.loads(response.data)
-        assert 'success' in data
         assert data['success'] is True
-        assert 'message' in data
-        assert 'updated_at' in data
+        assert data['joined'] is False
+        assert response.headers['Location'] == data['status_url']
+        
+        job = self.app.extensions['refresh_jobs'].wait(data['job_id'], timeout=10)
+        assert job['status'] == 'succeeded'
+        mock_collector.update_database.assert_called_once()
+        
+        response = self.client.get(data['status_url'])
+        assert response.status_code == 200
+        status = json.loads(response.data)
+        assert status['done'] is True
+        assert status['result']['regions_by_provider'] == {'linode': 1, 'digitalocean': 0}
+        assert status['finished_at']
 
     def test_api_refresh_route_failure(self):
         """测试数据刷新API失败情况"""
@@ -153,12 +167,65 @@ class TestFlaskApp:
             mock_collector_class.return_value = mock_collector
             
             response = self.client.post('/api/refresh')
-            assert response.status_code == 500
+            assert response.status_code == 202
+            job_id = json.loads(response.data)['job_id']
+            self.app.extensions['refresh_jobs'].wait(job_id, timeout=10)
             
+            response = self.client.get(f'/api/refresh/{job_id}')
             data = json.loads(response.data)
-            assert 'success' in data
-            assert data['success'] is False
-            assert 'error' in data
+            assert data['status'] == 'failed'
+            assert data['error'] == 'API Error'
+
+    def test_api_refresh_joins_running_job(self):
+        """测试已有刷新任务运行时，重复请求加入该任务"""
+        import threading
+        release = threading.Event()
+        
+        async def slow_collect(progress=None):
+            progress('linode', 'running', 0)
+            release.wait(10)
+            return {'linode': []}
+        
+        with patch('api.cloud_collector.CloudAPICollector') as mock_collector_class:
+            mock_collector = Mock()
+            mock_collector.collect_all_regions = slow_collect
+            mock_collector_class.return_value = mock_collector
+            
+            first = json.loads(self.client.post('/api/refresh').data)
+            second = json.loads(self.client.post('/api/refresh').data)
+            assert second['joined'] is True
+            assert second['job_id'] == first['job_id']
+            
+            release.set()
+            self.app.extensions['refresh_jobs'].wait(first['job_id'], timeout=10)
+            assert mock_collector_class.call_count == 1
+            
+            # 任务结束后的新请求创建新任务
+            third = json.loads(self.client.post('/api/refresh').data)
+            assert third['job_id'] != first['job_id']
+            self.app.extensions['refresh_jobs'].wait(third['job_id'], timeout=10)
+
+    def test_api_refresh_provider_subset(self):
+        """测试只刷新部分云服务商，未注册的名称返回400"""
+        with patch('api.cloud_collector.CloudAPICollector') as mock_collector_class:
+            mock_collector = Mock()
+            mock_collector.collect_all_regions = AsyncMock(return_value={'tencent': None, 'aliyun': None})
+            mock_collector_class.return_value = mock_collector
+
+            response = self.client.post('/api/refresh?providers=tencent,aliyun')
+            assert response.status_code == 202
+            job = self.app.extensions['refresh_jobs'].wait(json.loads(response.data)['job_id'], timeout=10)
+            assert job['providers'] == ['aliyun', 'tencent']
+            assert mock_collector.collect_all_regions.call_args.kwargs['providers'] == ['aliyun', 'tencent']
+
+        response = self.client.post('/api/refresh', json={'providers': ['tencent', 'nope']})
+        assert response.status_code == 400
+        assert 'nope' in json.loads(response.data)['error']
+
+    def test_api_refresh_job_not_found(self):
+        """测试查询不存在的刷新任务"""
+        response = self.client.get('/api/refresh/missing')
+        assert response.status_code == 404
 
     def test_api_stats_route(self):
         """测试统计数据API"""
@@ -229,3 +296,163 @@ class TestFlaskApp:
         # 验证只返回指定大洲的国家
         continents = set(country['continent'] for country in data['countries'])
         assert continents == {'americas'}
+
+    def test_api_bootstrap_route(self):
+        """测试首屏合并数据API"""
+        response = self.client.get('/api/bootstrap')
+        assert response.status_code == 200
+        
+        data = json.loads(response.data)
+        assert data['success'] is True
+        for field in ['providers', 'regions', 'countries', 'stats', 'color_mapping']:
+            assert field in data
+        
+        # 与单独接口返回的数据保持一致
+        regions = json.loads(self.client.get('/api/regions').data)
+        assert data['regions'] == regions['regions']
+        stats = json.loads(self.client.get('/api/stats').data)
+        assert data['stats'] == stats
+        colors = json.loads(self.client.get('/api/colors').data)
+        assert data['color_mapping'] == colors['color_mapping']
+
+    def test_api_regions_grouped_by_macro_region(self):
+        """测试区域按写入时确定的大区分组排序，统计使用同样的大区"""
+        from api.cloud_collector import CloudAPICollector
+        db_manager = DatabaseManager(self.test_db.name)
+        CloudAPICollector().update_database(db_manager, {'linode': [
+            {'region_id': 'us-east-1', 'region_name': 'US East', 'country_code': 'US'},
+            {'region_id': 'eu-west-1', 'region_name': 'EU West', 'country_code': 'GB'},
+            {'region_id': 'ap-south', 'region_name': 'Singapore', 'country_code': 'SG'}
+        ]})
+        db_manager.close()
+
+        data = json.loads(self.client.get('/api/regions?providers=linode').data)
+        assert [r['region_id'] for r in data['regions']] == ['us-east-1', 'eu-west-1', 'ap-south']
+        assert [(g['macro_region'], g['start'], g['count']) for g in data['groups']] == [
+            ('north-america', 0, 1), ('europe', 1, 1), ('asia-pacific', 2, 1)
+        ]
+        assert data['groups'][0]['name'] == '🇺🇸 北美'
+
+        stats = json.loads(self.client.get('/api/stats').data)
+        assert stats['regions_by_continent']['europe'] == 1
+
+        bootstrap = json.loads(self.client.get('/api/bootstrap').data)
+        linode_groups = [g for g in bootstrap['region_groups'] if g['provider'] == 'linode']
+        assert [g['macro_region'] for g in linode_groups] == ['north-america', 'europe', 'asia-pacific']
+
+    def test_regions_query_needs_no_sort(self):
+        """测试区域列表查询直接按覆盖索引的顺序返回，不需要临时排序"""
+        from app import _regions_query
+        db_manager = DatabaseManager(self.test_db.name)
+        for provider_filter in (None, ['linode', 'aliyun']):
+            query, params = _regions_query(provider_filter)
+            with db_manager.read_connection() as conn:
+                plan = ' '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params))
+            assert 'idx_az_status_provider' in plan
+            assert 'TEMP B-TREE' not in plan
+        db_manager.close()
+
+    def test_conditional_get_with_etag(self):
+        """测试ETag条件请求返回304"""
+        response = self.client.get('/api/regions')
+        assert response.status_code == 200
+        etag = response.headers.get('ETag')
+        assert etag
+        
+        response = self.client.get('/api/regions', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers.get('ETag') == etag
+        
+        # 不同的查询参数对应不同的ETag
+        response = self.client.get('/api/regions?providers=linode', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+    
+    def test_conditional_get_after_refresh(self):
+        """测试数据代际号变化后ETag失效"""
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.generation.bump()
+        
+        response = self.client.get('/api/stats')
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        assert last_modified
+        
+        response = self.client.get('/api/stats', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+        
+        db_manager.generation.bump()
+        response = self.client.get('/api/stats', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers.get('ETag') != etag
+        os.unlink(db_manager.generation.path)
+
+    def test_conditional_get_after_write(self):
+        """测试任意写入路径都会使ETag失效，不需要手动推进代际号"""
+        response = self.client.get('/api/providers')
+        etag = response.headers.get('ETag')
+        
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.create_provider(Provider(name='vultr', display_name='Vultr', color='#007bfc'))
+        response = self.client.get('/api/providers', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers.get('ETag') != etag
+        assert 'vultr' in response.get_data(as_text=True)
+        db_manager.close()
+
+    def test_etag_includes_response_version(self):
+        """测试ETag包含响应版本，部署新代码后旧的ETag不再命中"""
+        import app as app_module
+        response = self.client.get('/api/regions')
+        assert response.headers['ETag'].strip('"').startswith(app_module.RESPONSE_VERSION + '-')
+
+    def test_compressed_payload_negotiation(self):
+        """测试按Accept-Encoding返回预压缩的响应体"""
+        import gzip
+        import zlib
+        
+        plain = self.client.get('/api/regions')
+        assert 'Content-Encoding' not in plain.headers
+        
+        response = self.client.get('/api/regions', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) == len(response.data)
+        assert gzip.decompress(response.data) == plain.data
+        
+        response = self.client.get('/api/regions', headers={'Accept-Encoding': 'deflate'})
+        assert response.headers['Content-Encoding'] == 'deflate'
+        assert zlib.decompress(response.data) == plain.data
+        
+        # 各编码版本的ETag不同，但都可以用于条件请求
+        etag = response.headers['ETag']
+        assert etag != plain.headers['ETag']
+        response = self.client.get('/api/regions', headers={'If-None-Match': etag, 'Accept-Encoding': 'deflate'})
+        assert response.status_code == 304
+    
+    def test_not_modified_carries_encoding_validators(self):
+        """测试304响应携带与200响应相同的编码版本ETag和Vary"""
+        response = self.client.get('/api/regions', headers={'Accept-Encoding': 'gzip'})
+        etag = response.headers['ETag']
+        assert etag.endswith('-gzip"')
+        
+        response = self.client.get('/api/regions', headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert 'Accept-Encoding' in response.headers['Vary']
+        
+        # 不再接受该编码时返回完整的未压缩响应
+        response = self.client.get('/api/regions', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+    
+    def test_canonical_payloads_prebuilt(self):
+        """测试规范化请求直接命中预生成的响应体"""
+        self.client.get('/api/regions?providers=linode,digitalocean')
+        self.client.get('/api/countries?continent=apac')
+        
+        stats = json.loads(self.client.get('/api/cache/stats').data)
+        assert stats['payloads']['builds'] == 1
+        assert stats['payloads']['payloads'] > 0
+        assert stats['cache']['misses'] == 0
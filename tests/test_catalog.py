@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import tempfile
+import pytest
+from app import create_app
+from api.catalog import DEFAULT_CATALOG_PATH, CatalogError, CompiledCatalog, RegionCatalog
+from api.region_mapper import CloudProvider, UnifiedRegionMapper
+from database.models import AvailabilityZone, Country, DatabaseManager, Provider
+
+# 迁移前 countries 表中已分类（americas / apac / china / europe-africa）的国家
+CLASSIFIED_COUNTRIES = (
+    'AR BR CA CL CO EC MX PE PY US UY VE '
+    'AE AF AU BD BH BN FJ ID IL IN IQ IR JO JP KH KR KW LA LB LK MM MY NZ OM PG PH PK PS QA SA SG SY TH VN YE '
+    'CN HK MO TW '
+    'AL AM AT AZ BA BE BG BY CH CZ DE DK DZ EE EG ES ET FI FR GB GE GH GR HR HU IE IS IT KE LT LV LY MA ME MK '
+    'NG NL NO PL PT RO RS RU SE SI SK TN TR TZ UA UG ZA'
+).split()
+
+
+class TestRegionCatalog:
+    def setup_method(self):
+        """每个测试方法前执行，复制一份目录文件用于修改"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'region_catalog.json')
+        shutil.copy(DEFAULT_CATALOG_PATH, self.path)
+        self.catalog = RegionCatalog(self.path, check_interval=0)
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _edit(self, change):
+        with open(self.path, encoding='utf-8') as f:
+            raw = json.load(f)
+        change(raw)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, ensure_ascii=False)
+        # 保证修改时间变化（部分文件系统的时间精度较低）
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_compiled_lookups_are_frozen(self):
+        """测试编译结果只读且字符串已驻留"""
+        compiled = self.catalog.get()
+        region = compiled.region('linode', 'us-east')
+        assert region.country_code == 'US'
+        assert compiled.country_code('linode', 'unknown-region') == 'US'
+        assert compiled.country_code('aliyun', 'unknown-region') == 'CN'
+        assert compiled.macro_region('gb') == 'europe'
+        assert compiled.macro_order('china') == 4
+        assert compiled.macro_region('XX') == 'others'
+
+        with pytest.raises(TypeError):
+            compiled.regions[('linode', 'new')] = region
+        with pytest.raises(AttributeError):
+            region.country_code = 'CA'
+        assert region.country_code is compiled.countries['US'].country_code
+
+    def test_previously_classified_countries_have_macro_region(self):
+        """测试原有数据中已分类的国家在目录中都有大区，不会归入其他地区"""
+        compiled = self.catalog.get()
+        assert [code for code in CLASSIFIED_COUNTRIES if code not in compiled.countries] == []
+        assert [code for code in CLASSIFIED_COUNTRIES if compiled.macro_region(code) == 'others'] == []
+        assert compiled.macro_region('ZA') == 'africa'
+        assert compiled.macro_region('TW') == 'asia-pacific'
+
+    def test_reload_reclassifies_stored_countries(self):
+        """测试目录修改后按新目录重新分类数据库中的国家和区域"""
+        test_db = os.path.join(self.tmpdir, 'test.db')
+        db_manager = DatabaseManager(test_db)
+        db_manager.migrate()
+        provider_id = db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+        db_manager.create_country(Country(country_code='TR', country_name='Türkiye', continent='europe-africa'))
+        db_manager.create_availability_zone(AvailabilityZone(provider_id, 'tr-ist', 'Istanbul', 'TR', 'others'))
+
+        assert db_manager.reclassify_continents(self.catalog.get().classify) == 2
+        assert db_manager.reclassify_continents(self.catalog.get().classify) == 0
+
+        self._edit(lambda raw: raw['countries']['TR'].update({'macro_region': 'asia-pacific'}))
+        assert db_manager.reclassify_continents(self.catalog.get().classify) == 2
+        with db_manager.connection() as conn:
+            assert conn.execute("SELECT continent FROM countries WHERE country_code = 'TR'").fetchone()[0] == \
+                'asia-pacific'
+            assert conn.execute('SELECT continent, macro_order FROM availability_zones').fetchone() == \
+                ('asia-pacific', 3)
+        assert db_manager.get_stats_snapshot()['regions_by_continent'] == {'asia-pacific': 1}
+        db_manager.close()
+
+    def test_hot_reload_on_mtime_change(self):
+        """测试目录文件修改后不重启即可生效"""
+        mapper = UnifiedRegionMapper(self.catalog)
+        assert not mapper.validate_mapping(CloudProvider.LINODE, 'mx-qro')
+
+        self._edit(lambda raw: raw['providers']['linode']['regions'].update(
+            {'mx-qro': {'country': 'MX', 'name': 'Querétaro, MX'}}
+        ))
+        assert mapper.get_country_code(CloudProvider.LINODE, 'mx-qro') == 'MX'
+        assert mapper.get_region_info(CloudProvider.LINODE, 'mx-qro').continent == 'north-america'
+
+    def test_invalid_edit_keeps_previous_catalog(self):
+        """测试编译失败时继续使用上一份目录"""
+        previous = self.catalog.get()
+        self._edit(lambda raw: raw['providers']['linode']['regions'].update(
+            {'xx-bad': {'country': 'ZZ'}}
+        ))
+        assert self.catalog.get() is previous
+
+        with pytest.raises(CatalogError):
+            RegionCatalog(self.path).get()
+        with pytest.raises(CatalogError):
+            CompiledCatalog.from_bytes(b'{"version": 99}')
+
+
+class TestCatalogApi:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.app = create_app(test_config={'TESTING': True, 'DATABASE': self.test_db.name})
+        self.client = self.app.test_client()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_catalog_endpoint(self):
+        """测试前端目录包含翻译和大区分类，并支持条件请求"""
+        response = self.client.get('/api/catalog')
+        data = response.get_json()
+        assert data['countries']['JP'] == '日本'
+        assert data['regions']['digitalocean']['nyc1'] == '纽约 1'
+        assert [item['id'] for item in data['macro_regions']][-1] == 'others'
+
+        cached = self.client.get('/api/catalog', headers={'If-None-Match': response.headers['ETag']})
+        assert cached.status_code == 304
+
+    def test_catalog_reload_invalidates_cached_payloads(self):
+        """测试区域目录热加载后已缓存的区域列表和ETag失效，返回新的大区名称"""
+        from unittest.mock import patch
+        db_manager = DatabaseManager(self.test_db.name)
+        provider_id = db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+        db_manager.create_availability_zone(AvailabilityZone(provider_id, 'us-east', 'Newark, NJ', 'US', 'north-america'))
+        db_manager.close()
+        response = self.client.get('/api/regions')
+        etag = response.headers['ETag']
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'region_catalog.json')
+            with open(DEFAULT_CATALOG_PATH, encoding='utf-8') as f:
+                raw = json.load(f)
+            raw['macro_regions'][0]['name'] = '北美洲'
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(raw, f, ensure_ascii=False)
+
+            with patch('app.region_catalog', RegionCatalog(path, check_interval=0)):
+                response = self.client.get('/api/regions', headers={'If-None-Match': etag})
+                assert response.status_code == 200
+                assert response.headers['ETag'] != etag
+                assert '北美洲' in response.get_data(as_text=True)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
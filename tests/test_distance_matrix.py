@@ -0,0 +1,126 @@
+import json
+import math
+import os
+import random
+import tempfile
+import numpy as np
+from app import create_app
+from api.cloud_collector import CloudAPICollector
+from database.models import DatabaseManager, Provider
+from services.distance_matrix import DistanceMatrix
+
+
+def _haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a['latitude'], a['longitude'], b['latitude'], b['longitude']))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(h))
+
+
+class TestDistanceMatrix:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        rng = random.Random(11)
+        self.regions = [
+            {'provider': rng.choice(['linode', 'tencent', 'aliyun']), 'region_id': f'r{i}',
+             'latitude': rng.uniform(-90, 90), 'longitude': rng.uniform(-180, 180)}
+            for i in range(300)
+        ]
+        self.regions.append({'provider': 'linode', 'region_id': 'no-coords', 'latitude': None, 'longitude': None})
+
+    def test_blocked_matrix_matches_haversine(self):
+        """测试分块计算的float32矩阵与逐点计算一致"""
+        distances = DistanceMatrix(self.regions, block_elements=1000)
+        assert len(distances) == 300
+
+        matrix = distances.matrix()
+        assert matrix.dtype == np.float32
+        assert matrix.shape == (300, 300)
+        assert np.allclose(matrix, matrix.T, atol=0.05)
+        assert np.all(np.diag(matrix) < 0.01)
+        for i, j in [(0, 1), (5, 250), (42, 299), (120, 7)]:
+            assert abs(matrix[i, j] - _haversine_km(self.regions[i], self.regions[j])) < 0.05
+
+        unblocked = DistanceMatrix(self.regions, block_elements=10 ** 6).matrix()
+        assert np.array_equal(matrix, unblocked)
+
+    def test_closest_excludes_self(self):
+        """测试最近区域与暴力搜索一致，且不会把区域自身作为结果"""
+        distances = DistanceMatrix(self.regions, block_elements=500)
+        rows = distances.indices(['linode'])
+        cols = distances.indices(['linode', 'tencent'])
+        positions, nearest = distances.closest(rows, cols)
+
+        for row, position, distance in zip(rows, positions, nearest):
+            expected = min((_haversine_km(self.regions[row], self.regions[c]), c) for c in cols if c != row)
+            assert cols[position] == expected[1]
+            assert abs(distance - expected[0]) < 0.05
+
+        positions, nearest = distances.closest(rows, distances.indices(['digitalocean']))
+        assert np.all(positions == -1) and np.all(np.isinf(nearest))
+
+
+class TestDistanceApi:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.app = create_app(test_config={'TESTING': True, 'DATABASE': self.test_db.name})
+        self.client = self.app.test_client()
+
+        db_manager = DatabaseManager(self.test_db.name)
+        for name in ('linode', 'tencent', 'aliyun'):
+            db_manager.create_provider(Provider(name=name, display_name=name, color='#3498db'))
+        CloudAPICollector().update_database(db_manager, {
+            'linode': [
+                {'region_id': 'ap-northeast', 'region_name': 'Tokyo 2, JP', 'country_code': 'JP'},
+                {'region_id': 'eu-central', 'region_name': 'Frankfurt, DE', 'country_code': 'DE'}
+            ],
+            'tencent': [
+                {'region_id': 'ap-tokyo', 'region_name': '亚太地区(东京)', 'country_code': 'JP'},
+                {'region_id': 'eu-moscow', 'region_name': '欧洲地区(莫斯科)', 'country_code': 'RU'}
+            ],
+            'aliyun': [
+                {'region_id': 'eu-central-1', 'region_name': '德国（法兰克福）', 'country_code': 'DE'}
+            ]
+        })
+        db_manager.close()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_app_import_does_not_load_numpy(self):
+        """测试导入应用不会加载NumPy，只有处理距离接口时才导入"""
+        import subprocess
+        import sys
+        code = 'import sys, app; assert "numpy" not in sys.modules'
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_distance_matrix(self):
+        """测试距离矩阵的行列与区域列表对应"""
+        data = json.loads(self.client.get('/api/distance/matrix?providers=linode,tencent').data)
+        assert data['success'] is True
+        ids = [r['region_id'] for r in data['regions']]
+        assert ids == ['eu-central', 'ap-northeast', 'eu-moscow', 'ap-tokyo']
+        matrix = data['matrix']
+        assert len(matrix) == 4 and all(len(row) == 4 for row in matrix)
+        assert matrix[1][3] == 0.0
+        assert 1900 < matrix[0][2] < 2100
+
+    def test_closest_across_providers(self):
+        """测试每个区域在目标云服务商中最近的区域"""
+        data = json.loads(self.client.get('/api/distance/closest?from_provider=linode&to_provider=tencent').data)
+        pairs = {p['region']['region_id']: (p['closest']['region_id'], p['distance_km']) for p in data['pairs']}
+        assert pairs['ap-northeast'] == ('ap-tokyo', 0.0)
+        assert pairs['eu-central'][0] == 'eu-moscow'
+
+        # 未指定目标时在其他全部云服务商中查找
+        data = json.loads(self.client.get('/api/distance/closest?from_provider=linode').data)
+        assert data['to_providers'] == ['aliyun', 'tencent']
+        pairs = {p['region']['region_id']: p['closest']['region_id'] for p in data['pairs']}
+        assert pairs == {'ap-northeast': 'ap-tokyo', 'eu-central': 'eu-central-1'}
+
+        assert self.client.get('/api/distance/closest').status_code == 400
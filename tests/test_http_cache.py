@@ -0,0 +1,144 @@
+import json
+import shutil
+import tempfile
+import pytest
+from unittest.mock import Mock, patch
+from api.http_cache import HttpResponseCache, content_hash
+from api.linode_api import LinodeAPI
+from api.tencent_api import TencentAPI
+
+
+def _response(body, status_code=200, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.content = json.dumps(body).encode('utf-8') if body is not None else b''
+    response.headers = headers or {}
+    response.raise_for_status.return_value = None
+    return response
+
+
+LINODE_REGIONS = {
+    'data': [
+        {'id': 'us-east', 'label': 'Newark, NJ', 'capabilities': ['Linodes'], 'status': 'ok'}
+    ]
+}
+
+
+class TestHttpResponseCache:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时缓存目录"""
+        self.directory = tempfile.mkdtemp()
+        self.cache = HttpResponseCache(self.directory, ttl=60)
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时缓存目录"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @pytest.mark.asyncio
+    async def test_conditional_request_uses_cached_body(self):
+        """测试条件请求返回304时使用缓存的响应体"""
+        sent = []
+
+        async def send(headers):
+            sent.append(headers)
+            if len(sent) == 1:
+                return _response(LINODE_REGIONS, headers={'ETag': '"v1"'})
+            return _response(None, status_code=304)
+
+        first = await self.cache.fetch('linode:regions', send)
+        assert first.changed and not first.from_cache
+
+        second = await self.cache.fetch('linode:regions', send)
+        assert sent[1] == {'If-None-Match': '"v1"'}
+        assert second.from_cache
+        assert second.json() == LINODE_REGIONS
+        assert self.cache.stats()['revalidated'] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_only_until_synced(self):
+        """测试内容写入数据库之前一直视为已变化"""
+        async def send(headers):
+            return _response(None, status_code=304) if headers else _response(LINODE_REGIONS)
+
+        assert (await self.cache.fetch('linode:regions', send)).changed
+        # 未标记同步（例如数据库写入失败），下次仍需写入
+        assert (await self.cache.fetch('linode:regions', send)).changed
+
+        self.cache.mark_synced('linode:regions')
+        assert not (await self.cache.fetch('linode:regions', send)).changed
+
+    @pytest.mark.asyncio
+    async def test_ttl_skips_request(self):
+        """测试签名API在TTL内不发送请求"""
+        send_count = 0
+
+        async def send(headers):
+            nonlocal send_count
+            send_count += 1
+            return _response({'Response': {'RegionSet': [], 'RequestId': str(send_count)}})
+
+        ignore = ('RequestId',)
+        await self.cache.fetch('tencent:regions', send, conditional=False, ignore_keys=ignore)
+        await self.cache.fetch('tencent:regions', send, conditional=False, ignore_keys=ignore)
+        assert send_count == 1
+
+        # TTL过期后重新请求，RequestId不同但内容哈希一致
+        self.cache.mark_synced('tencent:regions')
+        result = await self.cache.fetch('tencent:regions', send, conditional=False, ttl=0,
+                                        ignore_keys=ignore)
+        assert send_count == 2
+        assert not result.changed
+
+    def test_content_hash_ignores_keys(self):
+        """测试内容哈希忽略指定字段"""
+        a = json.dumps({'Response': {'RegionSet': [1], 'RequestId': 'a'}})
+        b = json.dumps({'Response': {'RequestId': 'b', 'RegionSet': [1]}})
+        assert content_hash(a, ('RequestId',)) == content_hash(b, ('RequestId',))
+        assert content_hash(a) != content_hash(b)
+
+    @pytest.mark.asyncio
+    async def test_client_skips_unchanged_regions(self):
+        """测试客户端在内容未变化时返回None，不再解析"""
+        api = LinodeAPI(http_cache=self.cache)
+
+        with patch('requests.Session.get') as mock_get:
+            mock_get.return_value = _response(LINODE_REGIONS, headers={'ETag': '"v1"'})
+            regions = await api.fetch_regions(only_changed=True)
+            assert [r['region_id'] for r in regions] == ['us-east']
+            self.cache.mark_synced(api.cache_key)
+
+            mock_get.return_value = _response(None, status_code=304)
+            assert await api.fetch_regions(only_changed=True) is None
+            assert mock_get.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+
+            # 不要求只返回变化时仍然从缓存解析
+            regions = await api.fetch_regions()
+            assert [r['region_id'] for r in regions] == ['us-east']
+
+    @pytest.mark.asyncio
+    async def test_shape_change_is_a_change(self):
+        """测试页面内容都未变化、只是页数减少时仍视为变化"""
+        with patch('requests.Session.get', return_value=_response(LINODE_REGIONS, headers={'ETag': '"v1"'})):
+            await LinodeAPI(http_cache=self.cache).fetch_regions()
+
+        assert self.cache.record_shape('linode:regions', {'pages': 2, 'items': 600})
+        self.cache.mark_synced('linode:regions')
+        assert not self.cache.record_shape('linode:regions', {'pages': 2, 'items': 600})
+        # 末尾的页面消失
+        assert self.cache.record_shape('linode:regions', {'pages': 1, 'items': 500})
+        assert self.cache.record_shape('unknown:regions', {'pages': 1, 'items': 0})
+
+    @pytest.mark.asyncio
+    async def test_signed_client_within_ttl(self):
+        """测试签名API客户端在TTL内不发送请求"""
+        api = TencentAPI(http_cache=self.cache)
+        api.secret_id, api.secret_key = 'id', 'key'
+        body = {'Response': {'RegionSet': [
+            {'Region': 'ap-beijing', 'RegionName': '华北地区(北京)', 'RegionState': 'AVAILABLE'}
+        ], 'RequestId': 'r1'}}
+
+        with patch('requests.Session.post', return_value=_response(body)) as mock_post:
+            assert len(await api.fetch_regions(only_changed=True)) == 1
+            self.cache.mark_synced(api.cache_key)
+            assert await api.fetch_regions(only_changed=True) is None
+            assert mock_post.call_count == 1
@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+from database.models import DatabaseManager, AvailabilityZone
+from database.migrations import LATEST_VERSION, MIGRATIONS
+
+
+class TestMigrations:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def _indexes(self):
+        conn = sqlite3.connect(self.test_db.name)
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    def test_fresh_database_reaches_latest_version(self):
+        """测试新数据库执行全部迁移"""
+        db_manager = DatabaseManager(self.test_db.name)
+        applied = db_manager.migrate()
+
+        assert applied == [m.version for m in MIGRATIONS]
+        assert db_manager.schema_version() == LATEST_VERSION
+        assert 'idx_az_provider_region' in self._indexes()
+        assert 'idx_az_status_provider' in self._indexes()
+
+    def test_migration_bumps_generation(self):
+        """测试执行了迁移时推进数据代际号，没有迁移时不推进"""
+        db_manager = DatabaseManager(self.test_db.name)
+        before = db_manager.generation.current()
+        db_manager.migrate()
+        after = db_manager.generation.current()
+        assert after > before
+        db_manager.migrate()
+        assert db_manager.generation.current() == after
+        db_manager.close()
+
+    def test_migrate_is_idempotent(self):
+        """测试重复执行迁移不会重复应用"""
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.migrate()
+        assert db_manager.migrate() == []
+
+    def test_legacy_duplicates_are_removed(self):
+        """测试旧数据库中的重复区域被去重并加上唯一约束"""
+        db_manager = DatabaseManager(self.test_db.name)
+        # 模拟旧版本：只执行初始表结构迁移
+        from database.migrations import run_migrations
+        run_migrations(db_manager, MIGRATIONS[:1])
+
+        with db_manager.transaction() as conn:
+            provider_id = conn.execute(
+                "INSERT INTO providers (name, display_name, color) VALUES ('linode', 'Linode', '#3498db')"
+            ).lastrowid
+            for name in ('Newark', 'Newark, NJ'):
+                conn.execute('''
+                INSERT INTO availability_zones (provider_id, region_id, region_name, country_code, continent)
+                VALUES (?, 'us-east', ?, 'US', 'americas')
+                ''', (provider_id, name))
+
+        db_manager.migrate()
+
+        with db_manager.connection() as conn:
+            rows = conn.execute('SELECT region_name FROM availability_zones').fetchall()
+        assert rows == [('Newark, NJ',)]
+
+        # 唯一约束生效后 INSERT OR IGNORE 不再产生重复记录
+        az = AvailabilityZone(provider_id, 'us-east', 'Newark, NJ', 'US', 'americas')
+        db_manager.create_availability_zone(az)
+        db_manager.create_availability_zone(az)
+        with db_manager.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM availability_zones').fetchone()[0] == 1
+
+    def test_regions_query_uses_index(self):
+        """测试区域查询使用索引而不是全表扫描"""
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.migrate()
+
+        with db_manager.connection() as conn:
+            plan = conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT region_id, region_name, country_code, continent
+            FROM availability_zones WHERE status = 'available'
+            ''').fetchall()
+        detail = ' '.join(row[-1] for row in plan)
+        assert 'USING' in detail and 'INDEX' in detail
+
+    def test_statistics_collected_after_migration(self):
+        """测试执行迁移后更新查询规划器的统计信息"""
+        db_manager = DatabaseManager(self.test_db.name)
+        from database.migrations import run_migrations
+        run_migrations(db_manager, MIGRATIONS[:-1])
+        with db_manager.transaction() as conn:
+            provider_id = conn.execute(
+                "INSERT INTO providers (name, display_name, color) VALUES ('linode', 'Linode', '#3498db')"
+            ).lastrowid
+            conn.execute('''
+            INSERT INTO availability_zones (provider_id, region_id, region_name, country_code, continent)
+            VALUES (?, 'us-east', 'Newark, NJ', 'US', 'north-america')
+            ''', (provider_id,))
+
+        db_manager.migrate()
+
+        with db_manager.connection() as conn:
+            tables = {row[0] for row in conn.execute('SELECT tbl FROM sqlite_stat1').fetchall()}
+        assert 'availability_zones' in tables
+
+    def test_continents_reclassified_by_catalog(self):
+        """测试旧数据的大洲按区域目录重新分类为大区"""
+        db_manager = DatabaseManager(self.test_db.name)
+        from database.migrations import run_migrations
+        run_migrations(db_manager, MIGRATIONS[:8])
+
+        with db_manager.transaction() as conn:
+            provider_id = conn.execute(
+                "INSERT INTO providers (name, display_name, color) VALUES ('linode', 'Linode', '#3498db')"
+            ).lastrowid
+            conn.executemany('''
+            INSERT INTO availability_zones (provider_id, region_id, region_name, country_code, continent)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [(provider_id, 'us-east', 'Newark, NJ', 'US', 'americas'),
+                  (provider_id, 'ap-south', 'Singapore', 'SG', 'apac'),
+                  (provider_id, 'xx-1', 'Unknown', 'XX', 'apac')])
+
+        # 迁移使用冻结的目录数据，不读取运行时的区域目录
+        with patch('api.catalog.RegionCatalog.get', side_effect=AssertionError('live catalog used')):
+            db_manager.migrate()
+
+        with db_manager.connection() as conn:
+            rows = conn.execute('''
+            SELECT region_id, continent, macro_order FROM availability_zones ORDER BY macro_order
+            ''').fetchall()
+        assert rows == [('us-east', 'north-america', 0), ('ap-south', 'asia-pacific', 3), ('xx-1', 'others', 6)]
+        assert list(db_manager.get_stats_snapshot()['regions_by_continent']) == [
+            'north-america', 'asia-pacific', 'others'
+        ]
+
+    def test_region_coordinates_backfilled(self):
+        """测试已有区域按区域目录回填坐标，目录中没有的区域使用国家的代表位置"""
+        db_manager = DatabaseManager(self.test_db.name)
+        from database.migrations import run_migrations
+        run_migrations(db_manager, MIGRATIONS[:10])
+
+        with db_manager.transaction() as conn:
+            provider_id = conn.execute(
+                "INSERT INTO providers (name, display_name, color) VALUES ('linode', 'Linode', '#3498db')"
+            ).lastrowid
+            conn.executemany('''
+            INSERT INTO availability_zones (provider_id, region_id, region_name, country_code, continent)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [(provider_id, 'us-east', 'Newark, NJ', 'US', 'north-america'),
+                  (provider_id, 'jp-new', 'Tokyo 9, JP', 'JP', 'asia-pacific'),
+                  (provider_id, 'xx-1', 'Unknown', 'XX', 'others')])
+
+        with patch('api.catalog.RegionCatalog.get', side_effect=AssertionError('live catalog used')):
+            db_manager.migrate()
+
+        with db_manager.connection() as conn:
+            rows = conn.execute('''
+            SELECT region_id, latitude, longitude FROM availability_zones ORDER BY region_id
+            ''').fetchall()
+        assert rows == [('jp-new', 35.68, 139.69), ('us-east', 40.74, -74.17), ('xx-1', None, None)]
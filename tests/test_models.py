@@ -194,3 +194,100 @@ class TestDatabaseManager:
         assert us_data is not None
         assert 'linode' in us_data['providers']
         assert 'digitalocean' in us_data['providers']
+
+    def test_upsert_availability_zones(self):
+        """测试批量写入区域数据并返回新增/更新/未变化计数"""
+        provider = Provider(name='linode', display_name='Linode', color='#3498db')
+        provider_id = self.db_manager.create_provider(provider)
+        
+        zones = [
+            AvailabilityZone(provider_id, 'us-east', 'Newark, NJ', 'US', 'americas'),
+            AvailabilityZone(provider_id, 'eu-west', 'London, UK', 'GB', 'europe-africa')
+        ]
+        counts = self.db_manager.upsert_availability_zones(provider_id, zones)
+        assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+        
+        zones = [
+            AvailabilityZone(provider_id, 'us-east', 'Newark, NJ', 'US', 'americas'),
+            AvailabilityZone(provider_id, 'eu-west', 'London 1, UK', 'GB', 'europe-africa'),
+            AvailabilityZone(provider_id, 'ap-south', 'Singapore, SG', 'SG', 'apac')
+        ]
+        counts = self.db_manager.upsert_availability_zones(provider_id, zones)
+        assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+        
+        conn = sqlite3.connect(self.test_db.name)
+        rows = dict(conn.execute('SELECT region_id, region_name FROM availability_zones').fetchall())
+        conn.close()
+        assert rows == {'us-east': 'Newark, NJ', 'eu-west': 'London 1, UK', 'ap-south': 'Singapore, SG'}
+
+    def test_stats_snapshot_maintained_on_write(self):
+        """测试统计快照随数据写入一同更新"""
+        provider_id = self.db_manager.create_provider(
+            Provider(name='linode', display_name='Linode', color='#3498db'))
+        self.db_manager.create_provider(
+            Provider(name='digitalocean', display_name='DigitalOcean', color='#ffb3d9'))
+        
+        zones = [
+            AvailabilityZone(provider_id, 'us-east', 'Newark, NJ', 'US', 'americas'),
+            AvailabilityZone(provider_id, 'eu-west', 'London, UK', 'GB', 'europe-africa')
+        ]
+        self.db_manager.upsert_availability_zones(provider_id, zones)
+        
+        # 快照直接存储在表中
+        conn = sqlite3.connect(self.test_db.name)
+        assert conn.execute('SELECT total_regions FROM stats_snapshot').fetchone()[0] == 2
+        conn.close()
+        
+        stats = self.db_manager.get_stats_snapshot()
+        assert stats['total_regions'] == 2
+        assert stats['total_countries'] == 2
+        assert stats['total_providers'] == 2
+        assert stats['regions_by_provider'] == {'digitalocean': 0, 'linode': 2}
+        assert stats['regions_by_continent'] == {'americas': 1, 'europe-africa': 1}
+        assert stats['providers_by_country'] == {'GB': 1, 'US': 1}
+
+    def test_batch_create_refreshes_stats_once(self):
+        """测试批量逐条写入时可以只在最后重新计算一次统计快照"""
+        provider_id = self.db_manager.create_provider(
+            Provider(name='linode', display_name='Linode', color='#3498db'))
+        
+        with self.db_manager.transaction():
+            for region_id in ('us-east', 'us-west', 'eu-west'):
+                self.db_manager.create_availability_zone(
+                    AvailabilityZone(provider_id, region_id, region_id, 'US', 'americas'), refresh_stats=False)
+            assert self.db_manager.get_stats_snapshot()['total_regions'] == 0
+            self.db_manager.refresh_stats_snapshot()
+        
+        assert self.db_manager.get_stats_snapshot()['total_regions'] == 3
+
+    def test_sync_availability_zones_marks_removed(self):
+        """测试增量同步只写入变化的记录，并将消失的区域标记为不可用"""
+        provider_id = self.db_manager.create_provider(
+            Provider(name='linode', display_name='Linode', color='#3498db'))
+        
+        zones = [
+            AvailabilityZone(provider_id, 'us-east', 'Newark, NJ', 'US', 'americas'),
+            AvailabilityZone(provider_id, 'eu-west', 'London, UK', 'GB', 'europe-africa')
+        ]
+        self.db_manager.sync_availability_zones(provider_id, zones)
+        
+        conn = sqlite3.connect(self.test_db.name)
+        conn.execute("UPDATE availability_zones SET last_updated = '2000-01-01 00:00:00'")
+        conn.commit()
+        
+        diff = self.db_manager.sync_availability_zones(provider_id, zones[:1])
+        assert diff == {'added': 0, 'changed': 0, 'unchanged': 1, 'removed': 1}
+        
+        rows = {row[0]: row[1:] for row in conn.execute(
+            'SELECT region_id, status, last_updated FROM availability_zones')}
+        # 未变化的记录不会被重写
+        assert rows['us-east'] == ('available', '2000-01-01 00:00:00')
+        assert rows['eu-west'][0] == 'unavailable'
+        conn.close()
+        assert self.db_manager.get_stats_snapshot()['total_regions'] == 1
+        
+        # 已下线的区域不重复计数，重新出现时恢复为可用
+        diff = self.db_manager.sync_availability_zones(provider_id, zones[:1])
+        assert diff['removed'] == 0
+        diff = self.db_manager.sync_availability_zones(provider_id, zones)
+        assert diff == {'added': 0, 'changed': 1, 'unchanged': 1, 'removed': 0}
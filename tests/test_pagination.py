@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from api.pagination import Page, Paginator, page_from_url, pages_from_total
+from api.linode_api import LinodeAPI
+from api.digitalocean_api import DigitalOceanAPI
+
+
+def _response(data):
+    response = Mock()
+    response.json.return_value = data
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestPaginator:
+    @pytest.mark.asyncio
+    async def test_fetches_all_pages_with_bounded_concurrency(self):
+        """测试从第一页得到总页数，其余页面有界并发获取"""
+        state = {'active': 0, 'peak': 0}
+
+        async def fetch_page(number):
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+            return Page(number, {'pages': 6, 'items': [number * 10, number * 10 + 1]})
+
+        paginator = Paginator(fetch_page, lambda d: d['pages'], lambda d: d['items'], concurrency=2)
+        items = [item async for item in paginator]
+
+        assert sorted(items) == sorted(n * 10 + i for n in range(1, 7) for i in range(2))
+        assert paginator.pages_fetched == 6
+        assert state['peak'] == 2
+
+    @pytest.mark.asyncio
+    async def test_changed_if_any_page_changed(self):
+        """测试任意一页变化即视为整体变化"""
+        async def fetch_page(number):
+            return Page(number, {'pages': 3, 'items': []}, changed=(number == 3))
+
+        paginator = Paginator(fetch_page, lambda d: d['pages'], lambda d: d['items'])
+        [item async for item in paginator]
+        assert paginator.changed
+
+    @pytest.mark.asyncio
+    async def test_page_count_is_capped(self):
+        """测试异常的分页信息不会导致无限请求"""
+        async def fetch_page(number):
+            return Page(number, {'pages': 10 ** 6, 'items': []})
+
+        paginator = Paginator(fetch_page, lambda d: d['pages'], lambda d: d['items'], max_pages=5)
+        [item async for item in paginator]
+        assert paginator.pages_fetched == 5
+
+    @pytest.mark.asyncio
+    async def test_follows_next_when_total_unknown(self):
+        """测试总页数未知时按 next 链接逐页请求"""
+        async def fetch_page(number):
+            return Page(number, {'next': number < 4, 'items': [number]})
+
+        paginator = Paginator(fetch_page, lambda d: None, lambda d: d['items'], has_next=lambda d: d['next'])
+        items = [item async for item in paginator]
+        assert items == [1, 2, 3, 4]
+        assert paginator.shape == {'pages': 4, 'items': 4}
+
+    def test_page_helpers(self):
+        """测试页数计算辅助函数"""
+        assert pages_from_total(401, 200) == 3
+        assert pages_from_total(0, 200) == 1
+        assert page_from_url('https://api.digitalocean.com/v2/regions?page=4&per_page=200') == 4
+        assert page_from_url(None) is None
+
+
+class TestPaginatedClients:
+    @pytest.mark.asyncio
+    async def test_linode_reads_all_pages(self):
+        """测试Linode客户端读取所有页面"""
+        def fake_get(url, params=None, **kwargs):
+            page = params['page']
+            return _response({
+                'page': page, 'pages': 2, 'results': 2,
+                'data': [{'id': f'region-{page}', 'label': f'Region {page}',
+                          'capabilities': ['Linodes'], 'status': 'ok'}]
+            })
+
+        with patch('requests.Session.get', side_effect=fake_get) as mock_get:
+            regions = await LinodeAPI().fetch_regions()
+
+        assert sorted(r['region_id'] for r in regions) == ['region-1', 'region-2']
+        assert mock_get.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_digitalocean_reads_all_pages(self):
+        """测试DigitalOcean客户端根据meta.total读取所有页面"""
+        def fake_get(url, params=None, **kwargs):
+            page = params['page']
+            count = 200 if page == 1 else 1
+            return _response({
+                'regions': [{'slug': f'r{page}-{i}', 'name': f'R{page}-{i}', 'available': True}
+                            for i in range(count)],
+                'links': {'pages': {'next': 'https://api.digitalocean.com/v2/regions?page=2'}} if page == 1 else {},
+                'meta': {'total': 201}
+            })
+
+        with patch('requests.Session.get', side_effect=fake_get) as mock_get:
+            regions = await DigitalOceanAPI().fetch_regions()
+
+        assert len(regions) == 201
+        assert mock_get.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_digitalocean_follows_next_links(self):
+        """测试DigitalOcean响应没有总数时按 next 链接读取全部页面"""
+        def fake_get(url, params=None, **kwargs):
+            page = params['page']
+            next_url = f'https://api.digitalocean.com/v2/regions?page={page + 1}'
+            return _response({
+                'regions': [{'slug': f'r{page}', 'name': f'R{page}', 'available': True}],
+                'links': {'pages': {'next': next_url}} if page < 3 else {}
+            })
+
+        with patch('requests.Session.get', side_effect=fake_get) as mock_get:
+            regions = await DigitalOceanAPI().fetch_regions()
+
+        assert [r['region_id'] for r in regions] == ['r1', 'r2', 'r3']
+        assert mock_get.call_count == 3
@@ -0,0 +1,189 @@
+import os
+import tempfile
+import threading
+import pytest
+from database.pool import ConnectionPool, PoolTimeout
+from database.models import DatabaseManager, Provider
+
+
+class TestConnectionPool:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.pool = ConnectionPool(self.test_db.name, max_connections=2, timeout=0.2)
+        with self.pool.transaction() as conn:
+            conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.pool.close()
+        os.unlink(self.test_db.name)
+
+    def test_connection_reused(self):
+        """测试连接被复用而不是每次重新建立"""
+        for _ in range(10):
+            with self.pool.connection() as conn:
+                conn.execute('SELECT 1')
+
+        stats = self.pool.stats()
+        assert stats['opened'] == 1
+        assert stats['checkouts'] == 11
+        assert stats['in_use'] == 0
+
+    def test_nested_connection_is_reentrant(self):
+        """测试同一线程内嵌套获取的是同一个连接"""
+        with self.pool.connection() as outer:
+            with self.pool.connection() as inner:
+                assert inner is outer
+        assert self.pool.stats()['open'] == 1
+
+    def test_transaction_rollback(self):
+        """测试事务异常时回滚"""
+        with pytest.raises(RuntimeError):
+            with self.pool.transaction() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('a')")
+                raise RuntimeError('boom')
+
+        with self.pool.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+
+    def test_nested_transaction_joins_outer(self):
+        """测试嵌套事务加入外层事务"""
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('a')")
+            with self.pool.transaction() as inner:
+                inner.execute("INSERT INTO items (name) VALUES ('b')")
+            assert conn.in_transaction
+
+        with self.pool.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 2
+
+    def test_nested_transaction_rolls_back_to_savepoint(self):
+        """测试嵌套事务异常时只回滚嵌套部分"""
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('a')")
+            with pytest.raises(RuntimeError):
+                with self.pool.transaction() as inner:
+                    inner.execute("INSERT INTO items (name) VALUES ('b')")
+                    raise RuntimeError('boom')
+
+        with self.pool.connection() as conn:
+            assert conn.execute('SELECT name FROM items').fetchall() == [('a',)]
+
+    def test_after_commit_callbacks(self):
+        """测试提交后回调：外层事务提交后调用一次，回滚时丢弃"""
+        calls = []
+        callback = lambda: calls.append(1)
+        with self.pool.transaction():
+            self.pool.after_commit(callback)
+            with self.pool.transaction():
+                self.pool.after_commit(callback)
+            assert calls == []
+        assert calls == [1]
+
+        with pytest.raises(RuntimeError):
+            with self.pool.transaction():
+                self.pool.after_commit(callback)
+                raise RuntimeError('boom')
+        assert calls == [1]
+
+        # 不在事务中时立即调用
+        self.pool.after_commit(callback)
+        assert calls == [1, 1]
+
+    def test_wait_and_timeout_when_exhausted(self):
+        """测试连接耗尽时等待并超时"""
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with self.pool.connection():
+                held.set()
+                release.wait()
+
+        threads = [threading.Thread(target=hold) for _ in range(2)]
+        for t in threads:
+            t.start()
+            held.wait()
+            held.clear()
+
+        with pytest.raises(PoolTimeout):
+            with self.pool.connection():
+                pass
+
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert self.pool.stats()['waits'] == 1
+
+    def test_reset_after_fork(self):
+        """测试检测到进程变化后重建连接池"""
+        with self.pool.connection():
+            pass
+        self.pool._pid = -1
+
+        with self.pool.connection() as conn:
+            conn.execute('SELECT 1')
+
+        stats = self.pool.stats()
+        assert stats['opened'] == 1
+        assert stats['checkouts'] == 1
+
+
+class TestDatabaseManagerPool:
+    def test_manager_operations_share_pool(self):
+        """测试DatabaseManager的操作复用连接池中的连接"""
+        test_db = tempfile.NamedTemporaryFile(delete=False)
+        test_db.close()
+        try:
+            db_manager = DatabaseManager(test_db.name)
+            db_manager.create_tables()
+            provider_id = db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+            assert db_manager.get_provider(provider_id).name == 'linode'
+            assert db_manager.get_provider_by_name('linode').id == provider_id
+            assert db_manager.pool_stats()['writer']['opened'] == 1
+            db_manager.close()
+        finally:
+            os.unlink(test_db.name)
+
+    def test_wal_mode_and_readonly_readers(self):
+        """测试WAL模式与只读连接：写事务未提交时读取不被阻塞"""
+        import sqlite3
+        test_db = tempfile.NamedTemporaryFile(delete=False)
+        test_db.close()
+        try:
+            db_manager = DatabaseManager(test_db.name)
+            db_manager.create_tables()
+            db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+            
+            with db_manager.connection() as conn:
+                assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+                assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+            
+            # 只读连接不能写入
+            with db_manager.read_connection() as conn:
+                with pytest.raises(sqlite3.OperationalError):
+                    conn.execute("INSERT INTO providers (name, display_name, color) VALUES ('x', 'x', '#000000')")
+            
+            # 写事务进行中，其他线程的读取看到的是提交前的快照
+            result = {}
+            with db_manager.transaction() as conn:
+                conn.execute("INSERT INTO providers (name, display_name, color) VALUES ('do', 'DO', '#ffb3d9')")
+                
+                def read():
+                    with db_manager.read_connection() as reader:
+                        result['count'] = reader.execute('SELECT COUNT(*) FROM providers').fetchone()[0]
+                
+                reader_thread = threading.Thread(target=read)
+                reader_thread.start()
+                reader_thread.join(timeout=5)
+            
+            assert result['count'] == 1
+            assert db_manager.checkpoint()[0] == 0
+            db_manager.close()
+        finally:
+            for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+                if os.path.exists(test_db.name + suffix):
+                    os.unlink(test_db.name + suffix)
@@ -11,59 +11,26 @@ import os
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# 模拟前端区域分类逻辑的Python版本（用于测试）
+from api.catalog import region_catalog
+
+
+# 分类在服务端按区域目录完成（写入数据库的 continent 列），这里用目录实现同样的接口
 class RegionClassifierForTest:
     """
-    区域分类器 - Python版本用于测试
+    区域分类器 - 基于服务端区域目录
     """
     
     def __init__(self):
-        self.country_to_region = {
-            # 北美
-            'US': 'north-america', 
-            'CA': 'north-america',
-            'MX': 'north-america',
-            
-            # 南美  
-            'BR': 'south-america',
-            'AR': 'south-america',
-            'CL': 'south-america',
-            'CO': 'south-america',
-            'PE': 'south-america',
-            
-            # 欧洲
-            'DE': 'europe', 'GB': 'europe', 'FR': 'europe',
-            'IT': 'europe', 'ES': 'europe', 'NL': 'europe', 
-            'SE': 'europe', 'FI': 'europe', 'IE': 'europe',
-            
-            # 亚太（不含中国）
-            'JP': 'asia-pacific', 'KR': 'asia-pacific', 'SG': 'asia-pacific',
-            'AU': 'asia-pacific', 'IN': 'asia-pacific', 'ID': 'asia-pacific',
-            'MY': 'asia-pacific', 'TH': 'asia-pacific', 'PH': 'asia-pacific',
-            'AE': 'asia-pacific', 'HK': 'asia-pacific',
-            
-            # 中国
-            'CN': 'china'
-        }
-        
-        self.continent_names = {
-            'north-america': '🇺🇸 北美',
-            'south-america': '🇧🇷 南美', 
-            'europe': '🇪🇺 欧洲',
-            'asia-pacific': '🌏 亚太地区',
-            'china': '🇨🇳 中国',
-            'others': '🌐 其他地区'
-        }
-        
-        self.continent_order = ['north-america', 'south-america', 'europe', 'asia-pacific', 'china', 'others']
+        self.catalog = region_catalog.get()
+        self.continent_order = [macro_id for macro_id, _ in self.catalog.macro_regions]
     
     def classify_region(self, country_code):
         """根据国家代码分类区域"""
-        return self.country_to_region.get(country_code, 'others')
+        return self.catalog.macro_region(country_code)
     
     def get_continent_name(self, continent_key):
         """获取大区中文名称"""
-        return self.continent_names.get(continent_key, continent_key)
+        return self.catalog.macro_region_names.get(continent_key, continent_key)
     
     def group_regions_by_continent(self, regions):
         """按大区分组区域"""
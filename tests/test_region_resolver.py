@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import tempfile
+from app import create_app
+from api.catalog import DEFAULT_CATALOG_PATH, RegionCatalog
+from api.cloud_collector import CloudAPICollector
+from api.region_resolver import SOURCE_CATALOG, SOURCE_DEFAULT, SOURCE_GAZETTEER, SOURCE_PATTERN, RegionResolver
+from database.models import DatabaseManager, Provider
+
+
+class TestRegionResolver:
+    def setup_method(self):
+        """每个测试方法前执行，复制一份目录文件用于修改"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'region_catalog.json')
+        shutil.copy(DEFAULT_CATALOG_PATH, self.path)
+        self.catalog = RegionCatalog(self.path, check_interval=0)
+        self.resolver = RegionResolver(self.catalog)
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_catalog_lookup_first(self):
+        """测试目录中已有的区域直接使用目录映射"""
+        resolution = self.resolver.resolve('linode', 'ap-south')
+        assert resolution.country_code == 'SG'
+        assert resolution.source == SOURCE_CATALOG
+
+    def test_id_patterns(self):
+        """测试未收录的区域ID按云服务商的ID模式解析"""
+        cases = [
+            ('digitalocean', 'nyc9', 'US'),
+            ('digitalocean', 'sgp2', 'SG'),
+            ('linode', 'id-cgk-2', 'ID'),
+            ('linode', 'xx-fra', 'DE'),
+            ('aliyun', 'cn-hongkong', 'HK'),
+            ('aliyun', 'cn-lanzhou-a', 'CN'),
+            ('tencent', 'na-ashburn', 'US'),
+            ('tencent', 'eu-frankfurt', 'DE'),
+            ('tencent', 'ap-jakarta', 'ID')
+        ]
+        for provider, region_id, country_code in cases:
+            resolution = self.resolver.resolve(provider, region_id)
+            assert resolution.country_code == country_code, (provider, region_id)
+
+        assert self.resolver.resolve('digitalocean', 'nyc9').source == SOURCE_PATTERN
+
+    def test_label_gazetteer(self):
+        """测试ID无法识别时在区域名称中查找地名"""
+        cases = [
+            ('linode', 'xx-new', 'Jakarta, ID', 'ID'),
+            ('tencent', 'ap-unknown', '亚太地区(雅加达)', 'ID'),
+            ('aliyun', 'sa-east-9', 'São Paulo', 'BR'),
+            ('digitalocean', 'zz1', 'Kuala Lumpur 1', 'MY')
+        ]
+        for provider, region_id, label, country_code in cases:
+            resolution = self.resolver.resolve(provider, region_id, label)
+            assert resolution.country_code == country_code, (provider, region_id, label)
+            assert resolution.source == SOURCE_GAZETTEER
+
+    def test_unknown_region_uses_default_and_is_reported(self):
+        """测试无法解析的区域使用默认国家并列入未解析区域"""
+        resolution = self.resolver.resolve('aliyun', 'zz-nowhere-1', 'Nowhere')
+        assert resolution.country_code == 'CN'
+        assert resolution.source == SOURCE_DEFAULT
+        assert not resolution.resolved
+
+        unmapped = self.resolver.unmapped('aliyun', [
+            {'region_id': 'cn-hangzhou', 'region_name': '华东1（杭州）'},
+            {'region_id': 'zz-nowhere-1', 'region_name': 'Nowhere'}
+        ])
+        assert unmapped == [{'region_id': 'zz-nowhere-1', 'label': 'Nowhere', 'fallback_country': 'CN'}]
+        assert self.resolver.unmapped('unknown-provider', [{'region_id': 'x', 'region_name': 'x'}]) == []
+
+    def test_memo_invalidated_on_catalog_reload(self):
+        """测试解析结果缓存，目录重新加载后缓存失效"""
+        first = self.resolver.resolve('linode', 'zz-qqq', 'Nowhere')
+        assert self.resolver.resolve('linode', 'zz-qqq', 'Nowhere') is first
+        assert first.source == SOURCE_DEFAULT
+
+        with open(self.path, encoding='utf-8') as f:
+            raw = json.load(f)
+        raw['providers']['linode']['regions']['zz-qqq'] = {'country': 'MX', 'name': 'Querétaro, MX'}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, ensure_ascii=False)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        resolution = self.resolver.resolve('linode', 'zz-qqq', 'Nowhere')
+        assert resolution.country_code == 'MX'
+        assert resolution.source == SOURCE_CATALOG
+
+    def test_memo_size_limit(self):
+        """测试缓存超过上限后清空"""
+        resolver = RegionResolver(self.catalog, memo_size=2)
+        for index in range(5):
+            resolver.resolve('linode', f'zz-{index}')
+        assert len(resolver._memo) <= 2
+
+
+class TestUnmappedRegionsApi:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.app = create_app(test_config={'TESTING': True, 'DATABASE': self.test_db.name})
+        self.client = self.app.test_client()
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+        db_manager.close()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def _collect(self, regions):
+        db_manager = DatabaseManager(self.test_db.name)
+        CloudAPICollector().update_database(db_manager, {'linode': regions})
+        db_manager.close()
+
+    def test_unmapped_regions_recorded_and_cleared(self):
+        """测试收集时记录未解析区域，区域被识别或下线后移除"""
+        self._collect([
+            {'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'},
+            {'region_id': 'zz-qqq', 'region_name': 'Nowhere', 'country_code': 'US'}
+        ])
+        data = json.loads(self.client.get('/api/regions/unmapped').data)
+        assert data['success'] is True
+        assert data['total'] == 1
+        region = data['regions'][0]
+        assert (region['provider'], region['region_id'], region['fallback_country']) == ('linode', 'zz-qqq', 'US')
+        assert region['seen_count'] == 1
+
+        self._collect([
+            {'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'},
+            {'region_id': 'zz-qqq', 'region_name': 'Nowhere', 'country_code': 'US'}
+        ])
+        data = json.loads(self.client.get('/api/regions/unmapped?provider=linode').data)
+        assert data['regions'][0]['seen_count'] == 2
+        data = json.loads(self.client.get('/api/regions/unmapped?provider=aliyun').data)
+        assert data['total'] == 0
+
+        self._collect([{'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'}])
+        data = json.loads(self.client.get('/api/regions/unmapped').data)
+        assert data['total'] == 0
@@ -0,0 +1,72 @@
+import sys
+import types
+import pytest
+from importlib import metadata
+from unittest.mock import patch
+from api.cloud_collector import CloudAPICollector
+from api.registry import ProviderRegistry, UnknownProviderError
+
+
+class FakeAPI:
+    def __init__(self, http_cache=None):
+        self.http_cache = http_cache
+        self.cache_key = 'fake:regions'
+
+    async def fetch_regions(self, only_changed=False):
+        return [{'region_id': 'fake-1', 'region_name': 'Fake 1', 'country_code': 'US'}]
+
+
+class TestProviderRegistry:
+    def setup_method(self):
+        """每个测试方法前执行，注册一个按需导入的假模块"""
+        self.module = types.ModuleType('fake_provider_module')
+        self.module.FakeAPI = FakeAPI
+        self.registry = ProviderRegistry(builtins={'fake': 'fake_provider_module:FakeAPI'}, group=None)
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        sys.modules.pop('fake_provider_module', None)
+
+    def test_modules_imported_on_first_use(self):
+        """测试列出名称不导入模块，创建客户端时才导入"""
+        assert self.registry.names() == ['fake']
+        assert self.registry.loaded() == []
+
+        with patch.dict(sys.modules, {'fake_provider_module': self.module}):
+            client = self.registry.create('fake', http_cache='cache')
+        assert isinstance(client, FakeAPI)
+        assert client.http_cache == 'cache'
+        assert self.registry.loaded() == ['fake']
+
+    def test_select_validates_names(self):
+        """测试子集校验和规范化"""
+        self.registry.register('other', FakeAPI)
+        assert self.registry.select(None) == ['fake', 'other']
+        assert self.registry.select(['other']) == ['other']
+        with pytest.raises(UnknownProviderError):
+            self.registry.select(['other', 'missing'])
+
+    def test_entry_points_discovered(self):
+        """测试通过入口点发现第三方云服务商，内置实现优先"""
+        entry_points = [
+            metadata.EntryPoint(name='vultr', value='fake_provider_module:FakeAPI', group='cloud_az.providers'),
+            metadata.EntryPoint(name='fake', value='elsewhere:Other', group='cloud_az.providers')
+        ]
+        registry = ProviderRegistry(builtins={'fake': 'fake_provider_module:FakeAPI'})
+        with patch('api.registry.metadata.entry_points', return_value=entry_points), \
+             patch.dict(sys.modules, {'fake_provider_module': self.module}):
+            assert registry.names() == ['fake', 'vultr']
+            assert isinstance(registry.create('vultr'), FakeAPI)
+            assert isinstance(registry.create('fake'), FakeAPI)
+
+    @pytest.mark.asyncio
+    async def test_collector_only_creates_selected_clients(self):
+        """测试收集器只创建本次需要的客户端"""
+        self.registry.register('other', FakeAPI)
+        collector = CloudAPICollector(registry=self.registry)
+        results = await collector.collect_all_regions(providers=['other', 'unknown'])
+
+        assert list(results) == ['other']
+        assert len(results['other']) == 1
+        assert collector.providers.created() == ['other']
+        assert self.registry.loaded() == ['other']
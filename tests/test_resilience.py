@@ -0,0 +1,180 @@
+import asyncio
+import os
+import tempfile
+import pytest
+import requests
+from unittest.mock import AsyncMock, patch
+from api.cloud_collector import CloudAPICollector
+from api.resilience import (
+    CircuitBreaker, CircuitOpenError, ResiliencePolicy, RetryPolicy, is_transient,
+    CLOSED, OPEN, HALF_OPEN
+)
+from database.models import DatabaseManager, Provider
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResiliencePolicy:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.clock = FakeClock()
+        self.policy = ResiliencePolicy(
+            retry=RetryPolicy(attempts=3, base_delay=0), failure_threshold=2,
+            reset_timeout=60, clock=self.clock
+        )
+
+    def test_is_transient(self):
+        """测试临时错误的判断"""
+        response = requests.Response()
+        response.status_code = 503
+        assert is_transient(requests.HTTPError(response=response))
+        response.status_code = 403
+        assert not is_transient(requests.HTTPError(response=response))
+        assert is_transient(requests.ConnectionError())
+        assert not is_transient(ValueError())
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors(self):
+        """测试临时错误重试后成功"""
+        fn = AsyncMock(side_effect=[requests.Timeout(), requests.ConnectionError(), ['ok']])
+        assert await self.policy.call('linode', fn) == ['ok']
+        assert fn.call_count == 3
+        assert self.policy.breaker('linode').state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_permanent_errors_not_retried(self):
+        """测试非临时错误不重试"""
+        fn = AsyncMock(side_effect=ValueError('bad payload'))
+        with pytest.raises(ValueError):
+            await self.policy.call('linode', fn)
+        assert fn.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_breaker_opens_and_recovers(self):
+        """测试连续失败后熔断，冷却后试探调用成功即恢复"""
+        failing = AsyncMock(side_effect=ValueError('down'))
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await self.policy.call('aliyun', failing)
+        assert self.policy.breaker('aliyun').state == OPEN
+
+        with pytest.raises(CircuitOpenError):
+            await self.policy.call('aliyun', failing)
+        assert failing.call_count == 2
+
+        self.clock.now += 61
+        assert self.policy.breaker('aliyun').state == HALF_OPEN
+        assert await self.policy.call('aliyun', AsyncMock(return_value=[])) == []
+        assert self.policy.breaker('aliyun').state == CLOSED
+
+        assert self.policy.drain_events() == [
+            ('aliyun', CLOSED, OPEN), ('aliyun', OPEN, HALF_OPEN), ('aliyun', HALF_OPEN, CLOSED)
+        ]
+        assert self.policy.drain_events() == []
+
+    def test_half_open_allows_single_trial(self):
+        """测试半开状态只放行一次试探调用，失败后重新熔断"""
+        breaker = CircuitBreaker('tencent', failure_threshold=1, reset_timeout=10, clock=self.clock)
+        breaker.record_failure()
+        self.clock.now += 10
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_does_not_block_breaker(self):
+        """测试半开状态的试探调用被取消后，熔断器仍能再次放行并恢复"""
+        failing = AsyncMock(side_effect=ValueError('down'))
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await self.policy.call('digitalocean', failing)
+        self.clock.now += 61
+
+        async def hang():
+            await asyncio.Event().wait()
+
+        task = asyncio.create_task(self.policy.call('digitalocean', hang))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert self.policy.breaker('digitalocean').state == OPEN
+
+        self.clock.now += 61
+        assert await self.policy.call('digitalocean', AsyncMock(return_value=['ok'])) == ['ok']
+        assert self.policy.breaker('digitalocean').state == CLOSED
+
+    def test_retry_delay_is_bounded(self):
+        """测试退避时间不超过上限"""
+        retry = RetryPolicy(base_delay=1, max_delay=4)
+        for attempt in range(6):
+            assert 0 <= retry.delay(attempt) <= min(4, 2 ** attempt)
+
+    def test_retry_requires_an_attempt(self):
+        """测试重试次数小于1时直接报错，不会不执行请求就返回"""
+        with pytest.raises(ValueError):
+            RetryPolicy(attempts=0)
+
+
+class TestCollectorResilience:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+        for name in ('linode', 'digitalocean', 'aliyun', 'tencent'):
+            self.db_manager.create_provider(Provider(name=name, display_name=name, color='#000000'))
+        self.policy = ResiliencePolicy(retry=RetryPolicy(attempts=1), failure_threshold=1)
+        self.collector = CloudAPICollector(resilience=self.policy, deadline=0.2)
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.db_manager.close()
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def _logs(self):
+        with self.db_manager.connection() as conn:
+            return conn.execute('''
+            SELECT p.name, l.status, l.message FROM update_logs l
+            JOIN providers p ON p.id = l.provider_id ORDER BY l.id
+            ''').fetchall()
+
+    @pytest.mark.asyncio
+    async def test_deadline_commits_finished_providers(self):
+        """测试超过总时限的云服务商被跳过，已完成的照常写入并记录失败原因"""
+        async def slow():
+            await asyncio.sleep(5)
+            return []
+
+        regions = [{'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'}]
+        with patch.object(self.collector.providers['linode'], 'fetch_regions', AsyncMock(return_value=regions)), \
+             patch.object(self.collector.providers['digitalocean'], 'fetch_regions', slow), \
+             patch.object(self.collector.providers['aliyun'], 'fetch_regions',
+                          AsyncMock(side_effect=ValueError('bad credentials'))), \
+             patch.object(self.collector.providers['tencent'], 'fetch_regions', AsyncMock(return_value=[])):
+            results = await self.collector.collect_all_regions()
+
+        assert len(results['linode']) == 1
+        assert results['digitalocean'] is None
+        assert results['aliyun'] is None
+        assert self.collector.errors['digitalocean'] == 'Refresh deadline of 0.2s exceeded'
+
+        self.collector.update_database(self.db_manager, results)
+        assert self.db_manager.get_stats_snapshot()['total_regions'] == 1
+
+        logs = self._logs()
+        assert ('aliyun', 'error', 'bad credentials') in logs
+        assert ('aliyun', 'circuit_open', 'Circuit breaker closed -> open') in logs
+        assert any(name == 'digitalocean' and status == 'error' and 'deadline' in message
+                   for name, status, message in logs)
+        assert ('tencent', 'skipped', 'No regions returned, existing data kept') in logs
@@ -0,0 +1,197 @@
+import os
+import json
+import tempfile
+from unittest.mock import Mock
+from app import create_app
+from database.generation import DataGeneration
+from database.models import DatabaseManager, Provider
+from api.cloud_collector import CloudAPICollector
+from services.response_cache import ResponseCache, normalize_list_arg
+from services.payload_store import PayloadStore
+
+
+class TestResponseCache:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.generation = DataGeneration(self.test_db.name)
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for path in (self.test_db.name, self.generation.path, self.generation.path + '.lock'):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def test_normalize_list_arg(self):
+        """测试查询参数规范化"""
+        assert normalize_list_arg('') == ()
+        assert normalize_list_arg(None) == ()
+        assert normalize_list_arg('tencent, Linode,,linode') == ('linode', 'tencent')
+
+    def test_hit_and_miss(self):
+        """测试命中与未命中计数"""
+        cache = ResponseCache(self.generation)
+        builder = Mock(return_value={'value': 1})
+
+        assert cache.get_or_build('regions', {'providers': ()}, builder) == {'value': 1}
+        assert cache.get_or_build('regions', {'providers': ()}, builder) == {'value': 1}
+
+        assert builder.call_count == 1
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_generation_bump_invalidates(self):
+        """测试代际号推进后缓存失效"""
+        cache = ResponseCache(self.generation)
+        builder = Mock(side_effect=[{'value': 1}, {'value': 2}])
+
+        assert cache.get_or_build('stats', None, builder) == {'value': 1}
+        self.generation.bump()
+        assert cache.get_or_build('stats', None, builder) == {'value': 2}
+        assert builder.call_count == 2
+
+    def test_generation_shared_across_instances(self):
+        """测试代际号可被其他进程（实例）感知"""
+        other = DataGeneration(self.test_db.name)
+        before = other.current()
+        self.generation.bump()
+        assert other.current() == before + 1
+
+    def test_bump_is_atomic_across_processes(self):
+        """测试多个进程同时推进代际号时不会丢失更新"""
+        import multiprocessing
+
+        def bump_many(db_path):
+            generation = DataGeneration(db_path)
+            for _ in range(50):
+                generation.bump()
+
+        before = self.generation.current()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=bump_many, args=(self.test_db.name,)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert self.generation.current() == before + 200
+
+    def test_lru_eviction(self):
+        """测试超出容量时按LRU淘汰"""
+        cache = ResponseCache(self.generation, max_entries=2)
+        cache.get_or_build('a', None, lambda: 'a')
+        cache.get_or_build('b', None, lambda: 'b')
+        cache.get_or_build('a', None, lambda: 'a')
+        cache.get_or_build('c', None, lambda: 'c')
+
+        builder = Mock(return_value='b2')
+        assert cache.get_or_build('b', None, builder) == 'b2'
+        assert builder.call_count == 1
+        assert cache.stats()['evictions'] >= 1
+
+    def test_byte_limit(self):
+        """测试按总字节数淘汰，超过上限的单个结果不缓存"""
+        cache = ResponseCache(self.generation, max_bytes=10, sizeof=len)
+        cache.get_or_build('a', None, lambda: 'aaaa')
+        cache.get_or_build('b', None, lambda: 'bbbb')
+        cache.get_or_build('c', None, lambda: 'cccc')
+        assert cache.stats()['entries'] == 2
+        assert cache.stats()['bytes'] == 8
+
+        builder = Mock(return_value='x' * 11)
+        cache.get_or_build('big', None, builder)
+        cache.get_or_build('big', None, builder)
+        assert builder.call_count == 2
+        assert cache.stats()['bytes'] == 8
+
+    def test_payload_store_never_returns_stale_generation(self):
+        """测试并发推进代际号时，读取到的响应体不会早于读取前的代际"""
+        import threading
+
+        class Counter:
+            value = 0
+
+            def current(self):
+                return self.value
+
+        generation = Counter()
+        store = PayloadStore(generation, lambda: [(ResponseCache.make_key('stats', None), generation.value)],
+                             ResponseCache(generation))
+        errors = []
+
+        def read():
+            for _ in range(2000):
+                before = generation.value
+                built = json.loads(store.get('stats', None, lambda: None).body)
+                if built < before:
+                    errors.append((before, built))
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        while any(reader.is_alive() for reader in readers):
+            generation.value += 1
+        for reader in readers:
+            reader.join()
+        assert errors == []
+
+
+class TestAppResponseCache:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+
+        self.app = create_app(test_config={
+            'TESTING': True,
+            'DATABASE': self.test_db.name
+        })
+        self.client = self.app.test_client()
+
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+        self.db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for path in (self.test_db.name, self.db_manager.generation.path, self.db_manager.generation.path + '.lock'):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def test_provider_filter_normalized(self):
+        """测试过滤参数顺序不同时共享同一缓存项"""
+        self.client.get('/api/regions?providers=linode,tencent')
+        self.client.get('/api/regions?providers=tencent,linode')
+
+        stats = json.loads(self.client.get('/api/cache/stats').data)['cache']
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+
+    def test_update_database_invalidates_cache(self):
+        """测试成功刷新后缓存失效"""
+        response = self.client.get('/api/regions')
+        assert json.loads(response.data)['total'] == 0
+
+        collector = CloudAPICollector()
+        collector.update_database(self.db_manager, {
+            'linode': [{'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'}]
+        })
+
+        response = self.client.get('/api/regions')
+        assert json.loads(response.data)['total'] == 1
+
+    def test_unchanged_refresh_keeps_cache(self):
+        """测试数据没有变化时不推进代际号，空结果不会下线已有区域"""
+        collector = CloudAPICollector()
+        regions = {'linode': [{'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'}]}
+        collector.update_database(self.db_manager, regions)
+        generation = self.db_manager.generation.current()
+
+        collector.update_database(self.db_manager, regions)
+        assert self.db_manager.generation.current() == generation
+
+        collector.update_database(self.db_manager, {'linode': []})
+        assert self.db_manager.generation.current() == generation
+        response = self.client.get('/api/regions')
+        assert json.loads(response.data)['total'] == 1
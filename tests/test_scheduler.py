@@ -0,0 +1,174 @@
+import os
+import tempfile
+from unittest.mock import Mock, AsyncMock
+from database.models import DatabaseManager, Provider
+from services.file_lock import FileLock
+from services.refresh_jobs import RefreshJobManager
+from services.scheduler import RefreshScheduler
+
+
+class FakeRefreshJobs:
+    """记录提交的云服务商并返回预设结果的刷新任务"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.submitted = []
+
+    def submit(self, providers=None):
+        self.submitted.append(list(providers))
+        return {'job_id': str(len(self.submitted))}, False
+
+    def wait(self, job_id, timeout=None):
+        providers = self.submitted[int(job_id) - 1]
+        return {
+            'job_id': job_id,
+            'status': 'succeeded',
+            'progress': {p: {'status': self.statuses.get(p, 'succeeded')} for p in providers}
+        }
+
+
+class TestRefreshScheduler:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+        for name in ('aliyun', 'linode'):
+            self.db_manager.create_provider(Provider(name=name, display_name=name, color='#000000'))
+        self.now = 1_000_000.0
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.db_manager.close()
+        for suffix in ('', '-wal', '-shm', '.generation', '.scheduler.lock', '.refresh.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def _scheduler(self, refresh_jobs, **kwargs):
+        kwargs.setdefault('jitter', 0)
+        return RefreshScheduler(self.db_manager, refresh_jobs, clock=lambda: self.now, **kwargs)
+
+    def test_per_provider_intervals(self):
+        """测试按云服务商的间隔安排下次刷新"""
+        jobs = FakeRefreshJobs({})
+        scheduler = self._scheduler(jobs, intervals={'linode': 600}, default_interval=3600)
+
+        # 从未刷新过的云服务商立即到期，合并为一个任务
+        result = scheduler.run_pending()
+        assert result['due'] == ['aliyun', 'linode']
+        assert jobs.submitted == [['aliyun', 'linode']]
+
+        self.now += 601
+        assert scheduler.due_providers() == ['linode']
+        scheduler.run_pending()
+        assert jobs.submitted[-1] == ['linode']
+
+        self.now += 400
+        assert scheduler.due_providers() == []
+
+        self.now += 2600
+        assert scheduler.due_providers() == ['aliyun', 'linode']
+
+    def test_failed_provider_retried_sooner(self):
+        """测试刷新失败的云服务商按重试间隔重新安排"""
+        jobs = FakeRefreshJobs({'aliyun': 'failed'})
+        scheduler = self._scheduler(jobs, default_interval=3600, retry_interval=300)
+        scheduler.run_pending()
+
+        schedule = {row['provider']: row for row in scheduler.schedule()}
+        assert schedule['aliyun']['last_status'] == 'failed'
+        assert schedule['aliyun']['next_run_at'] == self.now + 300
+        assert schedule['linode']['next_run_at'] == self.now + 3600
+
+    def test_catch_up_after_downtime(self):
+        """测试停机多个周期后只补跑一次"""
+        jobs = FakeRefreshJobs({})
+        scheduler = self._scheduler(jobs, default_interval=600)
+        scheduler.run_pending()
+
+        self.now += 600 * 10
+        scheduler.run_pending()
+        assert scheduler.run_pending() == {'due': [], 'job': None}
+        assert len(jobs.submitted) == 2
+
+    def test_jitter_bounds(self):
+        """测试下次刷新时间在抖动范围内"""
+        scheduler = self._scheduler(FakeRefreshJobs({}), default_interval=1000, jitter=0.1)
+        for _ in range(50):
+            assert 900 <= scheduler.next_run_time('linode', 0) <= 1100
+
+    def test_single_flight_across_schedulers(self):
+        """测试同一主机上同时只有一个调度器执行检查"""
+        jobs = FakeRefreshJobs({})
+        scheduler = self._scheduler(jobs)
+        other = FileLock(f'{self.test_db.name}.scheduler.lock')
+        assert other.acquire(timeout=0)
+        try:
+            assert scheduler.run_pending() is None
+            assert jobs.submitted == []
+        finally:
+            other.release()
+        assert scheduler.run_pending() is not None
+
+
+class TestRefreshJobProviders:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.db_manager.close()
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock', '.refresh.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_subset_refresh_and_lock(self):
+        """测试只刷新部分云服务商，且其他进程持有刷新锁时等待"""
+        collector = Mock()
+        collector.collect_all_regions = AsyncMock(return_value={'linode': []})
+        jobs = RefreshJobManager(self.db_manager, lambda: collector, lock_timeout=0.2)
+
+        job, joined = jobs.submit(providers=['linode'])
+        job = jobs.wait(job['job_id'], timeout=10)
+        assert job['status'] == 'succeeded'
+        assert job['providers'] == ['linode']
+        assert collector.collect_all_regions.call_args.kwargs['providers'] == ['linode']
+
+        other = FileLock(f'{self.test_db.name}.refresh.lock')
+        assert other.acquire(timeout=0)
+        try:
+            job, _ = jobs.submit()
+            job = jobs.wait(job['job_id'], timeout=10)
+            assert job['status'] == 'failed'
+            assert 'still running' in job['error']
+        finally:
+            other.release()
+        jobs.shutdown()
+
+    def test_heartbeat_during_long_write(self):
+        """测试没有进度回调的长时间数据库写入期间仍定期刷新心跳"""
+        import time
+        collector = Mock()
+        collector.collect_all_regions = AsyncMock(return_value={'linode': []})
+        collector.update_database = Mock(side_effect=lambda *args, **kwargs: time.sleep(0.3))
+        jobs = RefreshJobManager(self.db_manager, lambda: collector, heartbeat_interval=0.05)
+        beats = []
+        update = jobs._update
+        jobs._update = lambda job_id, **kwargs: (beats.append(kwargs), update(job_id, **kwargs))
+
+        job, _ = jobs.submit(providers=['linode'])
+        assert jobs.wait(job['job_id'], timeout=10)['status'] == 'succeeded'
+        assert sum(1 for kwargs in beats if not kwargs) >= 3
+        jobs.shutdown()
+
+    def test_covers(self):
+        """测试已有任务覆盖所请求的云服务商时加入该任务"""
+        assert RefreshJobManager._covers(None, ['linode'])
+        assert RefreshJobManager._covers('["aliyun", "linode"]', ['linode'])
+        assert not RefreshJobManager._covers('["linode"]', ['aliyun', 'linode'])
+        assert not RefreshJobManager._covers('["linode"]', None)
@@ -0,0 +1,93 @@
+import base64
+import hashlib
+import hmac
+import time
+import urllib.parse
+from api.signing import AliyunRequest, AliyunSigner, TC3Signer, TencentRequest
+
+
+def _reference_tc3(secret_id, secret_key, action, timestamp, payload='{}'):
+    """逐步计算的TC3签名（腾讯云文档中的流程），用于对照"""
+    date = time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+    canonical_headers = (f'content-type:application/json; charset=utf-8\nhost:cvm.tencentcloudapi.com\n'
+                         f'x-tc-action:{action.lower()}\nx-tc-timestamp:{timestamp}\nx-tc-version:2017-03-12\n')
+    signed_headers = 'content-type;host;x-tc-action;x-tc-timestamp;x-tc-version'
+    canonical_request = (f'POST\n/\n\n{canonical_headers}\n{signed_headers}\n'
+                         f'{hashlib.sha256(payload.encode()).hexdigest()}')
+    credential_scope = f'{date}/cvm/tc3_request'
+    string_to_sign = (f'TC3-HMAC-SHA256\n{timestamp}\n{credential_scope}\n'
+                      f'{hashlib.sha256(canonical_request.encode()).hexdigest()}')
+
+    def sign(key, msg):
+        return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+    key = sign(sign(sign(('TC3' + secret_key).encode(), date), 'cvm'), 'tc3_request')
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return (f'TC3-HMAC-SHA256 Credential={secret_id}/{credential_scope}, '
+            f'SignedHeaders={signed_headers}, Signature={signature}')
+
+
+class TestTC3Signer:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.now = 1700000000
+        self.signer = TC3Signer('AKID', 'secret', 'cvm', 'cvm.tencentcloudapi.com', '2017-03-12',
+                                clock=lambda: self.now)
+
+    def test_matches_reference_signature(self):
+        """测试签名结果与逐步计算的结果一致"""
+        headers = self.signer.sign('DescribeZones', payload='{"Limit": 10}', region='ap-guangzhou')
+        assert headers['Authorization'] == _reference_tc3(
+            'AKID', 'secret', 'DescribeZones', self.now, payload='{"Limit": 10}'
+        )
+        assert headers['X-TC-Region'] == 'ap-guangzhou'
+        assert headers['X-TC-Timestamp'] == str(self.now)
+
+    def test_derived_key_cached_per_utc_day(self):
+        """测试派生密钥同一天内只计算一次，跨天后重新计算"""
+        for _ in range(5):
+            self.signer.sign('DescribeRegions')
+        assert self.signer.derivations == 1
+
+        self.now += 86400
+        headers = self.signer.sign('DescribeRegions')
+        assert self.signer.derivations == 2
+        assert headers['Authorization'] == _reference_tc3('AKID', 'secret', 'DescribeRegions', self.now)
+
+    def test_sign_batch(self):
+        """测试批量签名不同的action"""
+        batch = self.signer.sign_batch([
+            TencentRequest('DescribeRegions'),
+            TencentRequest('DescribeZones', region='ap-shanghai')
+        ])
+        assert [h['X-TC-Action'] for h in batch] == ['DescribeRegions', 'DescribeZones']
+        assert batch[1]['Authorization'] == _reference_tc3('AKID', 'secret', 'DescribeZones', self.now)
+
+
+class TestAliyunSigner:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.signer = AliyunSigner('key-id', 'key-secret', 'https://ecs.cn-hangzhou.aliyuncs.com/')
+
+    def _reference_signature(self, params):
+        query = '&'.join(f'{k}={urllib.parse.quote(str(v), safe="")}' for k, v in sorted(params.items()))
+        string_to_sign = f'GET&%2F&{urllib.parse.quote(query, safe="")}'
+        return base64.b64encode(
+            hmac.new(b'key-secret&', string_to_sign.encode(), hashlib.sha1).digest()
+        ).decode()
+
+    def test_matches_reference_signature(self):
+        """测试签名结果与按文档逐步计算的结果一致"""
+        url = self.signer.sign_url('DescribeZones', {'RegionId': 'cn-beijing'},
+                                   timestamp='2024-01-01T00:00:00Z', nonce='abc')
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        signature = query.pop('Signature')
+        assert query['Action'] == 'DescribeZones'
+        assert query['RegionId'] == 'cn-beijing'
+        assert signature == self._reference_signature(query)
+
+    def test_sign_batch_uses_unique_nonces(self):
+        """测试批量签名时每个请求的随机数不同"""
+        urls = self.signer.sign_batch([AliyunRequest('DescribeZones', {'RegionId': str(i)}) for i in range(10)])
+        nonces = {dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(u).query))['SignatureNonce'] for u in urls}
+        assert len(nonces) == 10
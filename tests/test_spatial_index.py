@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import random
+import tempfile
+from app import create_app
+from api.cloud_collector import CloudAPICollector
+from database.models import DatabaseManager, Provider
+from services.spatial_index import KDTree, RegionSpatialIndex, chord_to_km, unit_vector
+
+
+def _haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(h))
+
+
+class _Generation:
+    def __init__(self):
+        self.value = 1
+
+    def current(self):
+        return self.value
+
+
+class TestKDTree:
+    def test_matches_brute_force(self):
+        """测试k-d树的结果与逐点计算的大圆距离一致"""
+        rng = random.Random(7)
+        coords = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(2000)]
+        tree = KDTree([unit_vector(*c) for c in coords], list(range(len(coords))))
+        assert len(tree) == 2000
+
+        for _ in range(30):
+            target = (rng.uniform(-90, 90), rng.uniform(-180, 180))
+            expected = sorted(range(len(coords)), key=lambda i: _haversine_km(target, coords[i]))[:5]
+            result = tree.nearest(unit_vector(*target), 5)
+            assert [i for _, i in result] == expected
+            assert abs(chord_to_km(result[0][0]) - _haversine_km(target, coords[expected[0]])) < 0.01
+
+    def test_across_antimeridian(self):
+        """测试经度±180°两侧的点按实际距离排序"""
+        coords = [(0.0, 179.5), (0.0, -179.5), (0.0, 170.0)]
+        tree = KDTree([unit_vector(*c) for c in coords], ['east', 'west', 'far'])
+        result = tree.nearest(unit_vector(0.0, -179.9), 2)
+        assert [item for _, item in result] == ['west', 'east']
+        assert tree.nearest(unit_vector(0.0, 0.0), 0) == []
+        assert KDTree([], []).nearest(unit_vector(0.0, 0.0), 3) == []
+
+
+class TestRegionSpatialIndex:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.generation = _Generation()
+        self.points = [
+            {'provider': 'linode', 'region_id': 'ap-northeast', 'latitude': 35.68, 'longitude': 139.69},
+            {'provider': 'linode', 'region_id': 'us-east', 'latitude': 40.74, 'longitude': -74.17},
+            {'provider': 'tencent', 'region_id': 'ap-seoul', 'latitude': 37.57, 'longitude': 126.98},
+            {'provider': 'tencent', 'region_id': 'unknown', 'latitude': None, 'longitude': None}
+        ]
+        self.index = RegionSpatialIndex(self.generation, lambda: list(self.points))
+
+    def test_nearest_with_provider_filter(self):
+        """测试多个云服务商的结果按距离合并，可只查询部分云服务商"""
+        result = self.index.nearest(35.0, 135.0, k=2)
+        assert [r['region_id'] for _, r in result] == ['ap-northeast', 'ap-seoul']
+        assert 400 < result[0][0] < 500
+
+        result = self.index.nearest(35.0, 135.0, k=5, providers=('tencent', 'aliyun'))
+        assert [r['region_id'] for _, r in result] == ['ap-seoul']
+
+    def test_rebuilt_when_generation_changes(self):
+        """测试数据代际号变化后重新构建索引"""
+        assert self.index.warm() == 3
+        self.index.nearest(0, 0)
+        assert self.index.builds == 1
+
+        self.points.append({'provider': 'linode', 'region_id': 'jp-osa', 'latitude': 34.69, 'longitude': 135.50})
+        assert self.index.nearest(35.0, 135.0, k=1)[0][1]['region_id'] == 'ap-northeast'
+        self.generation.value += 1
+        assert self.index.nearest(35.0, 135.0, k=1)[0][1]['region_id'] == 'jp-osa'
+        assert self.index.stats() == {'generation': 2, 'providers': {'linode': 3, 'tencent': 1}, 'builds': 2}
+
+
+class TestNearestRegionsApi:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.app = create_app(test_config={'TESTING': True, 'DATABASE': self.test_db.name})
+        self.client = self.app.test_client()
+
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+        db_manager.create_provider(Provider(name='digitalocean', display_name='DigitalOcean', color='#ffb3d9'))
+        CloudAPICollector().update_database(db_manager, {
+            'linode': [
+                {'region_id': 'us-east', 'region_name': 'Newark, NJ', 'country_code': 'US'},
+                {'region_id': 'ap-northeast', 'region_name': 'Tokyo 2, JP', 'country_code': 'JP'},
+                {'region_id': 'jp-new', 'region_name': 'Tokyo 9, JP', 'country_code': 'JP'}
+            ],
+            'digitalocean': [
+                {'region_id': 'nyc3', 'region_name': 'New York 3', 'country_code': 'US'},
+                {'region_id': 'sgp1', 'region_name': 'Singapore 1', 'country_code': 'SG'}
+            ]
+        })
+        db_manager.close()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_nearest_regions(self):
+        """测试返回最近的k个区域及大圆距离"""
+        data = json.loads(self.client.get('/api/regions/nearest?lat=40.7&lon=-74.0&k=2').data)
+        assert data['success'] is True
+        assert [r['region_id'] for r in data['regions']] == ['nyc3', 'us-east']
+        assert data['regions'][0]['distance_km'] < 5
+        assert data['regions'][0]['provider'] == 'digitalocean'
+
+        data = json.loads(self.client.get('/api/regions/nearest?lat=35.7&lon=139.7&k=3&providers=linode').data)
+        # 目录中没有的区域使用国家的代表位置
+        assert [r['region_id'] for r in data['regions']] == ['ap-northeast', 'jp-new', 'us-east']
+
+    def test_invalid_coordinates(self):
+        """测试缺少或超出范围的坐标返回400"""
+        assert self.client.get('/api/regions/nearest?lat=40').status_code == 400
+        assert self.client.get('/api/regions/nearest?lat=91&lon=0').status_code == 400
+        assert self.client.get('/api/regions/nearest?lat=abc&lon=0').status_code == 400
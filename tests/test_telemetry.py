@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+import pytest
+import requests
+from unittest.mock import patch
+from app import create_app
+from api.cloud_collector import CloudAPICollector
+from api.resilience import ResiliencePolicy, RetryPolicy
+from api.telemetry import ProviderMetrics, bind_metrics, decode_json, unbind_metrics
+from database.metrics import percentile
+from database.models import DatabaseManager, Provider
+
+
+def _linode_response():
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps({
+        'page': 1, 'pages': 1, 'results': 1,
+        'data': [{'id': 'us-east', 'label': 'Newark, NJ', 'country': 'us',
+                  'capabilities': ['Linodes'], 'status': 'ok'}]
+    }).encode()
+    response.elapsed = timedelta(milliseconds=42)
+    return response
+
+
+class TestCollectionTelemetry:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+        self.db_manager.create_provider(Provider(name='linode', display_name='Linode', color='#3498db'))
+        self.collector = CloudAPICollector(resilience=ResiliencePolicy(retry=RetryPolicy(attempts=2, base_delay=0)))
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.db_manager.close()
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_percentile(self):
+        """测试线性插值百分位数"""
+        assert percentile([], 50) is None
+        assert percentile([10], 95) == 10
+        assert percentile([1, 2, 3, 4], 50) == 2.5
+        assert percentile(list(range(101)), 95) == 95
+
+    @pytest.mark.asyncio
+    async def test_metrics_recorded_per_provider(self):
+        """测试记录请求数、重试、响应大小、首字节时间和写入行数"""
+        response = _linode_response()
+        with patch('requests.Session.get', side_effect=[requests.ConnectionError('reset'), response]):
+            results = await self.collector.collect_all_regions(providers=['linode'])
+
+        metrics = self.collector.metrics['linode']
+        assert metrics.status == 'succeeded'
+        assert metrics.retries == 1
+        assert metrics.requests == 2
+        assert metrics.response_bytes == len(response.content)
+        assert metrics.ttfb_ms == pytest.approx(42)
+        assert metrics.fetch_ms >= metrics.network_ms
+
+        self.collector.update_database(self.db_manager, results, run_id='job-1')
+        recent = self.db_manager.get_collection_metrics('linode')
+        assert len(recent) == 1
+        assert recent[0]['run_id'] == 'job-1'
+        assert recent[0]['rows_written'] == 1
+        assert recent[0]['rows_diffed'] == 1
+        assert recent[0]['db_write_ms'] > 0
+
+        summary = self.db_manager.get_collection_summary(last_runs=10)
+        assert summary['linode']['runs'] == 1
+        assert summary['linode']['p50_ms'] == pytest.approx(recent[0]['total_ms'])
+        assert summary['linode']['total_retries'] == 1
+
+    def test_parse_time_measures_decoding_only(self):
+        """测试 parse_ms 只记录JSON解码，等待等其他时间计入 overhead_ms"""
+        import time
+
+        class SlowResponse:
+            def json(self):
+                time.sleep(0.02)
+                return {}
+
+        metrics = ProviderMetrics('linode')
+        token = bind_metrics(metrics)
+        try:
+            decode_json(SlowResponse())
+            time.sleep(0.05)
+        finally:
+            unbind_metrics(token)
+        metrics.finish_fetch('succeeded')
+
+        assert 20 <= metrics.parse_ms < 50
+        assert metrics.overhead_ms >= 50
+        assert metrics.to_dict()['overhead_ms'] == metrics.overhead_ms
+
+    def test_summary_uses_last_runs(self):
+        """测试聚合只使用每个云服务商最近N次记录"""
+        base = {'status': 'succeeded', 'started_at': 0, 'fetch_ms': 0, 'network_ms': 0, 'parse_ms': 0,
+                'db_write_ms': 0, 'requests': 1, 'retries': 0, 'response_bytes': 0,
+                'rows_diffed': 0, 'rows_written': 0}
+        for total in (1000, 10, 20, 30):
+            self.db_manager.record_collection_metrics(None, [dict(base, provider='aliyun', total_ms=total)])
+
+        summary = self.db_manager.get_collection_summary(last_runs=3)['aliyun']
+        assert summary['runs'] == 3
+        assert summary['max_ms'] == 30
+        assert summary['p50_ms'] == 20
+
+
+class TestCollectionMetricsApi:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.app = create_app(test_config={'TESTING': True, 'DATABASE': self.test_db.name})
+        self.client = self.app.test_client()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_metrics_endpoint(self):
+        """测试收集指标API"""
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.record_collection_metrics('job-1', [{
+            'provider': 'tencent', 'status': 'failed', 'started_at': 0, 'total_ms': 5, 'fetch_ms': 5,
+            'network_ms': 4, 'parse_ms': 1, 'db_write_ms': 0, 'requests': 3, 'retries': 2,
+            'response_bytes': 0, 'rows_diffed': 0, 'rows_written': 0
+        }])
+        db_manager.close()
+
+        data = self.client.get('/api/metrics/collection?runs=5').get_json()
+        assert data['runs'] == 5
+        assert data['summary']['tencent']['failures'] == 1
+        assert data['recent'][0]['run_id'] == 'job-1'
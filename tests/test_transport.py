@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+from api.transport import HttpTransport
+
+
+class TestHttpTransport:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.transport = HttpTransport(max_workers=8, provider_limits={'linode': 2})
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_session_reused_per_host(self):
+        """测试同一主机复用同一个Session"""
+        sessions = []
+
+        def fake_get(session, url, **kwargs):
+            sessions.append(session)
+            return Mock(status_code=200)
+
+        with patch('requests.Session.get', autospec=True, side_effect=fake_get):
+            await self.transport.get('linode', 'https://api.linode.com/v4/regions')
+            await self.transport.get('linode', 'https://api.linode.com/v4/types')
+            await self.transport.get('digitalocean', 'https://api.digitalocean.com/v2/regions')
+
+        assert sessions[0] is sessions[1]
+        assert sessions[0] is not sessions[2]
+        assert self.transport.stats()['hosts'] == [
+            'https://api.digitalocean.com', 'https://api.linode.com'
+        ]
+        assert self.transport.stats()['requests'] == 3
+
+    @pytest.mark.asyncio
+    async def test_default_timeout_applied(self):
+        """测试未指定超时时使用默认超时"""
+        with patch('requests.Session.get') as mock_get:
+            await self.transport.get('linode', 'https://api.linode.com/v4/regions')
+        assert mock_get.call_args.kwargs['timeout'] == self.transport.timeout
+
+    @pytest.mark.asyncio
+    async def test_provider_concurrency_limit(self):
+        """测试单个云服务商的并发请求数不超过上限"""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def slow_get(url, **kwargs):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+            return Mock(status_code=200)
+
+        with patch('requests.Session.get', side_effect=slow_get):
+            await asyncio.gather(*[
+                self.transport.get('linode', f'https://api.linode.com/v4/regions/{i}')
+                for i in range(6)
+            ])
+
+        assert state['peak'] == 2
+
+    def test_usable_across_event_loops(self):
+        """测试每次刷新新建的事件循环都可以使用同一个传输实例"""
+        with patch('requests.Session.get', return_value=Mock(status_code=200)):
+            for _ in range(2):
+                loop = asyncio.new_event_loop()
+                try:
+                    response = loop.run_until_complete(
+                        self.transport.get('linode', 'https://api.linode.com/v4/regions')
+                    )
+                finally:
+                    loop.close()
+                assert response.status_code == 200
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import tempfile
+import pytest
+from unittest.mock import AsyncMock, patch
+from app import create_app
+from api.cloud_collector import CloudAPICollector
+from api.resilience import ResiliencePolicy, RetryPolicy
+from database.models import DatabaseManager, Provider, AvailabilityZone, Zone, REMOVED_STATUS
+
+
+def _region(region_id, country_code='CN'):
+    return {'region_id': region_id, 'region_name': region_id, 'country_code': country_code}
+
+
+class TestZoneSync:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+        self.provider_id = self.db_manager.create_provider(
+            Provider(name='aliyun', display_name='阿里云', color='#ff8c00')
+        )
+        self.db_manager.sync_availability_zones(self.provider_id, [
+            AvailabilityZone(provider_id=self.provider_id, region_id=region_id, region_name=region_id,
+                             country_code='CN', continent='apac')
+            for region_id in ('cn-hangzhou', 'cn-beijing')
+        ])
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.db_manager.close()
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def _zone_count(self, region_id):
+        with self.db_manager.connection() as conn:
+            return conn.execute(
+                'SELECT zone_count FROM availability_zones WHERE region_id = ?', (region_id,)
+            ).fetchone()[0]
+
+    def test_sync_zones_maintains_zone_count(self):
+        """测试可用区增量同步，下线的可用区标记状态并更新区域的可用区数量"""
+        diff = self.db_manager.sync_zones(self.provider_id, {
+            'cn-hangzhou': [Zone('cn-hangzhou-b', 'B'), Zone('cn-hangzhou-h', 'H')],
+            'unknown-region': [Zone('x', 'X')]
+        })
+        assert diff == {'added': 2, 'changed': 0, 'unchanged': 0, 'removed': 0}
+        assert self._zone_count('cn-hangzhou') == 2
+        assert self._zone_count('cn-beijing') == 0
+
+        diff = self.db_manager.sync_zones(self.provider_id, {
+            'cn-hangzhou': [Zone('cn-hangzhou-b', 'B')]
+        })
+        assert diff == {'added': 0, 'changed': 0, 'unchanged': 1, 'removed': 1}
+        assert self._zone_count('cn-hangzhou') == 1
+        assert [z.zone_id for z in self.db_manager.get_zones('aliyun', 'cn-hangzhou')] == ['cn-hangzhou-b']
+
+        with self.db_manager.connection() as conn:
+            status = conn.execute(
+                "SELECT status FROM zones WHERE zone_id = 'cn-hangzhou-h'"
+            ).fetchone()[0]
+        assert status == REMOVED_STATUS
+        assert self.db_manager.get_zones('aliyun', 'missing') is None
+
+
+class TestZoneCollection:
+    def setup_method(self):
+        """每个测试方法前执行，创建临时数据库"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.db_manager = DatabaseManager(self.test_db.name)
+        self.db_manager.create_tables()
+        self.db_manager.create_provider(Provider(name='aliyun', display_name='阿里云', color='#ff8c00'))
+        self.collector = CloudAPICollector(
+            resilience=ResiliencePolicy(retry=RetryPolicy(attempts=1)),
+            collect_zones=True, zone_concurrency=2, zone_timeout=0.1
+        )
+
+    def teardown_method(self):
+        """每个测试方法后执行，清理临时数据库"""
+        self.db_manager.close()
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    @pytest.mark.asyncio
+    async def test_zone_fan_out_is_bounded(self):
+        """测试可用区请求受并发上限约束，超时的区域保留现有可用区"""
+        state = {'active': 0, 'peak': 0}
+
+        async def fetch_zones(region_id, only_changed=False):
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            try:
+                await asyncio.sleep(1 if region_id == 'slow' else 0.01)
+            finally:
+                state['active'] -= 1
+            return [{'zone_id': f'{region_id}-a', 'zone_name': 'A'}]
+
+        regions = [_region(f'r{i}') for i in range(5)] + [_region('slow')]
+        client = self.collector.providers['aliyun']
+        with patch.object(client, 'fetch_regions', AsyncMock(return_value=regions)), \
+             patch.object(client, 'fetch_zones', fetch_zones):
+            results = await self.collector.collect_all_regions(providers=['aliyun'])
+
+        collected = {r['region_id']: r for r in results['aliyun']}
+        assert state['peak'] == 2
+        assert 'zones' not in collected['slow']
+        assert collected['r0']['zones'] == [{'zone_id': 'r0-a', 'zone_name': 'A'}]
+
+        self.collector.update_database(self.db_manager, results)
+        assert [z.zone_id for z in self.db_manager.get_zones('aliyun', 'r3')] == ['r3-a']
+        assert self.db_manager.get_zones('aliyun', 'slow') == []
+
+
+class TestZoneApi:
+    def setup_method(self):
+        """每个测试方法前执行"""
+        self.test_db = tempfile.NamedTemporaryFile(delete=False)
+        self.test_db.close()
+        self.app = create_app(test_config={'TESTING': True, 'DATABASE': self.test_db.name})
+        self.client = self.app.test_client()
+        db_manager = DatabaseManager(self.test_db.name)
+        db_manager.create_tables()
+        provider_id = db_manager.create_provider(Provider(name='tencent', display_name='腾讯云', color='#2ecc71'))
+        db_manager.sync_availability_zones(provider_id, [
+            AvailabilityZone(provider_id=provider_id, region_id='ap-guangzhou', region_name='广州',
+                             country_code='CN', continent='apac')
+        ])
+        db_manager.sync_zones(provider_id, {
+            'ap-guangzhou': [Zone('ap-guangzhou-3', '广州三区'), Zone('ap-guangzhou-4', '广州四区')]
+        })
+        db_manager.generation.bump()
+        db_manager.close()
+
+    def teardown_method(self):
+        """每个测试方法后执行"""
+        for suffix in ('', '-wal', '-shm', '.generation', '.generation.lock'):
+            if os.path.exists(self.test_db.name + suffix):
+                os.unlink(self.test_db.name + suffix)
+
+    def test_regions_include_zone_count(self):
+        """测试区域列表返回可用区数量"""
+        data = self.client.get('/api/regions').get_json()
+        assert data['regions'][0]['zone_count'] == 2
+
+    def test_region_zones_endpoint(self):
+        """测试区域可用区列表接口"""
+        data = self.client.get('/api/regions/tencent/ap-guangzhou/zones').get_json()
+        assert data['total'] == 2
+        assert data['zones'][0]['zone_id'] == 'ap-guangzhou-3'
+
+        response = self.client.get('/api/regions/tencent/missing/zones')
+        assert response.status_code == 404